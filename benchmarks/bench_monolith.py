@@ -0,0 +1,309 @@
+"""
+End-to-end benchmark on a synthetic monolith.
+
+Generates a monolithic codebase with a configurable number of modules,
+packages, imports per module, modules sharing the same leaf name (which
+exercises ``resolve_names()``), external requirements and lines per module,
+then builds a few target modules with ``process_module()`` and records the
+time spent in each phase of the build (requirements parsing, graph
+construction, closure walk, rewrite, pip-compile, docs, setup.py, ...).
+Results are written as JSON so that they can be compared across versions.
+
+The benchmark runs offline: the external requirements are small stand-in
+wheels written next to the monolith, and the generated requirements.txt tells
+pip-compile to use only those (``--no-index --find-links``).
+
+Usage::
+
+    $ python benchmarks/bench_monolith.py --output bench.json
+    $ python benchmarks/bench_monolith.py --modules 2000 --packages 20 \\
+          --engines modulegraph ast --targets 5
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import treeshaker
+from treeshaker.parallel_utils import capture_output
+from treeshaker.treeshaker import process_module
+
+
+BENCHMARK_VERSION = 1
+
+BODY = '''
+
+def function_{i}(x):
+    """
+    Returns ``x`` plus {i}.
+
+    Parameters
+    ----------
+    x : int
+        The input.
+    """
+    value = x + {i}
+    for _ in range(3):
+        value = value * 1
+    return value
+'''
+
+EXTERNAL_IMPORT = '''
+
+def external_{k}():
+    import ext{k}
+    return ext{k}.VALUE
+'''
+
+
+def module_names(n_modules, n_packages, duplicate_names, rng):
+    """
+    Returns the names of the modules of the monolith. A ``duplicate_names``
+    fraction of them are called ``common`` and live in their own subpackage.
+    """
+    names = []
+    for i in range(n_modules):
+        pkg = 'mono%i' % (i % n_packages)
+        if rng.random() < duplicate_names:
+            names.append('%s.group%i.common' % (pkg, i))
+        else:
+            names.append('%s.mod%i' % (pkg, i))
+    return names
+
+
+def import_line(name, other, rng):
+    """
+    Formats an import of module ``other`` from module ``name``, using a mix of
+    import forms.
+    """
+    parent, leaf = other.rsplit('.', 1)
+    forms = ['from %s import function_0 as f_%s\n' % (other, leaf),
+             'import %s\n' % other,
+             'from %s import %s as %s_%s\n'
+             % (parent, leaf, leaf, abs(hash(other)) % 1000)]
+    if parent == name.rsplit('.', 1)[0]:
+        forms.append('from . import %s\n' % leaf)
+    return rng.choice(forms)
+
+
+def write_file(fname, content):
+    if not os.path.exists(os.path.dirname(fname)):
+        os.makedirs(os.path.dirname(fname))
+    with open(fname, 'w') as handle:
+        handle.write(content)
+
+
+def write_wheel(wheel_dir, name, version, requires=()):
+    """
+    Writes a minimal pure-Python wheel for a stand-in external requirement.
+    """
+    dist_info = '%s-%s.dist-info' % (name, version)
+    files = {
+        '%s.py' % name: 'VALUE = %r\n' % name,
+        '%s/METADATA' % dist_info: ''.join(
+            ['Metadata-Version: 2.1\n', 'Name: %s\n' % name,
+             'Version: %s\n' % version] +
+            ['Requires-Dist: %s\n' % r for r in requires]),
+        '%s/WHEEL' % dist_info: 'Wheel-Version: 1.0\nGenerator: bench\n'
+                                'Root-Is-Purelib: true\nTag: py2-none-any\n'
+                                'Tag: py3-none-any\n',
+    }
+    record = []
+    for path, content in sorted(files.items()):
+        digest = base64.urlsafe_b64encode(
+            hashlib.sha256(content.encode('utf-8')).digest()).rstrip(b'=')
+        record.append('%s,sha256=%s,%i' % (path, digest.decode('ascii'),
+                                           len(content)))
+    record.append('%s/RECORD,,' % dist_info)
+    files['%s/RECORD' % dist_info] = '\n'.join(record) + '\n'
+    fname = os.path.join(wheel_dir, '%s-%s-py2.py3-none-any.whl'
+                         % (name, version))
+    with zipfile.ZipFile(fname, 'w') as archive:
+        for path, content in sorted(files.items()):
+            archive.writestr(path, content)
+
+
+def generate_monolith(root, n_modules=200, n_packages=5, fanout=4,
+                      duplicate_names=0.1, n_externals=5, n_functions=10,
+                      n_targets=3, seed=0):
+    """
+    Writes a synthetic monolith to ``root``.
+
+    Modules only import modules with a lower index, so the last modules have
+    the largest closures and are used as the targets.
+
+    Returns
+    -------
+    dict
+        With keys ``'src'`` (the directory to put on ``sys.path``),
+        ``'requirements_file'``, ``'target_packages'`` and ``'targets'``.
+    """
+    rng = random.Random(seed)
+    src = os.path.join(root, 'src')
+    names = module_names(n_modules, n_packages, duplicate_names, rng)
+    packages = set()
+    for i, name in enumerate(names):
+        parts = name.split('.')
+        for j in range(1, len(parts)):
+            packages.add('.'.join(parts[:j]))
+        lines = []
+        for other in rng.sample(names[:i], min(fanout, i)):
+            lines.append(import_line(name, other, rng))
+        for k in rng.sample(range(n_externals), min(n_externals, 2)):
+            lines.append(EXTERNAL_IMPORT.format(k=k))
+        for j in range(n_functions):
+            lines.append(BODY.format(i=j))
+        write_file(os.path.join(src, *parts) + '.py', ''.join(lines))
+    for package in packages:
+        write_file(os.path.join(src, *package.split('.')) + '/__init__.py',
+                   '')
+
+    # stand-in wheels for the external requirements, each depending on the
+    # next one so that pip-compile has something to resolve
+    wheel_dir = os.path.join(root, 'wheels')
+    os.makedirs(wheel_dir)
+    for k in range(n_externals):
+        requires = ['ext%i>=1.0' % (k + 1)] if k + 1 < n_externals else []
+        write_wheel(wheel_dir, 'ext%i' % k, '1.0.0', requires)
+    requirements_file = os.path.join(root, 'requirements.txt')
+    write_file(requirements_file, ''.join(
+        ['--no-index\n', '--find-links %s\n' % wheel_dir.replace('\\', '/')] +
+        ['ext%i==1.0.0\n' % k for k in range(n_externals)]))
+
+    return {
+        'src': src,
+        'requirements_file': requirements_file,
+        'target_packages': sorted(p for p in packages if '.' not in p),
+        'targets': names[-n_targets:],
+    }
+
+
+def run(monolith, out_dir, engines):
+    """
+    Builds every target with every graph engine and returns one result per
+    build.
+    """
+    from treeshaker import ast_graph
+
+    results = []
+    for engine in engines:
+        ast_graph._scanned.clear()
+        for target in monolith['targets']:
+            dest_dir = os.path.join(out_dir, engine,
+                                    'build_' + target.replace('.', '_'))
+            if not os.path.exists(os.path.dirname(dest_dir)):
+                os.makedirs(os.path.dirname(dest_dir))
+            start = time.time()
+            with capture_output() as buf:
+                summary = process_module(
+                    target, monolith['target_packages'], dest_dir,
+                    requirements_file=monolith['requirements_file'],
+                    add_init_py=True, add_setup_py=True,
+                    functions=['function_0'], graph_engine=engine)
+            wall = time.time() - start
+            if not os.path.exists(os.path.join(dest_dir, 'requirements.txt')):
+                print(buf.getvalue())
+                raise RuntimeError('building %s failed' % target)
+            results.append({
+                'engine': engine,
+                'target': target,
+                'wall': wall,
+                'timings': dict(summary['timings']),
+                'counts': summary['counts'],
+            })
+            print('%-12s %-28s %8.2fs  %s' % (
+                engine, target, wall, '  '.join(
+                    '%s=%.2f' % item for item in summary['timings'].items())))
+    return results
+
+
+def totals(results):
+    """
+    Sums the phase timings of all targets per engine.
+    """
+    summed = {}
+    for result in results:
+        engine = summed.setdefault(result['engine'], {'wall': 0.})
+        engine['wall'] += result['wall']
+        for phase, elapsed in result['timings'].items():
+            engine[phase] = engine.get(phase, 0.) + elapsed
+    return summed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modules', type=int, default=200)
+    parser.add_argument('--packages', type=int, default=5)
+    parser.add_argument('--fanout', type=int, default=4,
+                        help='imports of other modules per module')
+    parser.add_argument('--duplicate-names', type=float, default=0.1,
+                        help='fraction of modules sharing the leaf name '
+                             '"common"')
+    parser.add_argument('--externals', type=int, default=5,
+                        help='number of external requirements')
+    parser.add_argument('--functions', type=int, default=10,
+                        help='functions per module, controls file size')
+    parser.add_argument('--targets', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engines', nargs='+', default=['modulegraph', 'ast'])
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--workdir', help='generate the monolith here '
+                        'instead of in a temporary directory')
+    args = parser.parse_args()
+
+    root = args.workdir or tempfile.mkdtemp(prefix='treeshaker-bench-')
+    if os.path.exists(os.path.join(root, 'src')):
+        raise IOError('%s already contains a monolith' % root)
+    params = {
+        'modules': args.modules, 'packages': args.packages,
+        'fanout': args.fanout, 'duplicate_names': args.duplicate_names,
+        'externals': args.externals, 'functions': args.functions,
+        'targets': args.targets, 'seed': args.seed,
+    }
+    try:
+        start = time.time()
+        monolith = generate_monolith(
+            root, n_modules=args.modules, n_packages=args.packages,
+            fanout=args.fanout, duplicate_names=args.duplicate_names,
+            n_externals=args.externals, n_functions=args.functions,
+            n_targets=args.targets, seed=args.seed)
+        print('generated %i modules in %s (%.2fs)'
+              % (args.modules, root, time.time() - start))
+        sys.path.insert(0, monolith['src'])
+        results = run(monolith, os.path.join(root, 'out'), args.engines)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root)
+
+    report = {
+        'benchmark': 'monolith',
+        'benchmark_version': BENCHMARK_VERSION,
+        'treeshaker_version': treeshaker.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'results': results,
+        'totals': totals(results),
+    }
+    for engine, phases in sorted(report['totals'].items()):
+        print('%-12s total %8.2fs  %s' % (engine, phases['wall'], '  '.join(
+            '%s=%.2f' % (p, t) for p, t in sorted(phases.items())
+            if p != 'wall')))
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=1, sort_keys=True)
+        print('wrote %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
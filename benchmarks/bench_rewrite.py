@@ -0,0 +1,108 @@
+"""
+Benchmark for import rewriting.
+
+Generates a synthetic closure of modules spread over a few packages, where each
+module imports a handful of other modules in the closure using a mix of import
+forms, and times rewriting every module with ``ImportRewriter``. The time per
+module should stay roughly constant as the closure grows, i.e., the total
+rewrite time should grow linearly with the size of the closure.
+
+Usage::
+
+    $ python benchmarks/bench_rewrite.py
+    $ python benchmarks/bench_rewrite.py --sizes 500 2000 --legacy
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import random
+import time
+
+from treeshaker.rewrite_utils import ImportRewriter
+from treeshaker.treeshaker import resolve_names
+
+
+IMPORT_FORMS = [
+    'from {mod} import {attr}\n',
+    'import {mod}\n',
+    'from {pkg} import {leaf}\n',
+    'from . import {leaf}\n',
+]
+
+BODY = '''
+
+def function_{i}(x):
+    """Docstring that mentions {mod}."""
+    message = "calling {mod}.{attr}"  # comment about {mod}
+    return x + {i}
+
+'''
+
+
+def generate_closure(n_modules, n_packages=10, fanout=5, n_functions=10,
+                     seed=0):
+    """
+    Returns a dict mapping module names to source code.
+    """
+    rng = random.Random(seed)
+    names = ['pkg%i.mod%i' % (i % n_packages, i) for i in range(n_modules)]
+    sources = {}
+    for i, name in enumerate(names):
+        pkg = name.split('.')[0]
+        lines = []
+        for other in rng.sample(names, min(fanout, n_modules)):
+            other_pkg, leaf = other.split('.')
+            form = rng.choice(IMPORT_FORMS)
+            if form.startswith('from . ') and other_pkg != pkg:
+                form = IMPORT_FORMS[0]
+            lines.append(form.format(mod=other, attr='function_0',
+                                     pkg=other_pkg, leaf=leaf))
+        for j in range(n_functions):
+            lines.append(BODY.format(i=j, mod=name, attr='function_%i' % j))
+        sources[name] = ''.join(lines)
+    return sources
+
+
+def legacy_rewrite(sources, name_map):
+    """
+    The quadratic find-and-replace rewriting used by treeshaker <= 0.0.3.
+    """
+    for name in sources:
+        data = sources[name]
+        for other in sorted(sources, key=len, reverse=True):
+            data = data.replace(other, '.' + name_map[other])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[250, 500, 1000, 2000])
+    parser.add_argument('--legacy', action='store_true',
+                        help='also time the legacy find-and-replace rewriter')
+    args = parser.parse_args()
+
+    print('%8s %12s %16s %12s' % ('modules', 'rewrite (s)', 'per module (us)',
+                                  'legacy (s)'))
+    for size in args.sizes:
+        sources = generate_closure(size)
+        old_names = sorted(sources)
+        name_map = dict(zip(old_names, resolve_names(old_names)))
+
+        start = time.time()
+        rewriter = ImportRewriter(name_map)
+        for name, source in sources.items():
+            rewriter.rewrite(source, name)
+        elapsed = time.time() - start
+
+        legacy = float('nan')
+        if args.legacy:
+            start = time.time()
+            legacy_rewrite(sources, name_map)
+            legacy = time.time() - start
+
+        print('%8i %12.3f %16.1f %12.3f'
+              % (size, elapsed, elapsed / size * 1e6, legacy))
+
+
+if __name__ == '__main__':
+    main()
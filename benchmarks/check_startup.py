@@ -0,0 +1,110 @@
+"""
+Startup regression test for the treeshaker CLI.
+
+Runs ``treeshaker --version`` under ``python -X importtime`` and fails if any
+of the heavy dependencies that are only needed while building targets get
+imported, or if importing ``treeshaker.treeshaker`` takes longer than the
+budget. The fastest of several runs is compared to the budget to reduce noise.
+
+``-X importtime`` requires Python 3.7, so older interpreters time the import
+with a wall clock and list ``sys.modules`` instead. They look up
+``treeshaker.__version__`` eagerly through the ``importlib_metadata`` backport,
+which takes about 100 ms on its own, so their default budget is larger.
+
+Usage:
+
+    $ python benchmarks/check_startup.py [--budget-ms 100] [--runs 5]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+# modules that must not be imported just to start the CLI (importlib.metadata
+# is allowed, since it is needed to look up the version)
+FORBIDDEN = ['fire', 'modulegraph', 'piptools', 'requirements', 'pip',
+             'pkg_resources', 'treeshaker._pypi_names']
+
+SCRIPT = ("import sys; sys.argv = ['treeshaker', '--version']; "
+          "from treeshaker.treeshaker import main; main()")
+
+# prints the import time of treeshaker.treeshaker in microseconds and the
+# imported modules as the last line of stderr, as JSON
+WALL_CLOCK_SCRIPT = (
+    "import json, sys, time; start = time.time(); "
+    "import treeshaker.treeshaker; "
+    "elapsed = int(1e6 * (time.time() - start)); "
+    "sys.argv = ['treeshaker', '--version']; treeshaker.treeshaker.main(); "
+    "times = dict((m, 0) for m in sys.modules if sys.modules[m] is not None); "
+    "times['treeshaker.treeshaker'] = elapsed; "
+    "sys.stderr.write('\\n' + json.dumps(times) + '\\n')")
+
+
+def parse_importtime(stderr):
+    """
+    Parses the output of ``-X importtime`` into a dict mapping module names to
+    their cumulative import time in microseconds.
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure():
+    """
+    Runs ``treeshaker --version`` in a fresh interpreter and returns a dict
+    mapping the modules it imported to their cumulative import time in
+    microseconds (only ``treeshaker.treeshaker`` is timed before Python 3.7).
+    """
+    importtime = sys.version_info >= (3, 7)
+    args = ['-X', 'importtime', '-c', SCRIPT] if importtime \
+        else ['-c', WALL_CLOCK_SCRIPT]
+    proc = subprocess.Popen([sys.executable] + args,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0 or 'treeshaker version' not in stdout:
+        print(stdout + stderr)
+        raise RuntimeError('treeshaker --version failed')
+    if importtime:
+        return parse_importtime(stderr)
+    return json.loads(stderr.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--budget-ms', type=float,
+                        default=100. if sys.version_info >= (3, 7) else 250.,
+                        help='maximum time to import treeshaker.treeshaker '
+                        '(default 100, or 250 before Python 3.7)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='number of runs, the fastest one is checked')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+
+    # check for heavy imports
+    imported = sorted(set(m for times in runs for m in times
+                          if m.split('.')[0] in FORBIDDEN or m in FORBIDDEN))
+    if imported:
+        print('FAIL: treeshaker --version imported %s' % ', '.join(imported))
+        sys.exit(1)
+
+    # check the import time budget
+    elapsed = min(times['treeshaker.treeshaker'] for times in runs) / 1000.
+    print('importing treeshaker.treeshaker took %.1f ms (budget %.1f ms)'
+          % (elapsed, args.budget_ms))
+    if elapsed > args.budget_ms:
+        print('FAIL: startup budget exceeded')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -41,6 +41,7 @@ setup(
         'configparser>=4.0.2;python_version<"3.2"',
         'enum34>=1.1.9;python_version<"3.4"',
         'fire>=0.2.1',
+        'futures>=3.3.0;python_version<"3.2"',
         'importlib_metadata>=1.5.0;python_version<"3.8"',
         'modulegraph>=0.18',
         'pip-tools>=4.5.0',
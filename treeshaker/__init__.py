@@ -1,26 +1,43 @@
 from __future__ import absolute_import
 
+import sys
 
-try:
+
+def _get_version():
     try:
-        # this works in Python 3.8
-        from importlib.metadata import version, PackageNotFoundError
-    except ImportError:
         try:
-            # this works in Python 2 if lib5c is installed, since it depends on
-            # importlib_metadata
-            from importlib_metadata import version, PackageNotFoundError
+            # this works in Python 3.8
+            from importlib.metadata import version, PackageNotFoundError
         except ImportError:
-            raise
-    try:
-        # we land here if either importlib.metadata or importlib_metadata
-        # is available and lib5c is installed
-        __version__ = version(__name__)
-    except PackageNotFoundError:
-        # we will land here if either importlib.metadata or importlib_metadata
-        # is available, but lib5c isn't actually installed
-        __version__ = 'unknown'
-except ImportError:
-    # we land here if neither importlib.metadata nor importlib_metadata are
-    # available
-    __version__ = 'unknown'
+            try:
+                # this works in Python 2 if lib5c is installed, since it depends
+                # on importlib_metadata
+                from importlib_metadata import version, PackageNotFoundError
+            except ImportError:
+                raise
+        try:
+            # we land here if either importlib.metadata or importlib_metadata
+            # is available and lib5c is installed
+            return version(__name__)
+        except PackageNotFoundError:
+            # we will land here if either importlib.metadata or
+            # importlib_metadata is available, but lib5c isn't actually
+            # installed
+            return 'unknown'
+    except ImportError:
+        # we land here if neither importlib.metadata nor importlib_metadata are
+        # available
+        return 'unknown'
+
+
+if sys.version_info >= (3, 7):
+    # importing importlib.metadata is slow, so look up the version the first
+    # time __version__ is accessed (PEP 562)
+    def __getattr__(name):
+        if name == '__version__':
+            globals()['__version__'] = _get_version()
+            return globals()['__version__']
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name))
+else:
+    __version__ = _get_version()
@@ -0,0 +1,1069 @@
+# generated by `python -m treeshaker.pypi_names`, do not edit
+PYPI_NAMES = {
+    '115wangpan': 'u115',
+    '199Fix': 'i99fix',
+    '2gis': 'dgis',
+    '2lazy2rest': 'mkrst_themes',
+    '2or3': 'lib2or3',
+    '3color_Press': 'threecolor',
+    '3d_wallet_generator': 'gen_3dwallet',
+    '3lwg': 'tlw',
+    '3to2': 'lib3to2',
+    '42qucc': 'cc42',
+    '4ch': 'fourch',
+    '51degrees_mobile_detector': 'fiftyone_degrees',
+    '51degrees_mobile_detector_v3_wrapper': 'FiftyOneDegrees',
+    '7lk_ocr_deploy': 'libsvm',
+    'AC_Flask_HipChat': 'ac_flask',
+    'AEI': 'pyrimaa',
+    'AMLT_learn': 'amltlearn',
+    'AMQP_Storm': 'amqpstorm',
+    'ANNOgesic': 'annogesiclib',
+    'ATD_document': 'sphinx_pypi_upload',
+    'AbakaffeNotifier': 'pynma',
+    'ActionServer': 'action',
+    'ActivePapers.Py': 'activepapers',
+    'Adafruit_Libraries': 'Adafruit',
+    'AdjectorClient': 'adjector',
+    'AdjectorTracPlugin': 'adjector',
+    'AdvancedLangConv': 'langconv',
+    'AdvancedSearchDiscovery': 'asd',
+    'Adytum_PyMonitor': 'adytum',
+    'Agora_Client': 'agora',
+    'Agora_Fountain': 'agora',
+    'Agora_Fragment': 'agora',
+    'Agora_Planner': 'agora',
+    'Agora_Service_Provider': 'agora',
+    'Aito': 'libaito',
+    'Alexandria_Upload_Utils': 'alexandria_upload',
+    'Alfred_Workflow': 'workflow',
+    'AllAttachmentsMacro': 'allattachments',
+    'AllPairs': 'metacomm',
+    'Amalwebcrawler': 'pymycraawler',
+    'Amauri': 'nester',
+    'AmazonAPIWrapper': 'amazon',
+    'AmbilightParty': 'ambilight',
+    'AnalyzeDirectory': 'analyzedir',
+    'AndrewList': 'printList',
+    'AnelPowerControl': 'anel_power_control',
+    'Annalist': 'annalist_root',
+    'AnthraxDojoFrontend': 'anthrax',
+    'AnthraxHTMLInput': 'anthrax',
+    'AnthraxImage': 'anthrax',
+    'AppDynamicsDownloader': 'appd',
+    'AppDynamicsREST': 'appd',
+    'Appium_Python_Client': 'appium',
+    'AsanaToGithub': 'asana_to_github',
+    'AsciiBinaryConverter': 'asciibinary',
+    'AtomicWrite': 'atomic',
+    'AuthServerClient': 'auth_server_client',
+    'AuthorizeSauce': 'authorize',
+    'AuthzPolicyPlugin': 'authzpolicy',
+    'BYONDTools': 'byond',
+    'Babel': 'babel',
+    'BabelGladeExtractor': 'babelglade',
+    'BadLinksPlugin': 'badlinks',
+    'Bananas': 'banana',
+    'Banner_Ad_Toolkit': 'adkit',
+    'Banzai_NGS': 'Banzai',
+    'BarkingOwl': 'barking_owl',
+    'BasicHttp': 'basic_http',
+    'Beaker': 'beaker',
+    'BeautifulSoup': 'BeautifulSoupTests',
+    'BigJob': 'pilot',
+    'Brownie': 'brownie',
+    'Bugzilla_ETL': 'bzETL',
+    'BuildNotify': 'buildnotifylib',
+    'BuildbotEightStatusShields': 'BuildbotStatusShields',
+    'Cartridge': 'cartridge',
+    'CassandraLauncher': 'cassandralauncher',
+    'Cerberus': 'cerberus',
+    'Chameleon': 'chameleon',
+    'ConcurrentLogHandler': 'cloghandler',
+    'ConfigArgParse': 'configargparse',
+    'CouchDB': 'couchdb',
+    'Couchapp': 'couchapp',
+    'Creoleparser': 'creoleparser',
+    'Cython': 'pyximport',
+    'DARE': 'dare',
+    'DAWG': 'dawg',
+    'Distutils2': 'distutils2',
+    'Django': 'django',
+    'DocumentTemplate': 'TreeDisplay',
+    'Elixir': 'elixir',
+    'ExtensionClass': 'MethodObject',
+    'Fabric': 'fabric',
+    'Faker': 'faker',
+    'Flask': 'flask',
+    'Flask_And_Redis': 'flask_redis',
+    'Flask_Bcrypt': 'flaskext',
+    'FormEncode': 'formencode',
+    'Frozen_Flask': 'flask_frozen',
+    'Fuzzy': 'fuzzy',
+    'Genshi': 'genshi',
+    'GeoBasesDev': 'GeoBases',
+    'GeoNode': 'geonode',
+    'Geraldo': 'geraldo',
+    'GitPython': 'git',
+    'HARPy': 'harpy',
+    'Hoover': 'hoover',
+    'IMDbPY': 'imdb',
+    'JPype1': 'jpypex',
+    'Jinja2': 'jinja2',
+    'Kuyruk': 'kuyruk',
+    'Logbook': 'logbook',
+    'Mako': 'mako',
+    'ManifestDestiny': 'manifestparser',
+    'Markdown': 'markdown',
+    'MarkupSafe': 'markupsafe',
+    'Metafone': 'metaphone',
+    'Mezzanine': 'mezzanine',
+    'MoPyTools': 'mopytools',
+    'MongoAlchemy': 'mongoalchemy',
+    'MonthDelta': 'monthdelta',
+    'Mopidy': 'mopidy',
+    'MySQLdb': 'MySQL_python',
+    'OWSLib': 'owslib',
+    'Parsley': 'ometa',
+    'PasteScript': 'paste',
+    'Paver': 'paver',
+    'Pillow': 'PIL',
+    'ProxyTypes': 'peak',
+    'PyCK': 'pyck',
+    'PyChef': 'chef',
+    'PyContracts': 'contracts',
+    'PyDispatcher': 'pydispatch',
+    'PyGithub': 'github',
+    'PyHamcrest': 'hamcrest',
+    'PyHawk_with_a_single_extra_commit': 'hawk',
+    'PyJWT': 'jwt',
+    'PyLogo': 'pylogo',
+    'PyOpenGL': 'OpenGL',
+    'PySide': 'pysideuic',
+    'PyStemmer': 'Stemmer',
+    'PySynth': 'pysynth_samp',
+    'PyUtilib': 'pyutilib',
+    'PyYAML': 'yaml',
+    'Pyccuracy': 'pyccuracy',
+    'Pygments': 'pygments',
+    'Pykka': 'pykka',
+    'Pyphen': 'pyphen',
+    'Python_Bash_Utils': 'bashutils',
+    'RSFile': 'rsbackends',
+    'RelStorage': 'relstorage',
+    'Requests': 'requests',
+    'SQLAlchemy': 'sqlalchemy',
+    'Shapely': 'shapely',
+    'SocksiPy_branch': 'socks',
+    'Solution': 'solution',
+    'South': 'south',
+    'Sphinx': 'sphinx',
+    'StoneageHTML': 'stoneagehtml',
+    'Tempita': 'tempita',
+    'Tenjin': 'tenjin',
+    'Trac': 'tracopt',
+    'Twisted': 'twisted',
+    'Unidecode': 'unidecode',
+    'WSME': 'wsmeext',
+    'WTForms': 'wtforms',
+    'WebOb': 'webob',
+    'WebTest': 'webtest',
+    'Werkzeug': 'werkzeug',
+    'XStatic_Font_Awesome': 'xstatic',
+    'XStatic_jQuery': 'xstatic',
+    'XStatic_jquery_ui': 'xstatic',
+    'Zope2': 'webdav',
+    'aDict2': 'adict',
+    'ab': 'valentine',
+    'abakaffe_cli': 'abakaffe',
+    'abiosgaming.py': 'abiosgaming',
+    'abiquo_api': 'abiquo',
+    'abl.cssprocessor': 'abl',
+    'abl.errorreporter': 'errorreporter',
+    'abl.robot': 'abl',
+    'abl.util': 'abl',
+    'abl.vpath': 'abl',
+    'abo_generator': 'abo',
+    'abofly': 'nester',
+    'abris': 'abris_transform',
+    'abstract.jwrotator': 'abstract',
+    'abu.admin': 'abu',
+    'acme.dchat': 'acme',
+    'acme.hello': 'acme',
+    'acted.projects': 'acted',
+    'actionbar.panel': 'actionbar',
+    'add_asts': 'asts',
+    'address_book_lansry': 'address_book',
+    'adhocracy_Pylons': 'pylons',
+    'adhocracy_pysqlite': 'pysqlite2',
+    'adi.commons': 'adi',
+    'adi.devgen': 'adi',
+    'adi.fullscreen': 'adi',
+    'adi.init': 'adi',
+    'adi.playlist': 'adi',
+    'adi.samplecontent': 'adi',
+    'adi.slickstyle': 'adi',
+    'adi.suite': 'adi',
+    'adi.trash': 'adi',
+    'aditam.agent': 'aditam',
+    'aditam.core': 'aditam',
+    'adium_sh': 'adiumsh',
+    'adminapi': 'cloud_admin',
+    'adminish_categories': 'adminishcategories',
+    'adpasswd': 'ldaplib',
+    'adrest': 'example',
+    'adspygoogle.adwords': 'adspygoogle',
+    'affinitic.docpyflakes': 'affinitic',
+    'affinitic.recipe.fakezope2eggs': 'affinitic',
+    'affinitic.simplecookiecuttr': 'affinitic',
+    'affinitic.verifyinterface': 'affinitic',
+    'affinitic.zamqp': 'affinitic',
+    'afn': 'activehomed',
+    'afpy.xap': 'afpy',
+    'agate_sql': 'agatesql',
+    'ageliaco.recipe.csvconfig': 'ageliaco',
+    'agent.http': 'agent_http',
+    'agoraplex.themes.sphinx': 'agoraplex',
+    'agpy': 'AG_fft_tools',
+    'agsci.blognewsletter': 'agsci',
+    'agtl': 'advancedcaching',
+    'agx.core': 'agx',
+    'agx.dev': 'agx',
+    'agx.generator.buildout': 'agx',
+    'agx.generator.dexterity': 'agx',
+    'agx.generator.generator': 'agx',
+    'agx.generator.plone': 'agx',
+    'agx.generator.pyegg': 'agx',
+    'agx.generator.sql': 'agx',
+    'agx.generator.uml': 'agx',
+    'agx.generator.zca': 'agx',
+    'agx.transform.uml2fs': 'agx',
+    'agx.transform.xmi2uml': 'agx',
+    'ahonya_sika': 'sika',
+    'ailove_django_fias': 'fias',
+    'aimes.bundle': 'aimes',
+    'aimes.skeleton': 'aimes',
+    'aino_jstools': 'jstools',
+    'aino_mutations': 'mutations',
+    'aino_utkik': 'utkik',
+    'aio.app': 'aio',
+    'aio.config': 'aio',
+    'aio.core': 'aio',
+    'aio.signals': 'aio',
+    'aio_hs2': 'aiohs2',
+    'aio_routes': 'aioroutes',
+    'aio_s3': 'aios3',
+    'airbrake_flask': 'airbrake',
+    'airship_icloud': 'airship',
+    'airship_steamcloud': 'airship',
+    'ajk_ios_buildTools': 'buildTools',
+    'al_cloudinsight': 'cloud_insight',
+    'alation_api': 'alation',
+    'alauda_django_oauth': 'oauth2_provider',
+    'alba_client_python': 'alba_client',
+    'alburnum_maas_client': 'alburnum',
+    'alchemist.audit': 'alchemist',
+    'alchemist.security': 'alchemist',
+    'alchemist.traversal': 'alchemist',
+    'alchemist.ui': 'alchemist',
+    'alchemyapi_python': 'alchemyapi',
+    'alerta_server': 'alerta',
+    'alex_sayhi': 'sayhi',
+    'ali_opensearch': 'opensearchsdk',
+    'alibaba_python_sdk': 'alibaba',
+    'alicloudcli': 'aliyuncli',
+    'alioss': 'oss',
+    'aliyun_python_sdk': 'aliyun',
+    'aliyun_python_sdk_acs': 'aliyunsdkacs',
+    'aliyun_python_sdk_batchcompute': 'aliyunsdkbatchcompute',
+    'aliyun_python_sdk_bsn': 'aliyunsdkbsn',
+    'aliyun_python_sdk_bss': 'aliyunsdkbss',
+    'aliyun_python_sdk_cdn': 'aliyunsdkcdn',
+    'aliyun_python_sdk_cms': 'aliyunsdkcms',
+    'aliyun_python_sdk_core': 'aliyunsdkcore',
+    'aliyun_python_sdk_crm': 'aliyunsdkcrm',
+    'aliyun_python_sdk_cs': 'aliyunsdkcs',
+    'aliyun_python_sdk_drds': 'aliyunsdkdrds',
+    'aliyun_python_sdk_ecs': 'aliyunsdkecs',
+    'aliyun_python_sdk_ess': 'aliyunsdkess',
+    'aliyun_python_sdk_ft': 'aliyunsdkft',
+    'aliyun_python_sdk_mts': 'aliyunsdkmts',
+    'aliyun_python_sdk_ocs': 'aliyunsdkocs',
+    'aliyun_python_sdk_oms': 'aliyunsdkoms',
+    'aliyun_python_sdk_oss': 'oss',
+    'aliyun_python_sdk_ossadmin': 'aliyunsdkossadmin',
+    'aliyun_python_sdk_r_kvstore': 'aliyunsdkr_kvstore',
+    'aliyun_python_sdk_ram': 'aliyunsdkram',
+    'aliyun_python_sdk_rds': 'aliyunsdkrds',
+    'aliyun_python_sdk_risk': 'aliyunsdkrisk',
+    'aliyun_python_sdk_ros': 'aliyunsdkros',
+    'aliyun_python_sdk_slb': 'aliyunsdkslb',
+    'aliyun_python_sdk_sts': 'aliyunsdksts',
+    'aliyun_python_sdk_ubsms': 'aliyunsdkubsms',
+    'aliyun_python_sdk_yundun': 'aliyunsdkyundun',
+    'aliyunoss': 'oss',
+    'allegrordf': 'franz',
+    'allocine_wrapper': 'allocine',
+    'alm.solrindex': 'alm',
+    'aloft.py': 'aloft',
+    'alpaca': 'alpacalib',
+    'alphabetic_simple': 'alphabetic',
+    'alphasms_client': 'alphasms',
+    'altered.states': 'altered',
+    'alterootheme.busycity': 'alterootheme',
+    'alterootheme.intensesimplicity': 'alterootheme',
+    'alterootheme.lazydays': 'alterootheme',
+    'alurinium_image_processing': 'alurinium',
+    'alx': 'alxlib',
+    'amara3_iri': 'amara3',
+    'amara3_xml': 'amara3',
+    'amarokHola': 'hola',
+    'amazon_mws': 'mws',
+    'ambikesh1349_1': 'ambikesh1349_1',
+    'ambition_inmemorystorage': 'inmemorystorage',
+    'ami_organizer': 'amiorganizer',
+    'amifs_core': 'amifs',
+    'amitu.lipy': 'amitu',
+    'amitu_hstore': 'django_hstore',
+    'amitu_putils': 'amitu',
+    'amitu_websocket_client': 'amitu',
+    'amitu_zutils': 'amitu',
+    'amocrm_api': 'amocrm',
+    'amqp_dispatcher': 'amqpdispatcher',
+    'anaconda_build': 'binstar_build_client',
+    'anaconda_client': 'binstar_client',
+    'analytics_python': 'analytics',
+    'ancientsolutions_crypttools': 'ancientsolutions',
+    'anderson.paginator': 'anderson_paginator',
+    'anderson.picasso': 'picasso',
+    'android_flasher': 'flasher',
+    'android_gendimen': 'gendimen',
+    'android_localization_helper': 'translation_helper',
+    'android_missingdrawables': 'missingdrawables',
+    'android_resource_remover': 'android_clean_app',
+    'android_sdk_updater': 'sdk_updater',
+    'android_webview': 'awebview',
+    'angus_sdk_python': 'angus',
+    'anikom15': 'acg',
+    'anovelmous_grammar': 'grammar',
+    'ansible_docgen': 'ansibledocgen',
+    'ansible_docgenerator': 'docgen',
+    'ansible_flow': 'ansibleflow',
+    'ansible_inventory_grapher': 'ansibleinventorygrapher',
+    'ansible_lint': 'ansiblelint',
+    'ansible_playbook_debugger': 'ansibledebugger',
+    'ansible_role_apply': 'ansible_role_apply',
+    'ansible_role_manager': 'arm',
+    'ansible_roles_graph': 'ansiblerolesgraph',
+    'ansible_tools': 'ansibletools',
+    'ansible_tower_cli': 'tower_cli',
+    'ansible_universe': 'universe',
+    'ansicolors': 'colors',
+    'anthill.exampletheme': 'anthill',
+    'anthill.skinner': 'anthill',
+    'anthill.tal.macrorenderer': 'anthill',
+    'antispoofing.evaluation': 'antispoofing',
+    'antiweb': 'antisphinx',
+    'antlr4_python2_runtime': 'antlr4',
+    'antlr4_python3_runtime': 'antlr4',
+    'antlr4_python_alt': 'antlr4',
+    'anybox.buildbot.openerp': 'anybox',
+    'anybox.nose.odoo': 'anybox',
+    'anybox.paster.odoo': 'anybox',
+    'anybox.paster.openerp': 'anybox',
+    'anybox.recipe.sysdeps': 'anybox',
+    'anybox.scripts.odoo': 'anybox',
+    'apache_libcloud': 'libcloud',
+    'appdynamics_bindeps_linux_x64': 'appdynamics_bindeps',
+    'appdynamics_bindeps_linux_x86': 'appdynamics_bindeps',
+    'appdynamics_bindeps_osx_x64': 'appdynamics_bindeps',
+    'appdynamics_proxysupport_linux_x64': 'appdynamics_proxysupport',
+    'appdynamics_proxysupport_linux_x86': 'appdynamics_proxysupport',
+    'appdynamics_proxysupport_osx_x64': 'appdynamics_proxysupport',
+    'applibase': 'appliapps',
+    'ar_virtualenv_api': 'virtualenvapi',
+    'archetypes.kss': 'archetypes',
+    'archetypes.multilingual': 'archetypes',
+    'archetypes.schemaextender': 'archetypes',
+    'armor_api': 'armor',
+    'armstrong.apps.related_content': 'armstrong',
+    'armstrong.apps.series': 'armstrong',
+    'armstrong.cli': 'armstrong',
+    'armstrong.core.arm_access': 'armstrong',
+    'armstrong.core.arm_layout': 'armstrong',
+    'armstrong.core.arm_sections': 'armstrong',
+    'armstrong.core.arm_wells': 'armstrong',
+    'armstrong.dev': 'armstrong',
+    'armstrong.esi': 'armstrong',
+    'armstrong.hatband': 'armstrong',
+    'armstrong.templates.standard': 'armstrong',
+    'armstrong.utils.backends': 'armstrong',
+    'armstrong.utils.celery': 'armstrong',
+    'arpm': 'apm',
+    'arsespyder': 'pyarsespyder',
+    'arstecnica.raccoon.autobahn': 'arstecnica',
+    'arstecnica.sqlalchemy.async': 'arstecnica',
+    'article_downloader': 'article_downloader',
+    'artifact_cli': 'artifactcli',
+    'arvados_cwl_runner': 'arvados_cwl',
+    'arvados_node_manager': 'arvnodeman',
+    'arvados_python_client': 'arvados',
+    'asana_kazoo': 'kazoo',
+    'asdf': 'pyasdf',
+    'askbot_tuan': 'askbot',
+    'askbot_tuanpa': 'askbot',
+    'asnhistory_redis': 'asnhistory',
+    'aspell_python_ctypes': 'pyaspell',
+    'aspen_jinja2': 'aspen_jinja2_renderer',
+    'aspen_tornado': 'aspen_tornado_engine',
+    'aspose_pdf_java_for_python': 'WorkingWithDocumentConversion',
+    'aspose_words_java_for_python': 'loadingandsaving',
+    'asposebarcode': 'models',
+    'asposestorage': 'models',
+    'asprise_ocr_sdk_python_api': 'asprise_ocr_api',
+    'aspy.refactor_imports': 'aspy',
+    'aspy.yaml': 'aspy',
+    'astLib': 'PyWCSTools',
+    'asterisk_ami': 'asterisk',
+    'astor': 'setuputils',
+    'astro_kittens': 'Kittens',
+    'astro_pyxis': 'Pyxides',
+    'asymmetricbase.enum': 'asymmetricbase',
+    'asymmetricbase.fields': 'asymmetricbase',
+    'asymmetricbase.logging': 'asymmetricbase',
+    'asymmetricbase.utils': 'asymmetricbase',
+    'async_retrial': 'retrial',
+    'asyncio_irc': 'asyncirc',
+    'asyncmongoorm_je': 'asyncmongoorm',
+    'asyncssh_unofficial': 'asyncssh',
+    'athletelistyy': 'athletelist',
+    'atlas': 'src',
+    'atmosphere_python_client': 'atmosphere',
+    'atomisator.db': 'atomisator',
+    'atomisator.enhancers': 'atomisator',
+    'atomisator.feed': 'atomisator',
+    'atomisator.indexer': 'atomisator',
+    'atomisator.outputs': 'atomisator',
+    'atomisator.parser': 'atomisator',
+    'atomisator.readers': 'atomisator',
+    'atreal.cmfeditions.unlocker': 'atreal',
+    'atreal.filestorage.common': 'atreal',
+    'atreal.layouts': 'atreal',
+    'atreal.mailservices': 'atreal',
+    'atreal.massloader': 'atreal',
+    'atreal.monkeyplone': 'atreal',
+    'atreal.override.albumview': 'atreal',
+    'atreal.richfile.preview': 'atreal',
+    'atreal.richfile.qualifier': 'atreal',
+    'atreal.usersinout': 'atreal',
+    'atsim.potentials': 'atsim',
+    'attract_sdk': 'attractsdk',
+    'audio.bitstream': 'audio',
+    'audio.coders': 'audio',
+    'audio.filters': 'audio',
+    'audio.fourier': 'audio',
+    'audio.frames': 'audio',
+    'audio.lp': 'audio',
+    'audio.psychoacoustics': 'audio',
+    'audio.quantizers': 'audio',
+    'audio.shrink': 'audio',
+    'audio.wave': 'audio',
+    'auf_refer': 'aufrefer',
+    'auslfe.formonline.content': 'auslfe',
+    'auspost_apis': 'auspost',
+    'auth0_python': 'auth0',
+    'auth_userpass': 'userpass',
+    'auto_adjust_display_brightness': 'aadb',
+    'auto_mix_prep': 'src',
+    'autobahn_rce': 'autobahn',
+    'automakesetup.py': 'utilities',
+    'automium': 'atm',
+    'azure_batch_apps': 'batchapps',
+    'azure_common': 'azure',
+    'azure_elasticluster': 'elasticluster',
+    'azure_elasticluster_current': 'elasticluster',
+    'azure_mgmt_common': 'azure',
+    'azure_mgmt_compute': 'azure',
+    'azure_mgmt_network': 'azure',
+    'azure_mgmt_nspkg': 'azure',
+    'azure_mgmt_resource': 'azure',
+    'azure_mgmt_storage': 'azure',
+    'azure_nspkg': 'azure',
+    'azure_servicebus': 'azure',
+    'azure_servicemanagement_legacy': 'azure',
+    'azure_storage': 'azure',
+    'b2g_commands': 'b2gcommands',
+    'b2gperf_v1.3': 'b2gperf',
+    'b2gperf_v1.4': 'b2gperf',
+    'b2gperf_v2.0': 'b2gperf',
+    'b2gperf_v2.1': 'b2gperf',
+    'b2gperf_v2.2': 'b2gperf',
+    'b2gpopulate_v1.3': 'b2gpopulate',
+    'b2gpopulate_v1.4': 'b2gpopulate',
+    'b2gpopulate_v2.0': 'b2gpopulate',
+    'b2gpopulate_v2.1': 'b2gpopulate',
+    'b2gpopulate_v2.2': 'b2gpopulate',
+    'b3j0f.annotation': 'b3j0f',
+    'b3j0f.aop': 'b3j0f',
+    'b3j0f.conf': 'b3j0f',
+    'b3j0f.sync': 'b3j0f',
+    'b3j0f.utils': 'b3j0f',
+    'ba_colander': 'colander',
+    'backplane2_pyclient': 'backplane',
+    'backport_collections': 'backport_abcoll',
+    'backport_ipaddress': 'ipaddress',
+    'backports.functools_lru_cache': 'backports',
+    'backports.inspect': 'backports',
+    'backports.pbkdf2': 'backports',
+    'backports.shutil_get_terminal_size': 'backports',
+    'backports.socketpair': 'backports',
+    'backports.ssl': 'backports',
+    'backports.ssl_match_hostname': 'backports',
+    'backports.statistics': 'backports',
+    'badgekit_api_client': 'badgekit',
+    'bael.project': 'bael',
+    'bagofwords': 'bow',
+    'baidupy': 'baidu',
+    'baluhn_redux': 'baluhn',
+    'bamboo.pantrybell': 'bamboo',
+    'bamboo.scaffold': 'bamboo',
+    'bamboo.setuptools_version': 'bamboo',
+    'bamboo_data': 'bamboo',
+    'bamboo_server': 'bamboo',
+    'bambu_codemirror': 'bambu',
+    'bambu_dataportability': 'bambu',
+    'bambu_enqueue': 'bambu',
+    'bambu_faq': 'bambu',
+    'bambu_ffmpeg': 'bambu',
+    'bambu_grids': 'bambu',
+    'bambu_international': 'bambu',
+    'bambu_jwplayer': 'bambu',
+    'bambu_minidetect': 'bambu',
+    'bambu_navigation': 'bambu',
+    'bambu_notifications': 'bambu',
+    'bambu_payments': 'bambu',
+    'bambu_pusher': 'bambu',
+    'bambu_saas': 'bambu',
+    'bambu_sites': 'bambu',
+    'banana.maya': 'banana',
+    'bananatag_api': 'btapi',
+    'bangtext': 'bang',
+    'baojinhuan': 'nested',
+    'barcode_generator': 'barcode',
+    'bark_ssg': 'bark',
+    'bart_py': 'bart',
+    'basalt_tasks': 'basalt',
+    'base_62': 'base62',
+    'basemap_Jim': 'basemap',
+    'bash_powerprompt': 'powerprompt',
+    'bash_toolbelt': 'bash',
+    'basil_daq': 'basil',
+    'beaker_es_plot': 'esplot',
+    'beautifulsoup4': 'bs4',
+    'beets': 'beetsplug',
+    'begins': 'begin',
+    'bench_it': 'benchit',
+    'beproud.utils': 'beproud',
+    'bf_lc3': 'compile',
+    'billboard.py': 'billboard',
+    'biocommons.dev': 'biocommons',
+    'biopython': 'BioSQL',
+    'birdhousebuilder.recipe.conda': 'birdhousebuilder',
+    'birdhousebuilder.recipe.docker': 'birdhousebuilder',
+    'birdhousebuilder.recipe.redis': 'birdhousebuilder',
+    'birdhousebuilder.recipe.supervisor': 'birdhousebuilder',
+    'bisque_api': 'bqapi',
+    'bitbucket_jekyll_hook': 'BB_jekyll_hook',
+    'borg.localrole': 'borg',
+    'bpython': 'bpdb',
+    'briefs_caster': 'briefscaster',
+    'brisa_media_server_plugins': 'brisa_media_server/plugins',
+    'brkt_sdk': 'brkt_requests',
+    'broadcast_logging': 'broadcastlogging',
+    'broadwick': 'appserver',
+    'brocade_plugins': 'vyatta',
+    'brocade_tool': 'brocadetool',
+    'bronto_python': 'bronto',
+    'browsermob_proxy': 'browsermobproxy',
+    'brubeck_mysql': 'brubeckmysql',
+    'brubeck_oauth': 'brubeckoauth',
+    'brubeck_service': 'brubeckservice',
+    'brubeck_uploader': 'brubeckuploader',
+    'bssm_pythonSig': 'nester',
+    'bst.pygasus.core': 'bst',
+    'bst.pygasus.datamanager': 'bst',
+    'bst.pygasus.demo': 'bst',
+    'bst.pygasus.i18n': 'bst',
+    'bst.pygasus.resources': 'bst',
+    'bst.pygasus.scaffolding': 'bst',
+    'bst.pygasus.security': 'bst',
+    'bst.pygasus.session': 'bst',
+    'bst.pygasus.wsgi': 'bst',
+    'btable_py': 'btable',
+    'btce_api': 'btceapi',
+    'btce_bot': 'btcebot',
+    'btsync.py': 'btsync',
+    'buck.pprint': 'buck',
+    'bucket': 'libbucket',
+    'bud.nospam': 'bud',
+    'budy_api': 'budy',
+    'buffer_alpaca': 'buffer',
+    'bug.gd': 'buggd',
+    'bug_spots': 'bugspots',
+    'bugle_sites': 'bugle',
+    'bugs_everywhere': 'libbe',
+    'bugzillatools': 'bzlib',
+    'bugzscout_py': 'bugzscout',
+    'buildbot_slave': 'buildslave',
+    'buildbot_status_logentries': 'logentries',
+    'buildout.bootstrap': 'buildout',
+    'buildout.disablessl': 'buildout',
+    'buildout.dumppickedversions': 'buildout',
+    'buildout.dumppickedversions2': 'buildout',
+    'buildout.dumprequirements': 'buildout',
+    'buildout.eggnest': 'buildout',
+    'buildout.eggscleaner': 'buildout',
+    'buildout.eggsdirectories': 'buildout',
+    'buildout.eggtractor': 'buildout',
+    'buildout.extensionscripts': 'buildout',
+    'buildout.locallib': 'buildout',
+    'buildout.packagename': 'buildout',
+    'buildout.recipe.isolation': 'buildout',
+    'buildout.removeaddledeggs': 'buildout',
+    'buildout.requirements': 'buildout',
+    'buildout.sanitycheck': 'buildout',
+    'buildout.sendpickedversions': 'buildout',
+    'buildout.threatlevel': 'buildout',
+    'buildout.umask': 'buildout',
+    'buildout.variables': 'buildout',
+    'buildout_versions_checker': 'bvc',
+    'buildtools': 'balrog',
+    'bumper_lib': 'bumper',
+    'bumple_downloader': 'bumple',
+    'bundesliga_cli': 'bundesliga',
+    'bundlemanager': 'bundlemaker',
+    'burp_ui': 'burpui',
+    'burrito_fillings': 'bfillings',
+    'busyflow.pivotal': 'busyflow',
+    'buttercms_django': 'buttercms_django',
+    'buzz_python_client': 'buzz',
+    'bvg_grabber': 'bvggrabber',
+    'bw_stats_toolkit': 'stats_toolkit',
+    'bzr': 'bzrlib',
+    'bzr_automirror': 'bzrlib',
+    'bzr_bash_completion': 'bzrlib',
+    'bzr_colo': 'bzrlib',
+    'bzr_killtrailing': 'bzrlib',
+    'bzr_pqm': 'bzrlib',
+    'c2c.cssmin': 'c2c',
+    'c2c.recipe.closurecompile': 'c2c',
+    'c2c.recipe.cssmin': 'c2c',
+    'c2c.recipe.facts': 'c2c_recipe_facts',
+    'c2c.recipe.jarfile': 'c2c',
+    'c2c.recipe.msgfmt': 'c2c',
+    'c2c.recipe.pkgversions': 'c2c',
+    'c2c.sqlalchemy.rest': 'c2c',
+    'c2c.versions': 'c2c',
+    'c8d': 'chip8',
+    'cabalgata_silla_de_montar': 'cabalgata',
+    'cabalgata_zookeeper': 'cabalgata',
+    'cashew': 'output',
+    'cassandra_driver': 'cassandra',
+    'cerebrod': 'tasksitter',
+    'cfn_lint': 'cfnlint',
+    'charm_tools': 'charmtools',
+    'chartio': 'version',
+    'configobj': 'validate',
+    'couchdb_python_curl': 'couchdbcurl',
+    'coursera_dl': 'courseradownloader',
+    'cow_framework': 'cow',
+    'cssutils': 'encutils',
+    'ctypes_snappy': 'snappy',
+    'datazilla': 'dzclient',
+    'dict.sorted': 'sdict',
+    'django_admin_sortable': 'adminsortable',
+    'django_admin_tools': 'admin_tools',
+    'django_allowedsites': 'allowedsites',
+    'django_appconf': 'appconf',
+    'django_appdata': 'app_data',
+    'django_bower': 'djangobower',
+    'django_braces': 'braces',
+    'django_cache_utils': 'cache_utils',
+    'django_celery': 'djcelery',
+    'django_classy_tags': 'classytags',
+    'django_cms': 'cms',
+    'django_compressor': 'compressor',
+    'django_crispy_forms': 'crispy_forms',
+    'django_durationfield': 'durationfield',
+    'django_followit': 'followit',
+    'django_formtools': 'formtools',
+    'django_getenv': 'getenv',
+    'django_haystack': 'haystack',
+    'django_hvad': 'hvad',
+    'django_jsonfield': 'jsonfield',
+    'django_keyedcache': 'keyedcache',
+    'django_kombu': 'djkombu',
+    'django_model_utils': 'model_utils',
+    'django_mptt': 'mptt',
+    'django_native_tags': 'native_tags',
+    'django_oauth2_provider': 'provider',
+    'django_paintstore': 'paintstore',
+    'django_parler': 'parler',
+    'django_picklefield': 'picklefield',
+    'django_polymorphic': 'polymorphic',
+    'django_prefetch': 'prefetch',
+    'django_quickapi': 'quickapi',
+    'django_recaptcha': 'captcha',
+    'django_recaptcha_works': 'recaptcha_works',
+    'django_reportapi': 'reportapi',
+    'django_reversion': 'reversion',
+    'django_robots': 'robots',
+    'django_sekizai': 'sekizai',
+    'django_storages': 'storages',
+    'django_taggit': 'taggit',
+    'django_tastypie': 'tastypie',
+    'django_threaded_multihost': 'threaded_multihost',
+    'django_treebeard': 'treebeard',
+    'djangorestframework': 'rest_framework',
+    'djorm_ext_pgarray': 'djorm_pgarray',
+    'dnspython': 'dns',
+    'docker_compose': 'compose',
+    'docker_py': 'docker',
+    'dogapi': 'dogshell',
+    'dogpile.cache': 'dogpile',
+    'dogpile.core': 'dogpile',
+    'dogstatsd_python': 'statsd',
+    'dpkt_fix': 'dpkt',
+    'easybuild_framework': 'easybuild',
+    'edgegrid_python': 'akamai',
+    'elasticsearch_curator': 'curator',
+    'empy': 'emlib',
+    'enum34': 'enum',
+    'ez_setup': 'distribute_setup',
+    'filedepot': 'depot',
+    'five.customerize': 'five',
+    'five.globalrequest': 'five',
+    'five.intid': 'five',
+    'five.localsitemanager': 'five',
+    'five.pt': 'five',
+    'forked_path': 'path',
+    'freetype_py': 'freetype',
+    'ftp_cloudfs': 'ftpcloudfs',
+    'fusepy': 'fuse',
+    'future': 'winreg',
+    'futures': 'concurrent',
+    'gdata': 'atom',
+    'generateDS': 'libgenerateDS',
+    'geonode_avatar': 'avatar',
+    'gevent_socketio': 'socketio',
+    'gevent_websocket': 'geventwebsocket',
+    'git_py': 'gitpy',
+    'globusonline_transfer_api_client': 'globusonline',
+    'gnureadline': 'readline',
+    'google_api_python_client': 'googleapiclient',
+    'google_apitools': 'apitools',
+    'grace_dizmo': 'grace_dizmo',
+    'graphenelib': 'grapheneapi',
+    'grokcore.component': 'grokcore',
+    'gsconfig': 'geoserver',
+    'gsutil': 'gslib',
+    'hg_git': 'hggit',
+    'impyla': 'impala',
+    'ipython': 'IPython',
+    'jaraco.timing': 'jaraco',
+    'jaraco.util': 'jaraco',
+    'jira_cli': 'jiracli',
+    'johnny_cache': 'johnny',
+    'juju_deployer': 'deployer',
+    'jupyter_pip': 'jupyterpip',
+    'kickstart': 'kickstarter',
+    'krbv': 'krbV',
+    'kss.core': 'kss',
+    'lava_utils_interface': 'lava',
+    'lazr.authentication': 'lazr',
+    'lazr.restfulclient': 'lazr',
+    'lazr.uri': 'lazr',
+    'libmagic': 'pymagic',
+    'librabbitmq': 'funtests',
+    'libsass': 'sassutils',
+    'line_profiler': 'kernprof',
+    'lisa_server': 'lisa',
+    'locustio': 'locust',
+    'logilab_mtconverter': 'logilab',
+    'marionette_client': 'marionette',
+    'mercurial': 'hgext',
+    'metlog_py': 'metlog',
+    'minitage.paste': 'minitage',
+    'minitage.recipe.common': 'minitage',
+    'mitmproxy': 'libmproxy',
+    'mockredispy': 'mockredis',
+    'moksha.common': 'moksha',
+    'moksha.hub': 'moksha',
+    'moksha.wsgi': 'moksha',
+    'mox': 'stubout',
+    'mr.bob': 'mrbob',
+    'msgpack_python': 'msgpack',
+    'mysql_connector_repackaged': 'mysql',
+    'ndg_httpsclient': 'ndg',
+    'nose_quickunit': 'quickunit',
+    'nosehtmloutput': 'htmloutput',
+    'nwdiag': 'rackdiag',
+    'oauth2client': 'oauth2client',
+    'odfpy': 'odf',
+    'oslo.i18n': 'oslo_i18n',
+    'oslo.serialization': 'oslo_serialization',
+    'oslo.utils': 'oslo_utils',
+    'paho_mqtt': 'paho',
+    'path.py': 'path',
+    'patricia_trie': 'patricia',
+    'peewee': 'pwiz',
+    'pexpect': 'screen',
+    'pies2overrides': 'xmlrpc',
+    'pisa': 'sx',
+    'pivotal_py': 'pivotal',
+    'plivo': 'plivoxml',
+    'plone.alterego': 'plone',
+    'plone.api': 'plone',
+    'plone.app.blob': 'plone',
+    'plone.app.collection': 'plone',
+    'plone.app.content': 'plone',
+    'plone.app.contentlisting': 'plone',
+    'plone.app.contentmenu': 'plone',
+    'plone.app.contentrules': 'plone',
+    'plone.app.contenttypes': 'plone',
+    'plone.app.controlpanel': 'plone',
+    'plone.app.customerize': 'plone',
+    'plone.app.dexterity': 'plone',
+    'plone.app.discussion': 'plone',
+    'plone.app.event': 'plone',
+    'plone.app.folder': 'plone',
+    'plone.app.i18n': 'plone',
+    'plone.app.imaging': 'plone',
+    'plone.app.intid': 'plone',
+    'plone.app.layout': 'plone',
+    'plone.app.linkintegrity': 'plone',
+    'plone.app.locales': 'plone',
+    'plone.app.lockingbehavior': 'plone',
+    'plone.app.multilingual': 'plone',
+    'plone.app.portlets': 'plone',
+    'plone.app.querystring': 'plone',
+    'plone.app.redirector': 'plone',
+    'plone.app.registry': 'plone',
+    'plone.app.relationfield': 'plone',
+    'plone.app.textfield': 'plone',
+    'plone.app.theming': 'plone',
+    'plone.app.users': 'plone',
+    'plone.app.uuid': 'plone',
+    'plone.app.versioningbehavior': 'plone',
+    'plone.app.viewletmanager': 'plone',
+    'plone.app.vocabularies': 'plone',
+    'plone.app.widgets': 'plone',
+    'plone.app.workflow': 'plone',
+    'plone.app.z3cform': 'plone',
+    'plone.autoform': 'plone',
+    'plone.batching': 'plone',
+    'plone.behavior': 'plone',
+    'plone.browserlayer': 'plone',
+    'plone.caching': 'plone',
+    'plone.contentrules': 'plone',
+    'plone.dexterity': 'plone',
+    'plone.event': 'plone',
+    'plone.folder': 'plone',
+    'plone.formwidget.namedfile': 'plone',
+    'plone.formwidget.recurrence': 'plone',
+    'plone.i18n': 'plone',
+    'plone.indexer': 'plone',
+    'plone.intelligenttext': 'plone',
+    'plone.keyring': 'plone',
+    'plone.locking': 'plone',
+    'plone.memoize': 'plone',
+    'plone.namedfile': 'plone',
+    'plone.outputfilters': 'plone',
+    'plone.portlet.collection': 'plone',
+    'plone.portlet.static': 'plone',
+    'plone.portlets': 'plone',
+    'plone.protect': 'plone',
+    'plone.recipe.zope2install': 'plone',
+    'plone.registry': 'plone',
+    'plone.resource': 'plone',
+    'plone.resourceeditor': 'plone',
+    'plone.rfc822': 'plone',
+    'plone.scale': 'plone',
+    'plone.schema': 'plone',
+    'plone.schemaeditor': 'plone',
+    'plone.session': 'plone',
+    'plone.stringinterp': 'plone',
+    'plone.subrequest': 'plone',
+    'plone.supermodel': 'plone',
+    'plone.synchronize': 'plone',
+    'plone.theme': 'plone',
+    'plone.transformchain': 'plone',
+    'plone.uuid': 'plone',
+    'plone.z3cform': 'plone',
+    'plonetheme.barceloneta': 'plonetheme',
+    'progressbar2': 'progressbar',
+    'progressbar33': 'progressbar',
+    'protobuf': 'google',
+    'pure_sasl': 'puresasl',
+    'pyAMI_core': 'pyAMI',
+    'pyDHTMLParser': 'dhtmlparser',
+    'pyOpenSSL': 'OpenSSL',
+    'pyScss': 'scss',
+    'pyTelegramBotAPI': 'telebot',
+    'py_Asterisk': 'Asterisk',
+    'py_moneyed': 'moneyed',
+    'py_restclient': 'restclient',
+    'pybbm': 'pybb',
+    'pybloomfiltermmap': 'pybloomfilter',
+    'pycassa': 'ez_setup',
+    'pycryptodome': 'Crypto',
+    'pycryptodomex': 'Cryptodome',
+    'pycups': 'cups',
+    'pycurl': 'curl',
+    'pydot': 'dot_parser',
+    'pydot2': 'dot_parser',
+    'pydot3k': 'dot_parser',
+    'pyelftools': 'elftools',
+    'pyenchant': 'enchant',
+    'pyephem': 'ephem',
+    'pyforge': 'forge',
+    'pygeocoder': 'pygeolib',
+    'pyjon.utils': 'pyjon',
+    'pylzma': 'py7zlib',
+    'pymavlink': 'mavnative',
+    'pymeshio': 'blender26_meshio',
+    'pymongo': 'gridfs',
+    'pypng': 'png',
+    'pysaml2': 'xmlenc',
+    'pysendfile': 'sendfile',
+    'pyserial': 'serial',
+    'pyshp': 'shapefile',
+    'pysingleton': 'singleton',
+    'pysqlite': 'pysqlite2',
+    'pystick': 'SCons',
+    'pytabix': 'test',
+    'pytest_marks': 'marks',
+    'pytest_xdist': 'xdist',
+    'python_Levenshtein': 'Levenshtein',
+    'python_amazon_simple_product_api': 'amazon',
+    'python_bcrypt': 'bcrypt',
+    'python_bugzilla': 'bugzilla',
+    'python_cjson': 'cjson',
+    'python_cloudservers': 'cloudservers',
+    'python_creole': 'creole',
+    'python_crfsuite': 'pycrfsuite',
+    'python_crontab': 'crontab',
+    'python_daemon': 'daemon',
+    'python_dateutil': 'dateutil',
+    'python_debian': 'debian',
+    'python_decouple': 'decouple',
+    'python_digitalocean': 'digitalocean',
+    'python_dotenv': 'dotenv',
+    'python_editor': 'editor',
+    'python_engineio': 'engineio',
+    'python_fedora': 'fedora',
+    'python_frontmatter': 'frontmatter',
+    'python_geohash': 'quadtree',
+    'python_gettext': 'pythongettext',
+    'python_gflags': 'gflags',
+    'python_graph_core': 'pygraph',
+    'python_hglib': 'hglib',
+    'python_hostlist': 'hostlist',
+    'python_igraph': 'igraph',
+    'python_json_logger': 'pythonjsonlogger',
+    'python_jsonrpc': 'pyjsonrpc',
+    'python_keyczar': 'keyczar',
+    'python_keystoneclient': 'keystoneclient',
+    'python_ldap': 'ldif',
+    'python_magic': 'magic',
+    'python_memcached': 'memcache',
+    'python_mimeparse': 'mimeparse',
+    'python_modargs': 'modargs',
+    'python_mpv': 'mpv',
+    'python_novaclient': 'novaclient',
+    'python_openid': 'openid',
+    'python_postmark': 'postmark',
+    'python_stdnum': 'stdnum',
+    'python_swiftclient': 'swiftclient',
+    'python_termstyle': 'termstyle',
+    'python_tvrage': 'tvrage',
+    'python_twitter': 'twitter',
+    'pytidylib': 'tidylib',
+    'pyusb': 'usb',
+    'pywinrm': 'winrm',
+    'pyxdg': 'xdg',
+    'pyzmq': 'zmq',
+    'qserve': 'qs',
+    'radical.pilot': 'radical',
+    'radical.utils': 'radical',
+    'readability_lxml': 'readability',
+    'requirements_parser': 'requirements',
+    'rhaptos2.common': 'rhaptos2',
+    'robotframework': 'robot',
+    'rosdep': 'rosdep2',
+    'ruamel.base': 'ruamel',
+    's3cmd': 'S3',
+    'saga_python': 'saga',
+    'scales': 'greplin',
+    'scalr': 'scalrtools',
+    'scikit_bio': 'skbio',
+    'scikit_learn': 'sklearn',
+    'scikits.talkbox': 'scikits',
+    'scratchpy': 'scratch',
+    'slackclient': 'slack',
+    'smk_python_sdk': 'smarkets',
+    'sockjs_tornado': 'sockjs',
+    'solrpy': 'solr',
+    'sorl_thumbnail': 'sorl',
+    'sphinxcontrib_programoutput': 'sphinxcontrib',
+    'sqlalchemy_migrate': 'migrate',
+    'suds_jurko': 'suds',
+    'teamcity_messages': 'teamcity',
+    'tff': 'ctff',
+    'tg.devtools': 'devtools',
+    'tiddlyweb': 'gabbi',
+    'tiddlywebwiki': 'wikklytext',
+    'topzootools': 'TopZooTools',
+    'toredis_fork': 'toredis',
+    'tornado_redis': 'tornadoredis',
+    'transifex_client': 'txclib',
+    'treeherder_client': 'thclient',
+    'trytond_nereid': 'nereid',
+    'trytond_stock': 'trytond',
+    'tsuru_circus': 'tsuru',
+    'tw2.core': 'tw2',
+    'tw2.d3': 'tw2',
+    'tw2.dynforms': 'tw2',
+    'tw2.excanvas': 'tw2',
+    'tw2.forms': 'tw2',
+    'tw2.jit': 'tw2',
+    'tw2.jqplugins.flot': 'tw2',
+    'tw2.jqplugins.gritter': 'tw2',
+    'tw2.jqplugins.ui': 'tw2',
+    'tw2.jquery': 'tw2',
+    'tw2.sqla': 'tw2',
+    'tweepy': 'examples',
+    'uWSGI': 'uwsgidecorators',
+    'unicode_slugify': 'slugify',
+    'useless.pipes': 'useless',
+    'virtualenv_clone': 'clonevirtualenv',
+    'vnc2flv': 'flvscreen',
+    'weblogo': 'weblogolib',
+    'websocket_client': 'websocket',
+    'webunit': 'demo',
+    'wheezy.caching': 'wheezy',
+    'wheezy.core': 'wheezy',
+    'wheezy.http': 'wheezy',
+    'wtf_peewee': 'wtfpeewee',
+    'xmpppy': 'xmpp',
+    'z3c.autoinclude': 'z3c',
+    'z3c.caching': 'z3c',
+    'z3c.form': 'z3c',
+    'z3c.formwidget.query': 'z3c',
+    'z3c.objpath': 'z3c',
+    'z3c.pt': 'z3c',
+    'z3c.relationfield': 'z3c',
+    'z3c.traverser': 'z3c',
+    'z3c.zcmlhook': 'z3c',
+    'zopyx.textindexng3': 'zopyx',
+}
@@ -0,0 +1,203 @@
+from __future__ import absolute_import
+
+import json
+import os
+import subprocess
+import sys
+
+import six
+
+from treeshaker.cache_utils import atomic_write
+from treeshaker.parallel_utils import normalize_path
+
+
+INDEX_NAME = 'affected-index.json'
+INDEX_VERSION = 1
+
+
+class ReverseIndex(object):
+    """
+    Persisted map from the files each target was built from to the targets,
+    used to find the targets affected by a set of changed files without
+    constructing any module graphs.
+
+    The inputs of a target are the files of the modules in its closure, its
+    requirements file, readme and package data, and the directories of its
+    ``source_paths``. Paths below ``root`` are stored relative to it, so the
+    index stays valid when the checkout is moved.
+
+    Parameters
+    ----------
+    fname : str
+        The index file. It need not exist yet.
+    root : str
+        The directory paths are stored relative to, usually the directory
+        containing the config file.
+
+    Examples
+    --------
+    >>> import os, tempfile
+    >>> from treeshaker.affected_utils import ReverseIndex
+    >>> root = tempfile.mkdtemp()
+    >>> index = ReverseIndex(os.path.join(root, 'index.json'), root)
+    >>> index.update('pkg.a', files=[os.path.join(root, 'pkg', 'a.py'),
+    ...                              os.path.join(root, 'pkg', 'common.py')])
+    >>> index.update('pkg.b', files=[os.path.join(root, 'pkg', 'b.py'),
+    ...                              os.path.join(root, 'pkg', 'common.py')],
+    ...              dirs=[os.path.join(root, 'localdep')])
+    >>> index.save()
+    >>> index = ReverseIndex(os.path.join(root, 'index.json'), root)
+    >>> targets = ['pkg.a', 'pkg.b', 'pkg.c']
+    >>> index.affected([os.path.join(root, 'pkg', 'a.py')], targets)
+    ['pkg.a', 'pkg.c']
+    >>> index.affected([os.path.join(root, 'pkg', 'common.py')], ['pkg.a'])
+    ['pkg.a']
+    >>> index.affected([os.path.join(root, 'localdep', 'x.py')], ['pkg.b'])
+    ['pkg.b']
+    >>> index.affected([os.path.join(root, 'README.md')], ['pkg.a', 'pkg.b'])
+    []
+    """
+    def __init__(self, fname, root):
+        self.fname = fname
+        self.root = normalize_path(root)
+        self.targets = {}
+        if os.path.exists(fname):
+            try:
+                with open(fname, 'r') as handle:
+                    data = json.load(handle)
+            except ValueError:
+                data = {}
+            if data.get('version') == INDEX_VERSION:
+                self.targets = data['targets']
+        self._reverse = None
+
+    def _relative(self, path):
+        path = normalize_path(path)
+        if path.startswith(self.root + os.sep):
+            return os.path.relpath(path, self.root)
+        return path
+
+    def _absolute(self, path):
+        return normalize_path(os.path.join(self.root, path))
+
+    def update(self, target, files=(), dirs=()):
+        """
+        Records the inputs of a target, replacing the previous record.
+        """
+        self.targets[target] = {
+            'files': sorted(set(self._relative(f) for f in files)),
+            'dirs': sorted(set(self._relative(d) for d in dirs)),
+        }
+        self._reverse = None
+
+    def save(self):
+        if not os.path.exists(os.path.dirname(self.fname)):
+            os.makedirs(os.path.dirname(self.fname))
+        data = {'version': INDEX_VERSION, 'targets': self.targets}
+        atomic_write(self.fname, json.dumps(data, indent=1, sort_keys=True)
+                     .encode('utf-8'))
+
+    def reverse(self):
+        """
+        Returns a dict mapping each absolute input file to the set of targets
+        built from it.
+        """
+        if self._reverse is None:
+            self._reverse = {}
+            for target, entry in self.targets.items():
+                for f in entry['files']:
+                    self._reverse.setdefault(self._absolute(f), set()) \
+                        .add(target)
+        return self._reverse
+
+    def affected(self, changed, targets):
+        """
+        Returns the targets affected by changed files.
+
+        Parameters
+        ----------
+        changed : iterable of str
+            The changed files.
+        targets : list of str
+            The targets to consider. Targets missing from the index are always
+            considered affected.
+
+        Returns
+        -------
+        list of str
+            The affected targets, in the order of ``targets``.
+        """
+        changed = set(normalize_path(p) for p in changed)
+        reverse = self.reverse()
+        hit = set()
+        for path in changed:
+            hit.update(reverse.get(path, ()))
+        for target, entry in self.targets.items():
+            dirs = [self._absolute(d) + os.sep for d in entry['dirs']]
+            if any(path.startswith(d) for path in changed for d in dirs):
+                hit.add(target)
+        return [t for t in targets if t in hit or t not in self.targets]
+
+
+def git_changed_files(ref, cwd=None):
+    """
+    Lists the files that differ between a git ref and the working tree,
+    including untracked files.
+
+    Parameters
+    ----------
+    ref : str
+        The git ref to compare against, for example ``origin/main`` or
+        ``HEAD~1``.
+    cwd : str, optional
+        A directory inside the git checkout.
+
+    Returns
+    -------
+    list of str
+        Absolute paths of the changed files.
+    """
+    def git(cwd, *args):
+        output = subprocess.check_output(('git',) + args, cwd=cwd or None)
+        return output.decode('utf-8').splitlines()
+
+    toplevel = git(cwd, 'rev-parse', '--show-toplevel')[0]
+    paths = git(toplevel, 'diff', '--name-only', '--no-renames', ref, '--') + \
+        git(toplevel, 'ls-files', '--others', '--exclude-standard')
+    return [os.path.join(toplevel, p) for p in paths if p]
+
+
+def collect_changed_files(changed=None, changed_since=None, cwd=None):
+    """
+    Combines the changed files passed on the command line with the files
+    changed since a git ref.
+
+    Parameters
+    ----------
+    changed : str or list of str, optional
+        Changed files. Strings may contain several comma-separated paths.
+        ``'-'`` (or True, which is what fire passes for ``--changed -``)
+        reads newline-separated paths from stdin.
+    changed_since : str, optional
+        A git ref to compare the working tree against.
+    cwd : str, optional
+        A directory inside the git checkout.
+
+    Returns
+    -------
+    list of str
+        The changed files.
+    """
+    if changed is True:
+        changed = ['-']
+    elif isinstance(changed, six.string_types):
+        changed = changed.split(',')
+    paths = []
+    for path in changed or ():
+        if path == '-':
+            paths.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            paths.append(path)
+    if changed_since:
+        paths.extend(git_changed_files(changed_since, cwd=cwd))
+    return paths
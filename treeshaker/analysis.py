@@ -0,0 +1,267 @@
+from __future__ import absolute_import
+
+import json
+import os
+import sys
+from collections import OrderedDict
+
+from treeshaker.cache_utils import atomic_write
+
+
+ANALYSIS_VERSION = 1
+
+GRAPH_SUFFIX = '.graph'
+
+
+class Analysis(object):
+    """
+    The result of analyzing the module import graph for one target: the
+    modules in its closure, their new names, the external modules it imports
+    together with the requirements they were matched to, and the import edges
+    between these modules.
+
+    Analyses are saved as compact versioned JSON files and can be loaded
+    without constructing a module graph.
+
+    Parameters
+    ----------
+    target : str
+        The name of the target module.
+    modules : list of (str, str, str, int) tuples
+        For each module in the closure, its name, its new name in the output,
+        its source file and the size of the source file in bytes.
+    external_modules : dict
+        Map from the name of each external module to the requirement line it
+        was matched to.
+    edges : list of (str, str) tuples
+        The imports between the modules, as ``(importer, imported)`` names.
+
+    Examples
+    --------
+    >>> import os, tempfile
+    >>> from treeshaker.analysis import Analysis
+    >>> a = Analysis('pkg.app', [('pkg.app', 'app', 'pkg/app.py', 100),
+    ...                          ('pkg.util', 'util', 'pkg/util.py', 20)],
+    ...              {'six': 'six==1.14.0'},
+    ...              [('pkg.app', 'pkg.util'), ('pkg.util', 'six')])
+    >>> fname = os.path.join(tempfile.mkdtemp(), 'pkg.app.graph')
+    >>> a.save(fname)
+    >>> b = Analysis.load(fname)
+    >>> b.revealed_bytes, b.requirements
+    (120, ['six==1.14.0'])
+    >>> b.references('pkg.util'), b.referrers('pkg.util')
+    (['six'], ['pkg.app'])
+    """
+    def __init__(self, target, modules, external_modules, edges):
+        self.target = target
+        self.modules = OrderedDict(
+            (name, {'new_name': new_name, 'filename': filename,
+                    'bytes': size})
+            for name, new_name, filename, size in sorted(modules))
+        self.external_modules = OrderedDict(sorted(external_modules.items()))
+        self.edges = sorted(set(tuple(e) for e in edges))
+        self._references = None
+        self._referrers = None
+
+    @property
+    def requirements(self):
+        """
+        The sorted requirement lines of the external modules.
+        """
+        return sorted(set(self.external_modules.values()))
+
+    @property
+    def revealed_bytes(self):
+        """
+        The total size of the source files of the modules in the closure.
+        """
+        return sum(m['bytes'] for m in self.modules.values())
+
+    def _index(self):
+        if self._references is None:
+            self._references = {}
+            self._referrers = {}
+            for a, b in self.edges:
+                self._references.setdefault(a, []).append(b)
+                self._referrers.setdefault(b, []).append(a)
+
+    def references(self, name):
+        """
+        Returns the sorted names of the modules that a module imports.
+        """
+        self._index()
+        return sorted(self._references.get(name, []))
+
+    def referrers(self, name):
+        """
+        Returns the sorted names of the modules that import a module.
+        """
+        self._index()
+        return sorted(self._referrers.get(name, []))
+
+    @classmethod
+    def from_closure(cls, mg, target, our_mods, external_mods, req_index,
+                     old_name_to_new_name):
+        """
+        Builds an analysis from the output of ``find_closure()``.
+
+        Parameters
+        ----------
+        mg : ModuleGraph or CachedModuleGraph
+            The module import graph.
+        target : str
+            The name of the target module.
+        our_mods, external_mods : set of Node
+            The modules in the closure and the external modules.
+        req_index : PrefixIndex
+            The index used to match external modules to requirements.
+        old_name_to_new_name : dict
+            The new name of each module in the closure.
+        """
+        names = set(m.identifier for m in our_mods) | \
+            set(m.identifier for m in external_mods)
+        modules = [(m.identifier, old_name_to_new_name[m.identifier],
+                    m.filename,
+                    os.path.getsize(m.filename) if m.filename else 0)
+                   for m in our_mods]
+        external = dict((m.identifier, req_index.get(m.identifier).line)
+                        for m in external_mods)
+        edges = [(m.identifier, ref.identifier)
+                 for m in our_mods for ref in mg.getReferences(m)
+                 if ref.identifier in names]
+        return cls(target, modules, external, edges)
+
+    def to_dict(self):
+        # edges refer to modules by their index in modules + external
+        names = list(self.modules) + list(self.external_modules)
+        index = dict((name, i) for i, name in enumerate(names))
+        return {
+            'version': ANALYSIS_VERSION,
+            'target': self.target,
+            'modules': [[name, m['new_name'], m['filename'], m['bytes']]
+                        for name, m in self.modules.items()],
+            'external': [[name, req]
+                         for name, req in self.external_modules.items()],
+            'edges': [[index[a], index[b]] for a, b in self.edges],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != ANALYSIS_VERSION:
+            raise ValueError('unsupported graph file version %r, expected %i'
+                             % (data.get('version'), ANALYSIS_VERSION))
+        names = [m[0] for m in data['modules']] + \
+            [e[0] for e in data['external']]
+        return cls(data['target'], [tuple(m) for m in data['modules']],
+                   dict(data['external']),
+                   [(names[a], names[b]) for a, b in data['edges']])
+
+    def save(self, fname):
+        atomic_write(fname, json.dumps(self.to_dict(), separators=(',', ':'),
+                                       sort_keys=True).encode('utf-8'))
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname, 'r') as handle:
+            return cls.from_dict(json.load(handle))
+
+
+def diff_analyses(old, new):
+    """
+    Compares two analyses of the same target.
+
+    Returns
+    -------
+    dict
+        The sorted lists ``'modules_added'``, ``'modules_removed'``,
+        ``'requirements_added'`` and ``'requirements_removed'``, and the
+        revealed bytes ``'bytes_old'`` and ``'bytes_new'``.
+
+    Examples
+    --------
+    >>> from treeshaker.analysis import Analysis, diff_analyses
+    >>> old = Analysis('app', [('app', 'app', 'app.py', 10)], {}, [])
+    >>> new = Analysis('app', [('app', 'app', 'app.py', 12),
+    ...                        ('util', 'util', 'util.py', 5)],
+    ...                {'six': 'six==1.14.0'}, [('app', 'util')])
+    >>> d = diff_analyses(old, new)
+    >>> d['modules_added'], d['requirements_added'], d['bytes_new']
+    (['util'], ['six==1.14.0'], 17)
+    """
+    return {
+        'modules_added': sorted(set(new.modules) - set(old.modules)),
+        'modules_removed': sorted(set(old.modules) - set(new.modules)),
+        'requirements_added': sorted(set(new.requirements) -
+                                     set(old.requirements)),
+        'requirements_removed': sorted(set(old.requirements) -
+                                       set(new.requirements)),
+        'bytes_old': old.revealed_bytes,
+        'bytes_new': new.revealed_bytes,
+    }
+
+
+def format_diff(target, diff, old, new):
+    """
+    Renders the output of ``diff_analyses()`` as lines of text.
+    """
+    lines = []
+    for name in diff['modules_added']:
+        lines.append('+ module %s (%i bytes)'
+                     % (name, new.modules[name]['bytes']))
+    for name in diff['modules_removed']:
+        lines.append('- module %s (%i bytes)'
+                     % (name, old.modules[name]['bytes']))
+    lines.extend('+ requirement %s' % r for r in diff['requirements_added'])
+    lines.extend('- requirement %s' % r for r in diff['requirements_removed'])
+    change = diff['bytes_new'] - diff['bytes_old']
+    if lines or change:
+        lines.append('revealed bytes: %i -> %i (%+i)'
+                     % (diff['bytes_old'], diff['bytes_new'], change))
+    return ['%s:' % target] + ['  ' + line for line in lines] \
+        if lines else []
+
+
+def _graph_files(path):
+    return dict((f[:-len(GRAPH_SUFFIX)], os.path.join(path, f))
+                for f in os.listdir(path) if f.endswith(GRAPH_SUFFIX))
+
+
+def diff_graphs(old, new):
+    """
+    Shows which modules and requirements entered or left the closure of each
+    target between two builds, and the change in the total size of the
+    modules in the closure. Exits with status 1 if anything changed.
+
+    Parameters
+    ----------
+    old, new : str
+        Graph files written by ``treeshaker --export_graph``, or directories
+        of them, in which case the targets present in either are compared.
+    """
+    if os.path.isdir(old) and os.path.isdir(new):
+        old_files = _graph_files(old)
+        new_files = _graph_files(new)
+        pairs = [(t, old_files.get(t), new_files.get(t))
+                 for t in sorted(set(old_files) | set(new_files))]
+    else:
+        pairs = [(None, old, new)]
+    changed = False
+    for target, old_file, new_file in pairs:
+        if old_file is None or new_file is None:
+            print('%s: %s target' % (target, 'new' if old_file is None
+                                     else 'removed'))
+            changed = True
+            continue
+        old_analysis = Analysis.load(old_file)
+        new_analysis = Analysis.load(new_file)
+        if target is None:
+            target = old_analysis.target
+            if new_analysis.target != target:
+                target += ' -> ' + new_analysis.target
+        lines = format_diff(target, diff_analyses(old_analysis, new_analysis),
+                            old_analysis, new_analysis)
+        if lines:
+            changed = True
+            print('\n'.join(lines))
+    if changed:
+        sys.exit(1)
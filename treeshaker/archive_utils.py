@@ -0,0 +1,464 @@
+from __future__ import absolute_import
+
+import base64
+import csv
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import six
+
+from treeshaker.cache_utils import hash_bytes, hash_file
+from treeshaker.manifest import Manifest
+
+
+OUTPUT_FORMATS = ('dir', 'wheel', 'zip', 'tar.gz', 'zipapp')
+
+# the interpreter line of zipapps
+ZIPAPP_INTERPRETER = '/usr/bin/env python3'
+
+# the version of the generated distributions, the same as in setup.py
+WHEEL_VERSION = '0.0.0'
+
+# 1980-01-01, the earliest timestamp a zip file can store, used for all
+# entries unless SOURCE_DATE_EPOCH is set
+DEFAULT_EPOCH = 315532800
+
+# the manifest entry recording the archive itself
+ARCHIVE_KEY = ''
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def source_date_epoch():
+    """
+    Returns the timestamp stored for every archive entry: the
+    ``SOURCE_DATE_EPOCH`` environment variable if it is set, otherwise
+    1980-01-01.
+    """
+    return int(os.environ.get('SOURCE_DATE_EPOCH', DEFAULT_EPOCH))
+
+
+def wheel_name(name):
+    """
+    Escapes a distribution name for use in wheel file names (PEP 427).
+
+    Examples
+    --------
+    >>> from treeshaker.archive_utils import wheel_name
+    >>> wheel_name('build-target')
+    'build_target'
+    """
+    return re.sub(r'[^\w.]+', '_', name)
+
+
+def python_tag():
+    return 'py%i' % sys.version_info[0]
+
+
+def dist_info_dir(name):
+    return '%s-%s.dist-info' % (wheel_name(name), WHEEL_VERSION)
+
+
+def archive_path(dest_dir, output_format, name):
+    """
+    Returns the archive a target with a non-``dir`` ``output_format`` is
+    built into.
+
+    Zip and tar archives and zipapps (``.pyz``) are named after the outdir.
+    Wheels are written next to the outdir, named as required by PEP 427.
+
+    Examples
+    --------
+    >>> from treeshaker.archive_utils import archive_path
+    >>> archive_path('out/build_target', 'tar.gz', 'build_target')
+    'out/build_target.tar.gz'
+    >>> archive_path('out/build_target', 'zipapp', 'build_target')
+    'out/build_target.pyz'
+    >>> archive_path('out/build_target', 'wheel', 'build_target')
+    ... # doctest: +ELLIPSIS
+    'out/build_target-0.0.0-py...-none-any.whl'
+    """
+    dest_dir = dest_dir.rstrip(os.sep)
+    if output_format == 'wheel':
+        return os.path.join(os.path.dirname(dest_dir), '%s-%s-%s-none-any.whl'
+                            % (wheel_name(name), WHEEL_VERSION, python_tag()))
+    if output_format == 'zipapp':
+        return dest_dir + '.pyz'
+    return '%s.%s' % (dest_dir, output_format)
+
+
+def format_zipapp_main(module_name):
+    """
+    Renders the ``__main__.py`` of a zipapp, which runs the target module as a
+    script.
+
+    Examples
+    --------
+    >>> from treeshaker.archive_utils import format_zipapp_main
+    >>> print(format_zipapp_main('build_target.target'))
+    # generated by treeshaker
+    import runpy
+    runpy.run_module('build_target.target', run_name='__main__', alter_sys=True)
+    <BLANKLINE>
+    """
+    return ''.join([
+        '# generated by treeshaker\n',
+        'import runpy\n',
+        'runpy.run_module(%r, run_name=\'__main__\', alter_sys=True)\n'
+        % module_name,
+    ])
+
+
+def format_wheel_metadata(name, reqs, description=None):
+    """
+    Renders the ``METADATA`` file of a wheel. Pinned external requirements
+    become lower bounds, as in the generated ``setup.py``.
+
+    Examples
+    --------
+    >>> from collections import namedtuple
+    >>> from treeshaker.archive_utils import format_wheel_metadata
+    >>> Req = namedtuple('Req', ['line'])
+    >>> print(format_wheel_metadata('pkg', [Req('six==1.14.0')]))
+    Metadata-Version: 2.1
+    Name: pkg
+    Version: 0.0.0
+    Summary: pkg
+    Requires-Dist: six>=1.14.0
+    <BLANKLINE>
+    """
+    lines = ['Metadata-Version: 2.1', 'Name: %s' % name,
+             'Version: %s' % WHEEL_VERSION, 'Summary: %s' % name]
+    lines.extend('Requires-Dist: %s' % r.line.replace('==', '>=')
+                 for r in sorted(reqs, key=lambda r: r.line))
+    if description:
+        lines.append('Description-Content-Type: text/markdown')
+        return '\n'.join(lines) + '\n\n' + description
+    return '\n'.join(lines) + '\n'
+
+
+def format_wheel_file():
+    return ('Wheel-Version: 1.0\nGenerator: treeshaker\n'
+            'Root-Is-Purelib: true\nTag: %s-none-any\n' % python_tag())
+
+
+class _HashingReader(object):
+    """
+    Wraps a file object, hashing and counting the bytes read from it.
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.handle.read(n)
+        self.hash.update(data)
+        self.size += len(data)
+        return data
+
+
+class _ZipSink(object):
+    def __init__(self, handle, epoch, interpreter=None):
+        import zipfile
+
+        if interpreter:
+            handle.write(b'#!' + interpreter.encode('utf-8') + b'\n')
+        self.zipfile = zipfile
+        self.archive = zipfile.ZipFile(handle, 'w', zipfile.ZIP_DEFLATED)
+        self.date_time = time.gmtime(max(epoch, DEFAULT_EPOCH))[:6]
+
+    def _info(self, arcname):
+        info = self.zipfile.ZipInfo(arcname, self.date_time)
+        info.compress_type = self.zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        info.create_system = 3
+        return info
+
+    def add_bytes(self, arcname, data):
+        self.archive.writestr(self._info(arcname), data)
+
+    def add_file(self, arcname, reader, size):
+        info = self._info(arcname)
+        if sys.version_info < (3, 6):
+            self.archive.writestr(info, reader.read())
+            return
+        with self.archive.open(info, 'w',
+                               force_zip64=size > self.zipfile.ZIP64_LIMIT) \
+                as handle:
+            shutil.copyfileobj(reader, handle, _CHUNK_SIZE)
+
+    def close(self):
+        self.archive.close()
+
+
+class _TarSink(object):
+    def __init__(self, handle, epoch):
+        import gzip
+        import tarfile
+
+        self.tarfile = tarfile
+        self.epoch = epoch
+        # no file name and a fixed mtime in the gzip header
+        self.gzip = gzip.GzipFile(filename='', mode='wb', fileobj=handle,
+                                  compresslevel=6, mtime=epoch)
+        self.archive = tarfile.open(fileobj=self.gzip, mode='w',
+                                    format=tarfile.PAX_FORMAT)
+
+    def _info(self, arcname, size):
+        info = self.tarfile.TarInfo(arcname)
+        info.size = size
+        info.mtime = self.epoch
+        info.mode = 0o644
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        return info
+
+    def add_bytes(self, arcname, data):
+        self.archive.addfile(self._info(arcname, len(data)),
+                             six.BytesIO(data))
+
+    def add_file(self, arcname, reader, size):
+        self.archive.addfile(self._info(arcname, size), reader)
+
+    def close(self):
+        self.archive.close()
+        self.gzip.close()
+
+
+def _open_archive(fname, output_format):
+    """
+    Opens an archive for reading, returning it and a function that reads an
+    entry from it.
+    """
+    if output_format == 'tar.gz':
+        import tarfile
+        archive = tarfile.open(fname, 'r:gz')
+        return archive, lambda arcname: archive.extractfile(arcname).read()
+    import zipfile
+    archive = zipfile.ZipFile(fname)
+    return archive, archive.read
+
+
+class ArchiveManifest(Manifest):
+    """
+    A ``Manifest`` for targets built into an archive instead of an outdir.
+
+    Files passed to ``write()`` are kept in memory and files passed to
+    ``copy_many()`` are streamed from their source, so nothing is staged on
+    disk. ``save()`` writes the archive with sorted entries, fixed timestamps
+    and permissions and no owner names, so building the same inputs always
+    produces the same bytes, and an archive whose bytes did not change is not
+    replaced. The inputs of each entry are recorded in a manifest next to the
+    archive, so that unchanged entries (in particular ``requirements.txt``)
+    are not regenerated; their contents are read back from the previous
+    archive.
+
+    Parameters
+    ----------
+    archive : str
+        The archive to build.
+    output_format : {'wheel', 'zip', 'tar.gz', 'zipapp'}
+        The archive format. Wheels also get a ``RECORD`` file, zipapps start
+        with an interpreter line and are executable.
+    prefix : str
+        A directory to place all entries in, for example the name of the
+        outdir. Paths are relative to it, so ``'../__main__.py'`` is placed at
+        the root.
+    check : bool
+        Pass True to only compare inputs against the manifest.
+
+    Examples
+    --------
+    >>> import os, tarfile, tempfile
+    >>> from treeshaker.archive_utils import ArchiveManifest
+    >>> fname = os.path.join(tempfile.mkdtemp(), 'out.tar.gz')
+    >>> m = ArchiveManifest(fname, 'tar.gz', prefix='out/')
+    >>> m.write('b.py', b'b = 1\\n', {'source': 'b'})
+    True
+    >>> m.write('a.py', b'a = 1\\n', {'source': 'a'})
+    True
+    >>> m.save()
+    >>> with tarfile.open(fname) as archive:
+    ...     archive.getnames()
+    ['out/a.py', 'out/b.py']
+    >>> m = ArchiveManifest(fname, 'tar.gz', prefix='out/')
+    >>> m.is_fresh('a.py', {'source': 'a'})
+    True
+    >>> m.write('b.py', b'b = 1\\n', {'source': 'b'})
+    False
+    >>> m.save()
+    >>> m.bytes_written
+    0
+
+    Entries of a wheel are placed in its package, and its ``.dist-info``
+    directory at the root:
+
+    >>> import zipfile
+    >>> from treeshaker.archive_utils import dist_info_dir, format_wheel_file
+    >>> fname = os.path.join(tempfile.mkdtemp(), 'out.whl')
+    >>> m = ArchiveManifest(fname, 'wheel', prefix='out/')
+    >>> m.write('a.py', b'a = 1\\n', {'source': 'a'})
+    True
+    >>> m.write('../%s/WHEEL' % dist_info_dir('out'),
+    ...         format_wheel_file().encode('utf-8'), {})
+    True
+    >>> m.save()
+    >>> with zipfile.ZipFile(fname) as archive:
+    ...     print('\\n'.join(archive.namelist()))
+    out/a.py
+    out-0.0.0.dist-info/WHEEL
+    out-0.0.0.dist-info/RECORD
+    """
+    def __init__(self, archive, output_format, prefix='', check=False):
+        dirname, basename = os.path.split(archive)
+        super(ArchiveManifest, self).__init__(
+            dirname or '.', check=check,
+            fname=os.path.join(dirname, '.%s.treeshaker-manifest.json'
+                               % basename))
+        self.archive = archive
+        self.output_format = output_format
+        self.prefix = prefix
+        self.sources = {}
+        entry = self.old.pop(ARCHIVE_KEY, None)
+        self.old_archive = entry
+        self.intact = entry is not None and super(
+            ArchiveManifest, self)._matches_output(ARCHIVE_KEY, entry)
+
+    def path(self, relpath):
+        if relpath == ARCHIVE_KEY:
+            return self.archive
+        return os.path.join(self.dest_dir, relpath)
+
+    def _matches_output(self, relpath, entry):
+        # entries are unchanged as long as the archive is
+        return self.intact
+
+    def write(self, relpath, data, inputs):
+        if self.check:
+            self.is_fresh(relpath, inputs)
+            return False
+        output = hash_bytes(data)
+        with self._lock:
+            self.sources[relpath] = data
+            self.new[relpath] = {'inputs': inputs, 'output': output}
+            if self.intact and \
+                    self.old.get(relpath, {}).get('output') == output:
+                self.skipped += 1
+                return False
+            self.written += 1
+        return True
+
+    def copy_many(self, items, strategy='copy', max_workers=None):
+        # the strategy does not apply, files are streamed into the archive
+        copied = [False] * len(items)
+        for i, (relpath, src, inputs) in enumerate(items):
+            fresh = self.is_fresh(relpath, inputs)
+            if self.check:
+                continue
+            with self._lock:
+                self.sources[relpath] = (src,)
+                if not fresh:
+                    self.new[relpath] = {'inputs': inputs, 'output': None}
+                    self.written += 1
+                    copied[i] = True
+        return copied
+
+    def prune(self):
+        removed = self.removed()
+        if self.check:
+            self.stale.extend(removed)
+        return removed
+
+    def _order(self):
+        entries = sorted(self.new)
+        if self.output_format != 'wheel':
+            return entries
+        # wheels conventionally end with their .dist-info directory
+        return [e for e in entries if '.dist-info/' not in e] + \
+            [e for e in entries if '.dist-info/' in e]
+
+    def _write_archive(self, handle):
+        if self.output_format == 'tar.gz':
+            sink = _TarSink(handle, source_date_epoch())
+        else:
+            sink = _ZipSink(handle, source_date_epoch(),
+                            interpreter=ZIPAPP_INTERPRETER
+                            if self.output_format == 'zipapp' else None)
+        records = []
+        old_archive = read = None
+        for relpath in self._order():
+            arcname = posixpath.normpath(self.prefix + relpath)
+            source = self.sources.get(relpath)
+            if source is None:
+                # fresh entry, copy it from the previous archive
+                if old_archive is None:
+                    old_archive, read = _open_archive(self.archive,
+                                                      self.output_format)
+                source = read(arcname)
+            if isinstance(source, tuple):
+                with open(source[0], 'rb') as src_handle:
+                    reader = _HashingReader(src_handle)
+                    sink.add_file(arcname, reader,
+                                  os.path.getsize(source[0]))
+                digest, size = reader.hash.digest(), reader.size
+            else:
+                sink.add_bytes(arcname, source)
+                digest, size = hashlib.sha256(source).digest(), len(source)
+            records.append((arcname, 'sha256=%s' % base64.urlsafe_b64encode(
+                digest).rstrip(b'=').decode('ascii'), size))
+        if self.output_format == 'wheel':
+            dist_info = [r for r in self.new if r.endswith('.dist-info/WHEEL')]
+            record_name = posixpath.normpath(
+                self.prefix + dist_info[0]).rsplit('/', 1)[0] + '/RECORD'
+            buf = six.StringIO()
+            writer = csv.writer(buf, lineterminator='\n')
+            writer.writerows(records + [(record_name, '', '')])
+            sink.add_bytes(record_name, buf.getvalue().encode('utf-8'))
+        sink.close()
+        if old_archive is not None:
+            old_archive.close()
+
+    def save(self):
+        """
+        Writes the archive, unless nothing changed, and the manifest.
+        """
+        if self.check:
+            return
+        if not self.intact or self.written or \
+                set(self.old) != set(self.new):
+            fd, tmp_fname = tempfile.mkstemp(dir=self.dest_dir, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as handle:
+                    self._write_archive(handle)
+                output = hash_file(tmp_fname)
+                if self.intact and output == self.old_archive['output'] or \
+                        not self.intact and os.path.exists(self.archive) and \
+                        hash_file(self.archive) == output:
+                    os.remove(tmp_fname)
+                else:
+                    self.bytes_written += os.path.getsize(tmp_fname)
+                    # mkstemp() creates files only the owner can read
+                    os.chmod(tmp_fname, 0o755 if self.output_format == 'zipapp'
+                             else 0o644)
+                    try:
+                        os.replace(tmp_fname, self.archive)
+                    except AttributeError:
+                        # Python 2, rename is atomic on POSIX
+                        os.rename(tmp_fname, self.archive)
+            except BaseException:
+                if os.path.exists(tmp_fname):
+                    os.remove(tmp_fname)
+                raise
+            st = os.stat(self.archive)
+            self.new[ARCHIVE_KEY] = {'inputs': {}, 'output': output,
+                                     'stat': [st.st_size, st.st_mtime]}
+        else:
+            self.new[ARCHIVE_KEY] = self.old_archive
+        super(ArchiveManifest, self).save()
@@ -0,0 +1,446 @@
+from __future__ import absolute_import
+
+import ast
+import os
+
+from treeshaker.requirements_utils import PrefixIndex
+from treeshaker.scan_cache import CachedModuleGraph
+
+
+GRAPH_ENGINES = ('modulegraph', 'ast')
+
+# parse files in a process pool only when there are at least this many
+_MIN_PARALLEL_FILES = 64
+
+# scan results of files parsed by this process, keyed by the scanned
+# (identifier, filename, is_package) tuple and validated by mtime and size,
+# so that targets built one after another do not parse the same files again
+_scanned = {}
+
+# fields of compound statements that hold nested statements
+_BODY_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+_FUNCTION_DEFS = (ast.FunctionDef,) + \
+    ((ast.AsyncFunctionDef,) if hasattr(ast, 'AsyncFunctionDef') else ())
+
+
+def _target_names(target):
+    if isinstance(target, ast.Name):
+        yield target.id
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for elt in target.elts:
+            for name in _target_names(elt):
+                yield name
+    elif type(target).__name__ == 'Starred':
+        for name in _target_names(target.value):
+            yield name
+
+
+def _scan_statements(stmts, scope, names, imports):
+    """
+    Walks a list of statements (recursing into compound statements but never
+    into expressions), collecting import statements into ``imports`` and the
+    names bound in the global namespace into ``names``.
+
+    This matches what modulegraph collects from ``STORE_NAME`` and
+    ``STORE_GLOBAL`` instructions: names bound at module level or in class
+    bodies, and names declared ``global`` and bound inside functions. ``scope``
+    is None at module or class level, and the set of names declared ``global``
+    inside functions.
+    """
+    def bind(name):
+        if scope is None or name in scope:
+            names.add(name)
+
+    for node in stmts:
+        if isinstance(node, ast.Import):
+            imports.append(node)
+            for alias in node.names:
+                bind(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, ast.ImportFrom):
+            imports.append(node)
+            for alias in node.names:
+                if alias.name != '*':
+                    bind(alias.asname or alias.name)
+        elif isinstance(node, _FUNCTION_DEFS):
+            bind(node.name)
+            _scan_statements(node.body, set(), names, imports)
+            continue
+        elif isinstance(node, ast.ClassDef):
+            bind(node.name)
+            _scan_statements(node.body, None, names, imports)
+            continue
+        elif isinstance(node, ast.Global):
+            scope.update(node.names)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                for name in _target_names(target):
+                    bind(name)
+        elif isinstance(node, (ast.AugAssign, ast.For)) or \
+                type(node).__name__ in ('AnnAssign', 'AsyncFor'):
+            for name in _target_names(node.target):
+                bind(name)
+        elif isinstance(node, ast.With) or type(node).__name__ == 'AsyncWith':
+            items = getattr(node, 'items', None) or [node]
+            for item in items:
+                if item.optional_vars is not None:
+                    for name in _target_names(item.optional_vars):
+                        bind(name)
+        elif isinstance(node, ast.ExceptHandler):
+            if isinstance(node.name, str):
+                bind(node.name)
+            elif node.name is not None:
+                for name in _target_names(node.name):
+                    bind(name)
+        for field in _BODY_FIELDS:
+            children = getattr(node, field, None)
+            if children:
+                _scan_statements(children, scope, names, imports)
+
+
+def resolve_import(module_name, is_package, level, name):
+    """
+    Resolves a possibly relative import to an absolute module name. Returns
+    None if the import reaches beyond the top-level package.
+
+    Examples
+    --------
+    >>> from treeshaker.ast_graph import resolve_import
+    >>> resolve_import('a.b.c', False, 1, 'd')
+    'a.b.d'
+    >>> resolve_import('a.b', True, 1, None)
+    'a.b'
+    >>> resolve_import('a.b.c', False, 2, 'd.e')
+    'a.d.e'
+    >>> resolve_import('a', False, 1, 'b') is None
+    True
+    """
+    if not level:
+        return name
+    parts = module_name.split('.')
+    if not is_package:
+        parts = parts[:-1]
+    if level - 1 > len(parts) - 1 or not parts:
+        return None
+    if level > 1:
+        parts = parts[:-(level - 1)]
+    if name:
+        parts.append(name)
+    return '.'.join(parts)
+
+
+def scan_module(source, identifier, is_package, filename='<unknown>'):
+    """
+    Parses the source code of one module and extracts what the import graph
+    needs from it.
+
+    Parameters
+    ----------
+    source : bytes or str
+        The source code of the module.
+    identifier : str
+        The name of the module, used to resolve relative imports.
+    is_package : bool
+        Pass True if the module is a package ``__init__``.
+    filename : str
+        Used in error messages.
+
+    Returns
+    -------
+    dict
+        With keys ``'globalnames'`` (a set of the names the module binds) and
+        ``'imports'`` (a list of ``(name, fromlist, star)`` tuples, where
+        ``name`` is the absolute name of the imported module).
+
+    Examples
+    --------
+    >>> from treeshaker.ast_graph import scan_module
+    >>> info = scan_module('from . import b\\nimport os.path as p\\n'
+    ...                    'def f():\\n    from c import *\\n',
+    ...                    'pkg.a', False)
+    >>> sorted(info['globalnames'])
+    ['b', 'f', 'p']
+    >>> info['imports']
+    [('pkg', ('b',), False), ('os.path', (), False), ('c', (), True)]
+    """
+    tree = ast.parse(source, filename)
+    names = set()
+    nodes = []
+    _scan_statements(tree.body, None, names, nodes)
+    imports = []
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            imports.extend((alias.name, (), False) for alias in node.names)
+        else:
+            name = resolve_import(identifier, is_package, node.level,
+                                  node.module)
+            if name is None:
+                continue
+            fromlist = tuple(a.name for a in node.names if a.name != '*')
+            star = any(a.name == '*' for a in node.names)
+            imports.append((name, fromlist, star))
+    return {'globalnames': names, 'imports': imports}
+
+
+def _scan_files(batch):
+    """
+    Worker function that scans a batch of ``(identifier, filename,
+    is_package)`` tuples. Returns a list of ``(identifier, info, error)``
+    tuples.
+    """
+    results = []
+    for identifier, filename, is_package in batch:
+        try:
+            with open(filename, 'rb') as handle:
+                source = handle.read()
+            info = scan_module(source, identifier, is_package, filename)
+            results.append((identifier, info, None))
+        except (SyntaxError, ValueError) as e:
+            results.append((identifier, None, '%s: %s' % (filename, e)))
+    return results
+
+
+def _find_top_level(name):
+    """
+    Locates a top-level module or package without importing it. Returns a
+    ``(filename, packagepath)`` tuple, or None if it cannot be found.
+    """
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        # Python 2
+        import imp
+        try:
+            handle, pathname, description = imp.find_module(name)
+        except ImportError:
+            return None
+        if handle is not None:
+            handle.close()
+        if description[2] == imp.PKG_DIRECTORY:
+            return os.path.join(pathname, '__init__.py'), [pathname]
+        return pathname, None
+    try:
+        spec = find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if spec.submodule_search_locations is not None:
+        origin = spec.origin if spec.has_location else None
+        return origin, list(spec.submodule_search_locations)
+    return spec.origin, None
+
+
+class AstGraphBuilder(object):
+    """
+    Constructs a module import graph by parsing only the modules in the
+    target packages with ``ast``.
+
+    Imports are resolved without importing anything. Modules outside the
+    target packages (the standard library and all third-party packages) are
+    recorded as leaf nodes and never parsed, which makes this much faster than
+    ``modulegraph``, which descends into every package it can find.
+
+    The graph exposes the same nodes and attributes to ``process_module()`` as
+    the modulegraph engine: every import of a module inside the target
+    packages references that module (and ``from pkg import mod`` also
+    references the submodule ``pkg.mod``), every submodule references its
+    parent package, and ``globalnames`` holds the names the module binds at
+    module level.
+
+    Parameters
+    ----------
+    target_packages : list of str
+        The packages whose modules are parsed.
+    jobs : int, optional
+        The number of worker processes used to parse large batches of files.
+        Defaults to the number of CPUs. Files are always parsed in-process when
+        this is 1 or when called from inside a worker process or from a thread
+        other than the main thread.
+    """
+    def __init__(self, target_packages, jobs=None):
+        self.target_index = PrefixIndex((p, p) for p in target_packages)
+        self.jobs = jobs
+        self._locations = {}
+        self._pool = None
+
+    def locate(self, identifier):
+        """
+        Finds the file of a module inside the target packages. Returns a
+        ``(kind, filename, packagepath)`` tuple, or None if there is no such
+        module.
+        """
+        if identifier in self._locations:
+            return self._locations[identifier]
+        if '.' not in identifier:
+            found = _find_top_level(identifier)
+            if found is None:
+                location = None
+            elif found[1] is None:
+                location = ('SourceModule', found[0], None)
+            elif found[0] is None or not os.path.isfile(found[0]):
+                location = ('NamespacePackage', None, found[1])
+            else:
+                location = ('Package', found[0], found[1])
+        else:
+            parent, name = identifier.rsplit('.', 1)
+            parent_location = self.locate(parent)
+            location = None
+            if parent_location is not None and parent_location[2]:
+                for path in parent_location[2]:
+                    dirname = os.path.join(path, name)
+                    init = os.path.join(dirname, '__init__.py')
+                    if os.path.isfile(init):
+                        location = ('Package', init, [dirname])
+                    elif os.path.isfile(dirname + '.py'):
+                        location = ('SourceModule', dirname + '.py', None)
+                    elif os.path.isdir(dirname):
+                        location = ('NamespacePackage', None, [dirname])
+                    if location is not None:
+                        break
+        self._locations[identifier] = location
+        return location
+
+    def _scan(self, pending):
+        results = []
+        todo = {}
+        for item in pending:
+            try:
+                st = os.stat(item[1])
+                stat = (st.st_mtime, st.st_size)
+            except OSError:
+                stat = None
+            cached = _scanned.get(item)
+            if stat is not None and cached is not None and cached[0] == stat:
+                results.append((item[0], cached[1], None))
+            else:
+                todo[item[0]] = (item, stat)
+        for identifier, info, error in self._parse_files(
+                [item for item, _ in todo.values()]):
+            item, stat = todo[identifier]
+            if error is None and stat is not None:
+                _scanned[item] = (stat, info)
+            results.append((identifier, info, error))
+        return results
+
+    def _parse_files(self, pending):
+        from treeshaker.parallel_utils import pool_jobs
+        jobs = pool_jobs(self.jobs)
+        if jobs <= 1 or len(pending) < _MIN_PARALLEL_FILES:
+            return _scan_files(pending)
+        if self._pool is None:
+            # started once and reused for every later batch of this build
+            from treeshaker.parallel_utils import get_process_pool
+            self._pool = get_process_pool(jobs)
+        n_batches = jobs * 4
+        batches = [pending[i::n_batches] for i in range(n_batches)]
+        results = []
+        for batch_results in self._pool.map(_scan_files,
+                                            [b for b in batches if b]):
+            results.extend(batch_results)
+        return results
+
+    def build(self, target_module_names):
+        """
+        Constructs the import graph of the target modules.
+
+        Parameters
+        ----------
+        target_module_names : list of str
+            The names of the target modules to include in the graph.
+
+        Returns
+        -------
+        CachedModuleGraph
+            The graph, containing every node reachable from the targets.
+        """
+        try:
+            records = self._walk(target_module_names)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+        return CachedModuleGraph(records)
+
+    def _walk(self, target_module_names):
+        records = {}
+        frontier = list(target_module_names)
+        while frontier:
+            # locate new modules, recording external and missing ones as leaves
+            pending = []
+            next_frontier = []
+            for identifier in frontier:
+                if identifier in records:
+                    continue
+                record = records[identifier] = {
+                    'kind': 'ExternalModule', 'filename': None,
+                    'packagepath': None, 'globalnames': set(),
+                    'starimports': set(), 'missing': False, 'refs': []}
+                if identifier not in self.target_index and \
+                        identifier not in target_module_names:
+                    continue
+                location = self.locate(identifier)
+                if location is None:
+                    record.update(kind='MissingModule', missing=True)
+                    continue
+                kind, filename, packagepath = location
+                record.update(kind=kind, filename=filename,
+                              packagepath=packagepath)
+                if '.' in identifier:
+                    record['refs'].append(identifier.rsplit('.', 1)[0])
+                    next_frontier.append(identifier.rsplit('.', 1)[0])
+                if filename is not None:
+                    pending.append((identifier, filename,
+                                    packagepath is not None))
+
+            # parse them and follow their imports
+            for identifier, info, error in self._scan(pending):
+                record = records[identifier]
+                if error is not None:
+                    print('could not parse %s' % error)
+                    record['kind'] = 'InvalidSourceModule'
+                    continue
+                record['globalnames'] = set(info['globalnames'])
+                for name, fromlist, star in info['imports']:
+                    record['refs'].append(name)
+                    if star:
+                        record['starimports'].add(name)
+                    if name not in self.target_index:
+                        continue
+                    location = self.locate(name)
+                    if location is None or not location[2]:
+                        continue
+                    for sub in fromlist:
+                        if self.locate('%s.%s' % (name, sub)) is not None:
+                            record['refs'].append('%s.%s' % (name, sub))
+                next_frontier.extend(record['refs'])
+            frontier = [r for r in next_frontier if r not in records]
+
+        # merge the globalnames of modules imported with "import *"
+        resolved = set()
+
+        def resolve_stars(identifier, active):
+            record = records[identifier]
+            if identifier in resolved or identifier in active:
+                return record
+            active.add(identifier)
+            for name in list(record['starimports']):
+                other = records.get(name)
+                if other is None or other['kind'] in ('ExternalModule',
+                                                      'MissingModule'):
+                    continue
+                other = resolve_stars(name, active)
+                record['globalnames'].update(other['globalnames'])
+                record['starimports'].update(other['starimports'])
+                record['starimports'].discard(name)
+            active.discard(identifier)
+            resolved.add(identifier)
+            return record
+
+        for identifier in list(records):
+            resolve_stars(identifier, set())
+
+        for record in records.values():
+            record['refs'] = list(dict.fromkeys(record['refs']))
+        return records
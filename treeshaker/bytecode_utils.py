@@ -0,0 +1,223 @@
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+
+from treeshaker.cache_utils import hash_key
+
+
+BYTECODE_MODES = ('none', 'pyc', 'pyc-only')
+
+INVALIDATION_MODES = ('checked-hash', 'unchecked-hash')
+
+# bump this when the compiled output changes, to invalidate written pycs
+BYTECODE_VERSION = 1
+
+# compile modules in a process pool only when there are at least this many
+_MIN_PARALLEL_MODULES = 64
+
+
+def pyc_relpath(relpath, optimize=0, legacy=False):
+    """
+    Returns the path of the bytecode of a source file.
+
+    Parameters
+    ----------
+    relpath : str
+        The path of the source file.
+    optimize : int
+        The optimization level.
+    legacy : bool
+        Pass True to place the bytecode next to the source, where sourceless
+        imports and ``zipimport`` look for it, instead of in ``__pycache__``.
+        Legacy pycs carry no optimization tag.
+
+    Examples
+    --------
+    >>> import sys
+    >>> from treeshaker.bytecode_utils import pyc_relpath
+    >>> pyc_relpath('pkg/mod.py', legacy=True)
+    'pkg/mod.pyc'
+    >>> if sys.version_info >= (3, 7):
+    ...     relpath = pyc_relpath('pkg/mod.py', optimize=2)
+    ...     assert relpath.startswith('pkg/__pycache__/mod.cpython-')
+    ...     assert relpath.endswith('.opt-2.pyc')
+    """
+    base = os.path.splitext(relpath)[0]
+    if legacy:
+        return base + '.pyc'
+    dirname, name = os.path.split(base)
+    return os.path.join(dirname, '__pycache__', '%s.%s%s.pyc' % (
+        name, sys.implementation.cache_tag,
+        '.opt-%i' % optimize if optimize else ''))
+
+
+def compile_bytecode(source, dfile, optimize=0,
+                     invalidation_mode='checked-hash'):
+    """
+    Compiles Python source to the contents of a hash-based pyc file (PEP 552).
+
+    The pyc records a hash of the source instead of its mtime, so it is valid
+    wherever the source is copied to and compiling the same source always
+    produces the same bytes. ``'checked-hash'`` pycs are validated against the
+    source when it is present, ``'unchecked-hash'`` pycs are trusted without
+    reading the source.
+
+    Parameters
+    ----------
+    source : bytes
+        The source code.
+    dfile : str
+        The file name recorded in the code objects, shown in tracebacks.
+    optimize : int
+        The optimization level, as for ``python -O``.
+    invalidation_mode : {'checked-hash', 'unchecked-hash'}
+        How the interpreter validates the pyc.
+
+    Returns
+    -------
+    bytes
+        The pyc.
+
+    Examples
+    --------
+    >>> import marshal
+    >>> import sys
+    >>> from treeshaker.bytecode_utils import compile_bytecode
+    >>> if sys.version_info >= (3, 7):
+    ...     pyc = compile_bytecode(b'x = 1\\n', 'pkg/mod.py')
+    ...     assert pyc == compile_bytecode(b'x = 1\\n', 'pkg/mod.py')
+    ...     assert marshal.loads(pyc[16:]).co_filename == 'pkg/mod.py'
+    """
+    import importlib.util
+    import marshal
+    import struct
+
+    if invalidation_mode not in INVALIDATION_MODES:
+        raise ValueError('unknown bytecode_invalidation %r, expected one of %s'
+                         % (invalidation_mode, ', '.join(INVALIDATION_MODES)))
+    code = compile(source, dfile, 'exec', dont_inherit=True,
+                   optimize=optimize)
+    flags = 0b01 | (0b10 if invalidation_mode == 'checked-hash' else 0)
+    return importlib.util.MAGIC_NUMBER + struct.pack('<I', flags) + \
+        importlib.util.source_hash(source) + marshal.dumps(code)
+
+
+def _compile_jobs(jobs):
+    """
+    Compiles ``(source, dfile, optimize, invalidation_mode)`` jobs, returning
+    the pyc and the time taken to compile each.
+    """
+    results = []
+    for job in jobs:
+        start = time.time()
+        results.append((compile_bytecode(*job), time.time() - start))
+    return results
+
+
+class BytecodeCompiler(object):
+    """
+    Plans and compiles the bytecode shipped with a target's modules.
+
+    Parameters
+    ----------
+    mode : {'none', 'pyc', 'pyc-only'}
+        ``'pyc'`` adds bytecode next to the sources, ``'pyc-only'`` replaces
+        the sources with sourceless bytecode.
+    optimize : list of int
+        The optimization levels to compile for. Sourceless and legacy pycs
+        support only one level.
+    invalidation_mode : {'checked-hash', 'unchecked-hash'}
+        How the interpreter validates the pycs, see ``compile_bytecode()``.
+    legacy : bool
+        Pass True to place pycs next to the sources, which is where
+        ``zipimport`` looks for them.
+    jobs : int, optional
+        The number of worker processes, see
+        ``treeshaker.parallel_utils.pool_jobs()``.
+
+    Examples
+    --------
+    >>> import sys
+    >>> from treeshaker.bytecode_utils import BytecodeCompiler
+    >>> BytecodeCompiler().outputs('mod.py')
+    [('mod.py', None, None)]
+    >>> if sys.version_info >= (3, 7):
+    ...     compiler = BytecodeCompiler('pyc-only')
+    ...     assert [(relpath, opt) for relpath, opt, _
+    ...             in compiler.outputs('mod.py')] == [('mod.pyc', 0)]
+    ...     pycs, seconds = compiler.compile([(b'x = 1\\n', 'pkg/mod.py', 0)])
+    ...     assert len(pycs) == 1
+    """
+    def __init__(self, mode='none', optimize=(0,),
+                 invalidation_mode='checked-hash', legacy=False, jobs=None):
+        if mode not in BYTECODE_MODES:
+            raise ValueError('unknown bytecode %r, expected one of %s'
+                             % (mode, ', '.join(BYTECODE_MODES)))
+        if invalidation_mode not in INVALIDATION_MODES:
+            raise ValueError('unknown bytecode_invalidation %r, expected one '
+                             'of %s' % (invalidation_mode,
+                                        ', '.join(INVALIDATION_MODES)))
+        optimize = sorted(set(optimize)) or [0]
+        if mode != 'none' and sys.version_info < (3, 7):
+            raise ValueError('bytecode requires Python 3.7+')
+        if (mode == 'pyc-only' or legacy) and len(optimize) > 1:
+            raise ValueError('sourceless and zipped bytecode supports only '
+                             'one bytecode_optimize level')
+        self.mode = mode
+        self.optimize = optimize
+        self.invalidation_mode = invalidation_mode
+        self.legacy = legacy or mode == 'pyc-only'
+        self.jobs = jobs
+
+    def outputs(self, relpath):
+        """
+        Lists the files emitted for the source file ``relpath``.
+
+        Returns
+        -------
+        list of (str, int or None, str) tuples
+            The path of each file, its optimization level (None for the
+            source itself) and a key identifying how it is compiled.
+        """
+        outputs = [] if self.mode == 'pyc-only' else [(relpath, None, None)]
+        if self.mode == 'none':
+            return outputs
+        import importlib.util
+        for optimize in self.optimize:
+            outputs.append((
+                pyc_relpath(relpath, optimize, legacy=self.legacy), optimize,
+                hash_key(BYTECODE_VERSION, importlib.util.MAGIC_NUMBER.hex(),
+                         optimize, self.invalidation_mode)))
+        return outputs
+
+    def compile(self, jobs):
+        """
+        Compiles ``(source, dfile, optimize)`` jobs, in a process pool if
+        there are many.
+
+        Returns
+        -------
+        pycs : list of bytes
+            The pyc of each job.
+        seconds : float
+            The total time spent compiling, which importing the sources
+            without bytecode would spend on every cold start.
+        """
+        from treeshaker.parallel_utils import get_process_pool, pool_jobs
+
+        jobs = [job + (self.invalidation_mode,) for job in jobs]
+        n_jobs = pool_jobs(self.jobs)
+        if n_jobs <= 1 or len(jobs) < _MIN_PARALLEL_MODULES:
+            results = _compile_jobs(jobs)
+        else:
+            n_batches = n_jobs * 4
+            batches = [jobs[i::n_batches] for i in range(n_batches)]
+            with get_process_pool(n_jobs) as pool:
+                batch_results = list(pool.map(_compile_jobs, batches))
+            # undo the striping of the batches
+            results = [None] * len(jobs)
+            for i, batch in enumerate(batch_results):
+                results[i::n_batches] = batch
+        return [pyc for pyc, _ in results], sum(s for _, s in results)
@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+
+import contextlib
+import hashlib
+import os
+import tempfile
+
+
+DEFAULT_CACHE_DIR = '.treeshaker_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def hash_bytes(data):
+    """
+    Returns the hex SHA-256 digest of some bytes.
+
+    Examples
+    --------
+    >>> from treeshaker.cache_utils import hash_bytes
+    >>> hash_bytes(b'treeshaker')[:16]
+    '84a9509cd04bfa0b'
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(fname, chunk_size=1024 * 1024):
+    """
+    Returns the hex SHA-256 digest of the contents of a file.
+    """
+    h = hashlib.sha256()
+    with open(fname, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_key(*parts):
+    """
+    Combines some values into a cache key by hashing their ``repr()``.
+
+    Examples
+    --------
+    >>> from treeshaker.cache_utils import hash_key
+    >>> hash_key('a', 1) == hash_key('a', 1)
+    True
+    >>> hash_key('a', 1) == hash_key('a', 2)
+    False
+    """
+    return hash_bytes(repr(parts).encode('utf-8'))
+
+
+def atomic_write(fname, data):
+    """
+    Writes bytes to a file atomically by writing to a temporary file in the
+    same directory and renaming it over the destination. Concurrent readers see
+    either the old or the new content, never a partial write.
+    """
+    dirname = os.path.dirname(fname) or '.'
+    fd, tmp_fname = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        # mkstemp() creates files only the owner can read
+        os.chmod(tmp_fname, 0o644)
+        try:
+            os.replace(tmp_fname, fname)
+        except AttributeError:
+            # Python 2, rename is atomic on POSIX
+            os.rename(tmp_fname, fname)
+    except BaseException:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(fname):
+    """
+    Holds an exclusive lock on the file ``fname`` (created if needed) inside
+    this block, serializing the block between threads and processes. Does
+    not lock on platforms without ``fcntl``.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    dirname = os.path.dirname(fname)
+    if dirname and not os.path.exists(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # another process created it first
+            pass
+    with open(fname, 'a') as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class FileCache(object):
+    """
+    A directory of cache entries keyed by hex digests.
+
+    Writes are atomic, so the same directory can be shared by concurrent
+    worker processes. Reading an entry refreshes its mtime, and ``evict()``
+    removes the least recently used entries until the total size of the cache
+    is below ``max_bytes``. ``put()`` evicts only when its running estimate of
+    the size of the cache, which starts from one walk of the directory,
+    exceeds ``max_bytes``.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to store entries in. It is created if needed.
+    max_bytes : int
+        The size bound enforced by ``evict()``.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Returns the bytes stored under ``key``, or None if there is no entry.
+        """
+        fname = self.path(key)
+        try:
+            with open(fname, 'rb') as handle:
+                data = handle.read()
+        except (IOError, OSError):
+            return None
+        try:
+            os.utime(fname, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """
+        Stores ``data`` under ``key`` and evicts old entries if needed.
+        """
+        fname = self.path(key)
+        if self._size is None:
+            self._size = self._walk()[1]
+        if not os.path.exists(os.path.dirname(fname)):
+            try:
+                os.makedirs(os.path.dirname(fname))
+            except OSError:
+                # another process created it first
+                pass
+        try:
+            self._size -= os.path.getsize(fname)
+        except OSError:
+            pass
+        atomic_write(fname, data)
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _walk(self):
+        """
+        Returns the ``(mtime, size, path)`` of every entry and their total
+        size.
+        """
+        entries = []
+        total = 0
+        for dirpath, _, fnames in os.walk(self.directory):
+            for fname in fnames:
+                path = os.path.join(dirpath, fname)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return entries, total
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        ``max_bytes``.
+
+        Returns
+        -------
+        int
+            The number of entries removed.
+        """
+        entries, total = self._walk()
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
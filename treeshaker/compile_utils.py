@@ -0,0 +1,218 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+
+from treeshaker.cache_utils import hash_bytes, hash_file, hash_key
+
+
+# how requirements.txt is pinned: by running pip-compile, or to the versions
+# installed in the environment treeshaker runs in
+RESOLVERS = ('pip-compile', 'environment')
+
+
+def distribution_version(name):
+    """
+    Returns the installed version of a distribution, or ``'unknown'``.
+    """
+    try:
+        try:
+            from importlib.metadata import version, PackageNotFoundError
+        except ImportError:
+            from importlib_metadata import version, PackageNotFoundError
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return 'unknown'
+    except ImportError:
+        return 'unknown'
+
+
+def normalize_requirements_in(content):
+    """
+    Normalizes the content of a requirements.in file for use in a cache key.
+    Header lines keep their order, requirement lines are sorted, and blank
+    lines and surrounding whitespace are dropped.
+
+    Examples
+    --------
+    >>> from treeshaker.compile_utils import normalize_requirements_in
+    >>> normalize_requirements_in('-f x\\nsix==1.0\\n\\nfire==0.2 \\n')
+    '-f x\\nfire==0.2\\nsix==1.0'
+    """
+    lines = [l.strip() for l in content.splitlines() if l.strip()]
+    header = [l for l in lines if l.startswith('-')]
+    reqs = sorted(l for l in lines if not l.startswith('-'))
+    return '\n'.join(header + reqs)
+
+
+def hash_archive(fname):
+    """
+    Returns a digest of the members of an sdist or wheel. Unlike
+    ``hash_file()``, the digest ignores member timestamps and compression, so
+    rebuilding an sdist from unchanged sources does not change it.
+    """
+    members = []
+    if zipfile.is_zipfile(fname):
+        with zipfile.ZipFile(fname) as archive:
+            for name in archive.namelist():
+                members.append((name, hash_bytes(archive.read(name))))
+    else:
+        try:
+            archive = tarfile.open(fname)
+        except tarfile.TarError:
+            return hash_file(fname)
+        with archive:
+            for member in archive.getmembers():
+                if member.isfile():
+                    data = archive.extractfile(member).read()
+                    members.append((member.name, hash_bytes(data)))
+    return hash_key(sorted(members))
+
+
+def find_links_hashes(find_links):
+    """
+    Returns a sorted list of ``(find_link, filename, digest)`` tuples for all
+    files in the ``--find-links`` directories, skipping hidden files.
+    """
+    hashes = []
+    for find_link in find_links:
+        if not os.path.isdir(find_link):
+            continue
+        for fname in sorted(os.listdir(find_link)):
+            if fname.startswith('.'):
+                continue
+            path = os.path.join(find_link, fname)
+            if os.path.isfile(path):
+                hashes.append((find_link, fname, hash_archive(path)))
+    return hashes
+
+
+def compile_cache_key(req_in_content, find_links):
+    """
+    Computes the cache key for compiling a requirements.in file. The key
+    covers everything that can change the compiled output without touching an
+    index: the normalized requirements.in content (including its header
+    lines), the members of the sdists in the ``--find-links`` directories, the
+    interpreter version and the pip-tools version.
+    """
+    return hash_key(normalize_requirements_in(req_in_content),
+                    find_links_hashes(find_links),
+                    sys.version, distribution_version('pip-tools'))
+
+
+def compile_requirements(req_in_content, find_links=(), verbose=False,
+                         cache=None):
+    """
+    Compiles requirements.in content to pinned requirements.txt content using
+    pip-compile, reusing a previously compiled result when possible.
+
+    pip-compile runs in a temporary directory, so that its output depends only
+    on the inputs covered by ``compile_cache_key()`` and not on any pins left
+    over in an existing output file.
+
+    Parameters
+    ----------
+    req_in_content : str
+        The content of the requirements.in file.
+    find_links : list of str
+        Directories to pass to pip-compile as ``--find-links``.
+    verbose : bool
+        Pass True to let pip-compile print its progress.
+    cache : FileCache, optional
+        Pass a cache to store and reuse compiled results.
+
+    Returns
+    -------
+    str, bool
+        The compiled requirements.txt content and whether it came from the
+        cache.
+    """
+    key = None
+    if cache is not None:
+        key = compile_cache_key(req_in_content, find_links)
+        data = cache.get(key)
+        if data is not None:
+            print('pip-compile cache hit, skipping the resolver')
+            return data.decode('utf-8'), True
+
+    from piptools.scripts.compile import cli as pip_compile
+
+    tmp_dir = tempfile.mkdtemp(prefix='treeshaker-')
+    try:
+        req_in_fname = os.path.join(tmp_dir, 'requirements.in')
+        tmp_txt_fname = os.path.join(tmp_dir, 'requirements.txt')
+        with open(req_in_fname, 'w') as handle:
+            handle.write(req_in_content)
+        pip_compile_args = [req_in_fname, '--output-file', tmp_txt_fname,
+                            '--no-header', '--no-annotate']
+        for f in find_links:
+            pip_compile_args.extend(['--find-links', f])
+        if not verbose:
+            pip_compile_args.append('--quiet')
+        print('compiling requirements: %s %s' %
+              ('pip-compile', ' '.join(pip_compile_args)))
+        pip_compile(args=pip_compile_args, standalone_mode=False)
+        with open(tmp_txt_fname, 'r') as handle:
+            content = handle.read()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    if cache is not None:
+        cache.put(key, content.encode('utf-8'))
+    return content, False
+
+
+def pin_requirements(req_in_content, find_links=(), index=None):
+    """
+    Pins requirements.in content to the versions installed in the running
+    interpreter's environment, without running a resolver or touching an
+    index. The output has the layout of ``compile_requirements()``.
+
+    Parameters
+    ----------
+    req_in_content : str
+        The content of the requirements.in file.
+    find_links : list of str
+        Directories to list as ``--find-links`` in the output.
+    index : DistributionIndex, optional
+        The installed distributions. Defaults to
+        ``treeshaker.metadata_utils.environment_index()``.
+
+    Returns
+    -------
+    str
+        The pinned requirements.txt content.
+
+    Raises
+    ------
+    RuntimeError
+        If a requirement or one of its dependencies is not installed in a
+        version satisfying it.
+
+    Examples
+    --------
+    >>> from treeshaker.compile_utils import pin_requirements
+    >>> print(pin_requirements('--index-url https://example.com\\n'
+    ...                        'six; python_version >= "2"\\n'
+    ...                        'enum34; python_version < "2"\\n'))
+    ... # doctest: +ELLIPSIS
+    --index-url https://example.com
+    <BLANKLINE>
+    six==...; python_version >= "2"
+    <BLANKLINE>
+    """
+    from treeshaker.metadata_utils import environment_index
+
+    if index is None:
+        index = environment_index()
+    lines = [l.strip() for l in req_in_content.splitlines() if l.strip()]
+    header = [l for l in lines if l.startswith('-')]
+    header.extend('--find-links %s' % f for f in find_links
+                  if '--find-links %s' % f not in header)
+    pins = index.pin([l for l in lines if not l.startswith('-')])
+    return '\n'.join(header + [''] * bool(header) + pins) + '\n'
@@ -1,5 +1,11 @@
 from __future__ import absolute_import
 
+import json
+import os
+import re
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
 import six
 from configparser import ConfigParser, SectionProxy, NoOptionError
 
@@ -126,3 +132,438 @@ def load_config(fname='treeshaker.cfg'):
     config = CustomConfigParser(allow_no_value=True)
     config.read(fname)
     return config
+
+
+# bump this when the resolution of target specs changes, to invalidate the
+# cache
+SPEC_VERSION = 7
+
+TARGET_OPTIONS = (
+    'requirements_file', 'target_packages', 'outdir', 'add_init_py',
+    'add_setup_py', 'package_data', 'source_paths', 'post_build_commands',
+    'readme', 'functions', 'fire_components', 'graph_engine',
+    'doc_extraction', 'copy_strategy', 'output_format', 'max_bytes',
+    'max_modules', 'max_import_time', 'bytecode', 'bytecode_optimize',
+    'bytecode_invalidation', 'task_timeouts', 'resolver',
+)
+_LIST_OPTIONS = ('target_packages', 'package_data', 'source_paths',
+                 'post_build_commands', 'functions', 'fire_components',
+                 'bytecode_optimize', 'task_timeouts')
+_BOOL_OPTIONS = ('add_init_py', 'add_setup_py')
+_NUMBER_OPTIONS = (('max_bytes', int), ('max_modules', int),
+                   ('max_import_time', float))
+
+
+class TargetSpec(namedtuple('TargetSpec', ('target', 'config_path') +
+                            TARGET_OPTIONS)):
+    """
+    The fully resolved, immutable settings of one target.
+
+    Lists are tuples, booleans are bools, budgets are numbers, task timeouts
+    are ``(task, seconds)`` pairs, unset options are None (or empty tuples for
+    lists), ``outdir`` is resolved to the default and all ``<outdir>`` and
+    ``<name>`` placeholders are interpolated.
+    Paths are kept as written in the config file; ``config_path`` is the
+    directory they are relative to.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**dict((k, tuple(v) if isinstance(v, list) else v)
+                          for k, v in data.items()))
+
+
+def is_pattern(target):
+    """
+    Tests whether a target name is a pattern such as ``'mypkg.tasks.*'``.
+
+    Examples
+    --------
+    >>> from treeshaker.config import is_pattern
+    >>> is_pattern('mypkg.tasks.*'), is_pattern('mypkg.target')
+    (True, False)
+    """
+    return any(c in target for c in '*?[')
+
+
+def match_pattern(pattern, target):
+    """
+    Tests whether a target matches a pattern. Wildcards never match across
+    dots: ``*`` matches one component of the dotted module name.
+
+    Examples
+    --------
+    >>> from treeshaker.config import match_pattern
+    >>> match_pattern('mypkg.tasks.*', 'mypkg.tasks.nightly')
+    True
+    >>> match_pattern('mypkg.tasks.*', 'mypkg.tasks.sub.nightly')
+    False
+    >>> match_pattern('mypkg.*.run_?', 'mypkg.jobs.run_a')
+    True
+    """
+    parts = pattern.split('.')
+    names = target.split('.')
+    return len(parts) == len(names) and \
+        all(fnmatchcase(n, p) for p, n in zip(parts, names))
+
+
+_IDENTIFIER = re.compile(r'[A-Za-z_]\w*$')
+
+
+def _specificity(pattern):
+    # patterns with more literal characters apply later and win
+    return len(pattern) - sum(pattern.count(c) for c in '*?[]')
+
+
+def _parse_value(value, outdir, name):
+    """
+    Converts a raw option value the same way ``CustomConfigParser.get()``
+    does, additionally interpolating ``<name>``.
+    """
+    if value is None:
+        return None
+    value = value.replace('<name>', name)
+    if outdir is not None:
+        value = value.replace('<outdir>', outdir)
+    if '\n' in value:
+        return value.strip('\n').split('\n')
+    if value.lower() == 'true':
+        return True
+    if value.lower() == 'false':
+        return False
+    return value
+
+
+class ResolvedConfig(object):
+    """
+    A config file resolved into ``TargetSpec`` objects in one pass.
+
+    Every section is read once. Each target's settings are merged from the
+    ``[target]`` section, the pattern sections matching it (such as
+    ``[target:mypkg.tasks.*]``, less specific patterns first) and its own
+    ``[target:<name>]`` section, in increasing order of precedence.
+
+    Parameters
+    ----------
+    fname : str
+        The config file.
+    cache : FileCache, optional
+        Pass a cache to reuse the resolution while the config file is
+        unchanged.
+
+    Raises
+    ------
+    ValueError
+        If any target listed in ``[targets]`` is invalid. All problems are
+        reported together.
+
+    Examples
+    --------
+    >>> from treeshaker.config import ResolvedConfig
+    >>> config = ResolvedConfig('examples/treeshaker.cfg')
+    >>> config.targets
+    ['mypkg.target']
+    >>> spec = config.spec('mypkg.target')
+    >>> spec.outdir, spec.readme, spec.target_packages
+    ('build_target', 'build_target.md', ('mypkg', 'otherpkg'))
+    >>> spec.post_build_commands
+    ('ls', 'echo "built output in build_target/"')
+    """
+    def __init__(self, fname, cache=None):
+        self._patterns = None
+        self.fname = fname
+        self.config_path = os.path.dirname(fname)
+        key = data = None
+        if cache is not None:
+            from treeshaker.cache_utils import hash_file, hash_key
+            key = hash_key(SPEC_VERSION, os.path.abspath(fname),
+                           hash_file(fname))
+            data = cache.get(key)
+        if data is not None:
+            data = json.loads(data.decode('utf-8'))
+            self.targets = data['targets']
+            self.sections = data['sections']
+            self._specs = dict(
+                (t, TargetSpec.from_dict(s)._replace(
+                    config_path=self.config_path))
+                for t, s in data['specs'].items())
+            return
+
+        parser = ConfigParser(allow_no_value=True)
+        parser.read(fname)
+        self.targets = list(parser.options('targets')) \
+            if parser.has_section('targets') else []
+        self.sections = dict(
+            (section, dict(parser.items(section)))
+            for section in parser.sections()
+            if section == 'target' or section.startswith('target:'))
+        self._specs = {}
+
+        # resolve and validate every explicitly listed target up front
+        errors = []
+        for target in self.targets:
+            if is_pattern(target):
+                if 'target:%s' % target not in self.sections:
+                    errors.append('no [target:%s] section for pattern %s'
+                                  % (target, target))
+                continue
+            try:
+                self.spec(target)
+            except ValueError as e:
+                if str(e) not in errors:
+                    errors.append(str(e))
+        if errors:
+            raise ValueError('invalid config %s:\n%s'
+                             % (fname, '\n'.join(errors)))
+
+        if cache is not None:
+            cache.put(key, json.dumps({
+                'targets': self.targets,
+                'sections': self.sections,
+                'specs': dict((t, s.to_dict())
+                              for t, s in self._specs.items()),
+            }, sort_keys=True).encode('utf-8'))
+
+    def _layers(self, target):
+        """
+        Returns the names of the sections that apply to a target, in
+        increasing order of precedence.
+        """
+        if self._patterns is None:
+            self._patterns = sorted(
+                (s for s in self.sections
+                 if s.startswith('target:') and is_pattern(s)),
+                key=lambda s: _specificity(s[len('target:'):]))
+        patterns = [s for s in self._patterns
+                    if match_pattern(s[len('target:'):], target)]
+        layers = (['target'] if 'target' in self.sections else []) + patterns
+        if 'target:%s' % target in self.sections:
+            layers.append('target:%s' % target)
+        return layers
+
+    def spec(self, target):
+        """
+        Returns the ``TargetSpec`` of a target.
+
+        Raises
+        ------
+        ValueError
+            If no section applies to the target or its settings are invalid.
+        """
+        if target in self._specs:
+            return self._specs[target]
+        layers = self._layers(target)
+        if not layers or layers[-1] == 'target':
+            raise ValueError('no [target:%s] section (or pattern section '
+                             'matching it) for target %s' % (target, target))
+
+        raw = {}
+        for section in layers:
+            unknown = set(self.sections[section]) - set(TARGET_OPTIONS)
+            if unknown:
+                raise ValueError('unknown option%s %s in [%s]'
+                                 % ('s' if len(unknown) > 1 else '',
+                                    ', '.join(sorted(unknown)), section))
+            raw.update(self.sections[section])
+
+        name = target.split('.')[-1]
+        outdir = _parse_value(raw.get('outdir'), None, name) or name
+        outdir_section = ([s for s in layers if 'outdir' in self.sections[s]]
+                          or [None])[-1]
+        if outdir_section is not None and is_pattern(outdir_section) and \
+                '<name>' not in raw['outdir']:
+            raise ValueError('the outdir of [%s] must contain <name>, '
+                             'otherwise all targets matching it are built '
+                             'into the same directory' % outdir_section)
+        values = dict((option, _parse_value(raw.get(option), outdir, name))
+                      for option in TARGET_OPTIONS)
+        values['outdir'] = outdir
+        for option in _LIST_OPTIONS:
+            value = values[option]
+            values[option] = tuple(value) if isinstance(value, list) \
+                else (value,) if value else ()
+        for option in _BOOL_OPTIONS:
+            if values[option] not in (None, True, False):
+                raise ValueError('%s must be True or False for target %s, '
+                                 'got %r' % (option, target, values[option]))
+            values[option] = bool(values[option])
+        for option, parse in _NUMBER_OPTIONS:
+            if values[option] is None:
+                continue
+            try:
+                values[option] = parse(values[option])
+            except (TypeError, ValueError):
+                raise ValueError('%s must be a number for target %s, got %r'
+                                 % (option, target, values[option]))
+            if values[option] < 0:
+                raise ValueError('%s must not be negative for target %s'
+                                 % (option, target))
+        values['graph_engine'] = values['graph_engine'] or 'modulegraph'
+        values['doc_extraction'] = values['doc_extraction'] or 'static'
+        values['copy_strategy'] = values['copy_strategy'] or 'copy'
+        values['output_format'] = values['output_format'] or 'dir'
+        values['bytecode'] = values['bytecode'] or 'none'
+        values['resolver'] = values['resolver'] or 'pip-compile'
+        values['bytecode_invalidation'] = \
+            values['bytecode_invalidation'] or 'checked-hash'
+        try:
+            values['bytecode_optimize'] = tuple(
+                int(level) for level in values['bytecode_optimize'] or (0,))
+        except ValueError:
+            raise ValueError('bytecode_optimize must be 0, 1 or 2 for target '
+                             '%s, got %r' % (target,
+                                             values['bytecode_optimize']))
+        timeouts = []
+        for line in values['task_timeouts']:
+            task, _, seconds = line.partition('=')
+            try:
+                timeouts.append((task.strip(), float(seconds)))
+            except ValueError:
+                raise ValueError('task_timeouts must be lines of '
+                                 'task = seconds for target %s, got %r'
+                                 % (target, line))
+        values['task_timeouts'] = tuple(timeouts)
+        self._validate(target, values)
+
+        spec = TargetSpec(target=target, config_path=self.config_path,
+                          **values)
+        self._specs[target] = spec
+        return spec
+
+    @staticmethod
+    def _validate(target, values):
+        from treeshaker.archive_utils import OUTPUT_FORMATS
+        from treeshaker.ast_graph import GRAPH_ENGINES
+        from treeshaker.bytecode_utils import BYTECODE_MODES, \
+            INVALIDATION_MODES
+        from treeshaker.compile_utils import RESOLVERS
+        from treeshaker.copy_utils import COPY_STRATEGIES
+        from treeshaker.task_graph import BUILD_TASKS
+
+        problems = []
+        for option in ('requirements_file', 'target_packages'):
+            if not values[option]:
+                problems.append('%s is required' % option)
+        if values['graph_engine'] not in GRAPH_ENGINES:
+            problems.append('graph_engine must be one of %s'
+                            % ', '.join(GRAPH_ENGINES))
+        if values['doc_extraction'] not in ('static', 'import'):
+            problems.append('doc_extraction must be static or import')
+        if values['copy_strategy'] not in COPY_STRATEGIES:
+            problems.append('copy_strategy must be one of %s'
+                            % ', '.join(COPY_STRATEGIES))
+        if values['output_format'] not in OUTPUT_FORMATS:
+            problems.append('output_format must be one of %s'
+                            % ', '.join(OUTPUT_FORMATS))
+        if values['bytecode'] not in BYTECODE_MODES:
+            problems.append('bytecode must be one of %s'
+                            % ', '.join(BYTECODE_MODES))
+        if values['bytecode_invalidation'] not in INVALIDATION_MODES:
+            problems.append('bytecode_invalidation must be one of %s'
+                            % ', '.join(INVALIDATION_MODES))
+        if not set(values['bytecode_optimize']) <= set((0, 1, 2)):
+            problems.append('bytecode_optimize must be 0, 1 or 2')
+        if len(values['bytecode_optimize']) > 1 and \
+                (values['bytecode'] == 'pyc-only' or
+                 values['output_format'] in ('zip', 'zipapp')):
+            problems.append('sourceless and zipped bytecode supports only one '
+                            'bytecode_optimize level')
+        if values['resolver'] not in RESOLVERS:
+            problems.append('resolver must be one of %s'
+                            % ', '.join(RESOLVERS))
+        for task, seconds in values['task_timeouts']:
+            if task not in BUILD_TASKS:
+                problems.append('task_timeouts names unknown task %s, '
+                                'expected one of %s'
+                                % (task, ', '.join(BUILD_TASKS)))
+            elif seconds <= 0:
+                problems.append('the timeout of task %s must be positive'
+                                % task)
+        if problems:
+            raise ValueError('target %s: %s' % (target, '; '.join(problems)))
+
+    def resolve(self, targets=None):
+        """
+        Expands target names and patterns into the ``TargetSpec`` of each
+        target.
+
+        Parameters
+        ----------
+        targets : list of str, optional
+            Target names or patterns. Defaults to the ``[targets]`` section.
+
+        Returns
+        -------
+        list of TargetSpec
+            The specs, in the order the targets are listed, with patterns
+            expanded in sorted order and duplicates removed.
+        """
+        names = []
+        for target in self.targets if targets is None else targets:
+            if is_pattern(target):
+                expanded = expand_pattern(target)
+                if not expanded:
+                    print('pattern %s does not match any modules' % target)
+                names.extend(expanded)
+            else:
+                names.append(target)
+        seen = set()
+        specs = []
+        for name in names:
+            if name not in seen:
+                seen.add(name)
+                specs.append(self.spec(name))
+        return specs
+
+
+def expand_pattern(pattern):
+    """
+    Lists the modules matching a target pattern, without importing anything.
+
+    The first component of the pattern must be a literal package name. Each
+    wildcard component is matched against the modules and subpackages found
+    in the directories of the packages matched so far; the last component
+    only matches modules.
+
+    Parameters
+    ----------
+    pattern : str
+        The pattern, for example ``'mypkg.tasks.*'``.
+
+    Returns
+    -------
+    list of str
+        The names of the matching modules, sorted.
+    """
+    from treeshaker.ast_graph import AstGraphBuilder
+
+    parts = pattern.split('.')
+    if is_pattern(parts[0]):
+        raise ValueError('the first component of target pattern %s must be a '
+                         'package name' % pattern)
+    locator = AstGraphBuilder(parts[:1])
+    names = [parts[0]]
+    for i, part in enumerate(parts[1:], 1):
+        candidates = []
+        for name in names:
+            location = locator.locate(name)
+            if location is None or not location[2]:
+                continue
+            if not is_pattern(part):
+                candidates.append('%s.%s' % (name, part))
+                continue
+            children = set()
+            for path in location[2]:
+                for entry in os.listdir(path):
+                    child = entry[:-3] if entry.endswith('.py') else entry
+                    if child != '__init__' and _IDENTIFIER.match(child) and \
+                            fnmatchcase(child, part):
+                        children.add('%s.%s' % (name, child))
+            candidates.extend(sorted(children))
+        names = candidates
+    return sorted(n for n in names if locator.locate(n) is not None and
+                  locator.locate(n)[0] == 'SourceModule')
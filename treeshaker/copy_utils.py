@@ -0,0 +1,210 @@
+from __future__ import absolute_import
+
+import errno
+import os
+import shutil
+
+from treeshaker.cache_utils import hash_file
+
+
+COPY_STRATEGIES = ('copy', 'hardlink', 'reflink', 'symlink')
+
+# from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def format_bytes(n):
+    """
+    Formats a number of bytes for humans.
+
+    Examples
+    --------
+    >>> from treeshaker.copy_utils import format_bytes
+    >>> format_bytes(512), format_bytes(2048), format_bytes(3 * 1024 ** 3)
+    ('512 B', '2.0 KiB', '3.0 GiB')
+    """
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if n < 1024 or unit == 'GiB':
+            break
+        n /= 1024.
+    return ('%i %s' if unit == 'B' else '%.1f %s') % (n, unit)
+
+
+def _remove(fname):
+    # never write through an existing link, that would modify the source
+    if os.path.lexists(fname):
+        os.remove(fname)
+
+
+def _clone(src, dst):
+    """
+    Clones ``src`` to ``dst`` sharing its data blocks (a reflink), if the
+    filesystem supports it. Returns True on success.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, 'rb') as src_handle:
+        with open(dst, 'wb') as dst_handle:
+            try:
+                fcntl.ioctl(dst_handle.fileno(), _FICLONE, src_handle.fileno())
+                return True
+            except (IOError, OSError):
+                return False
+
+
+def _copy_file_range(src, dst):
+    """
+    Copies ``src`` to ``dst`` inside the kernel, without passing the data
+    through this process. Returns False if ``os.copy_file_range()`` is not
+    available or not supported for these files.
+    """
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    size = os.path.getsize(src)
+    with open(src, 'rb') as src_handle:
+        with open(dst, 'wb') as dst_handle:
+            copied = 0
+            try:
+                while copied < size:
+                    n = os.copy_file_range(src_handle.fileno(),
+                                           dst_handle.fileno(), size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError as e:
+                if e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                               errno.EOPNOTSUPP) and copied == 0:
+                    return False
+                raise
+    return True
+
+
+def copy_file(src, dst, strategy='copy'):
+    """
+    Materializes ``src`` at ``dst``, replacing any existing file.
+
+    Parameters
+    ----------
+    src, dst : str
+        The source and destination paths.
+    strategy : {'copy', 'hardlink', 'reflink', 'symlink'}
+        ``'copy'`` copies the data. ``'hardlink'`` links ``dst`` to the same
+        inode as ``src``, ``'symlink'`` creates a symbolic link to the absolute
+        path of ``src``. ``'reflink'`` clones the file sharing its data blocks
+        on filesystems that support it (btrfs, XFS), otherwise copies it with
+        ``os.copy_file_range()``. ``'hardlink'`` and ``'reflink'`` fall back to
+        copying when they are not possible, for example across filesystems.
+
+    Returns
+    -------
+    int
+        The number of bytes physically written. Links and clones write none.
+    """
+    if strategy not in COPY_STRATEGIES:
+        raise ValueError('unknown copy_strategy %r, expected one of %s'
+                         % (strategy, ', '.join(COPY_STRATEGIES)))
+    _remove(dst)
+    if strategy == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+        return 0
+    if strategy == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 0
+        except OSError:
+            pass
+    if strategy == 'reflink':
+        if _clone(src, dst):
+            shutil.copymode(src, dst)
+            return 0
+        if _copy_file_range(src, dst):
+            shutil.copymode(src, dst)
+            return os.path.getsize(dst)
+    shutil.copyfile(src, dst)
+    shutil.copymode(src, dst)
+    return os.path.getsize(dst)
+
+
+def is_identical(src, dst, strategy='copy'):
+    """
+    Tests whether ``dst`` already is what ``copy_file()`` would make of
+    ``src``, comparing sizes before hashing contents.
+
+    Returns
+    -------
+    bool or str
+        False if ``dst`` must be replaced. Otherwise True, or the hash of the
+        contents if it was computed.
+
+    Examples
+    --------
+    >>> import os, tempfile
+    >>> from treeshaker.copy_utils import copy_file, is_identical
+    >>> d = tempfile.mkdtemp()
+    >>> src, dst = os.path.join(d, 'src'), os.path.join(d, 'dst')
+    >>> with open(src, 'wb') as handle:
+    ...     _ = handle.write(b'weights')
+    >>> is_identical(src, dst)
+    False
+    >>> copy_file(src, dst)
+    7
+    >>> bool(is_identical(src, dst)), is_identical(src, dst, 'symlink')
+    (True, False)
+    >>> copy_file(src, dst, 'symlink')
+    0
+    >>> is_identical(src, dst, 'symlink'), is_identical(src, dst)
+    (True, False)
+    """
+    if strategy == 'symlink':
+        return os.path.islink(dst) and \
+            os.path.realpath(dst) == os.path.realpath(src)
+    if os.path.islink(dst) or not os.path.isfile(dst):
+        return False
+    if os.path.samefile(src, dst):
+        # a hard link is only what the hardlink strategy wants
+        return strategy == 'hardlink'
+    if os.path.getsize(src) != os.path.getsize(dst):
+        return False
+    output = hash_file(src)
+    return output if output == hash_file(dst) else False
+
+
+def copy_files(items, strategy='copy', max_workers=None):
+    """
+    Copies files concurrently with ``copy_file()``, skipping destinations
+    that are already identical according to ``is_identical()``.
+
+    Parameters
+    ----------
+    items : list of (str, str) tuples
+        The ``(src, dst)`` pairs.
+    strategy : str
+        The copy strategy, see ``copy_file()``.
+    max_workers : int, optional
+        The number of threads. Defaults to the number of CPUs plus four, as
+        copying is bound by I/O.
+
+    Returns
+    -------
+    list of (int or None, str or None) tuples
+        For each item, the number of bytes written (None if it was skipped)
+        and the hash of the contents if it was computed.
+    """
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor
+
+    def copy(item):
+        src, dst = item
+        identical = is_identical(src, dst, strategy)
+        if identical:
+            return None, identical if identical is not True else None
+        return copy_file(src, dst, strategy), None
+
+    if len(items) < 2:
+        return [copy(item) for item in items]
+    max_workers = min(len(items),
+                      max_workers or multiprocessing.cpu_count() + 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(copy, items))
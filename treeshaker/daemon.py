@@ -0,0 +1,496 @@
+from __future__ import absolute_import
+
+import contextlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from stat import S_IMODE, S_ISDIR, S_ISSOCK
+
+from treeshaker.cache_utils import hash_file, hash_key
+from treeshaker.parallel_utils import ThreadOutput, normalize_path
+
+
+# commands that are never forwarded to a daemon
+LOCAL_COMMANDS = ('watch', 'daemon', 'diff')
+
+
+def _check_owned(path, kind):
+    """
+    Raises RuntimeError unless ``path`` is of the file type tested by
+    ``kind`` (``S_ISDIR`` or ``S_ISSOCK``), is owned by the current user and
+    is inaccessible to anyone else.
+    """
+    st = os.lstat(path)
+    if not kind(st.st_mode) or \
+            (hasattr(os, 'getuid') and st.st_uid != os.getuid()) or \
+            S_IMODE(st.st_mode) & 0o077:
+        raise RuntimeError('refusing to use %s, which is not private to the '
+                           'current user' % path)
+
+
+def socket_dir():
+    """
+    Returns the private directory holding the current user's daemon sockets,
+    creating it with mode 0700 if needed: ``$XDG_RUNTIME_DIR/treeshaker`` if
+    that is set, otherwise ``treeshaker-<uid>`` in the temporary directory.
+
+    Raises
+    ------
+    RuntimeError
+        If the directory exists but is not owned by the current user or is
+        accessible to others, in which case another user could impersonate
+        the daemon.
+    """
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        path = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'treeshaker')
+    else:
+        path = os.path.join(tempfile.gettempdir(), 'treeshaker-%i' % uid)
+    try:
+        os.mkdir(path, 0o700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    _check_owned(path, S_ISDIR)
+    return path
+
+
+def socket_path(config='treeshaker.cfg', cwd=None):
+    """
+    Returns the path of the Unix domain socket of the daemon serving a config
+    file from a working directory, in ``socket_dir()``.
+
+    Relative paths in requests (such as outdirs) are resolved against the
+    daemon's working directory, so each daemon only serves clients in the
+    directory it was started from.
+    """
+    key = hash_key(normalize_path(cwd or os.getcwd()), normalize_path(config))
+    return os.path.join(socket_dir(), '%s.sock' % key[:16])
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class FileStamps(object):
+    """
+    Remembers the mtimes and sizes of a set of files and directories to tell
+    whether any of them changed.
+
+    Files listed in ``hashed`` additionally have their content hashed, so
+    that touching them without changing their content does not count as a
+    change.
+
+    Examples
+    --------
+    >>> import os, tempfile, time
+    >>> from treeshaker.daemon import FileStamps
+    >>> fname = os.path.join(tempfile.mkdtemp(), 'a.py')
+    >>> with open(fname, 'w') as handle:
+    ...     _ = handle.write('x = 1\\n')
+    >>> stamps = FileStamps([fname], hashed=[fname])
+    >>> os.utime(fname, (time.time() + 10, time.time() + 10))
+    >>> stamps.is_fresh()
+    True
+    >>> with open(fname, 'w') as handle:
+    ...     _ = handle.write('x = 2\\n')
+    >>> stamps.is_fresh()
+    False
+    """
+    def __init__(self, paths, hashed=()):
+        hashed = set(hashed)
+        self.stamps = {}
+        for path in paths:
+            stat = _stat(path)
+            sha = hash_file(path) if path in hashed and stat is not None \
+                else None
+            self.stamps[path] = (stat, sha)
+
+    def is_fresh(self):
+        for path, (stat, sha) in self.stamps.items():
+            current = _stat(path)
+            if current == stat:
+                continue
+            if sha is None or current is None or current[1] != stat[1] or \
+                    hash_file(path) != sha:
+                return False
+            self.stamps[path] = (current, sha)
+        return True
+
+
+def graph_stamps(mg, target_packages):
+    """
+    Stamps the files of all nodes of a module graph, hashing the files inside
+    the target packages, and the directories of the target packages, whose
+    mtimes change when modules are added or removed.
+    """
+    from treeshaker.requirements_utils import PrefixIndex
+
+    target_index = PrefixIndex((p, p) for p in target_packages)
+    paths = set()
+    hashed = set()
+    for node in mg.flatten():
+        filename = getattr(node, 'filename', None)
+        ours = node.identifier in target_index
+        if filename and os.path.isfile(filename):
+            paths.add(filename)
+            if ours:
+                hashed.add(filename)
+        if ours:
+            paths.update(getattr(node, 'packagepath', None) or ())
+    return FileStamps(paths, hashed=hashed)
+
+
+class DaemonState(object):
+    """
+    The state a daemon keeps in memory between requests: parsed requirements
+    files and module import graphs, each validated against the files they were
+    computed from before reuse, and one lock per outdir.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.key_locks = {}
+        self.outdir_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key, compute, stamp):
+        # computing under a per-key lock lets concurrent requests for the same
+        # graph wait for one computation instead of each running their own
+        with self._key_lock(key):
+            entry = self.entries.get(key)
+            if entry is not None and entry[0].is_fresh():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = compute()
+            self.entries[key] = (stamp(value), value)
+            return value
+
+    def requirements(self, fname, parse):
+        """
+        Returns the parsed requirements file ``fname``, calling ``parse(fname)``
+        if it changed since it was last parsed.
+        """
+        return self._cached(('requirements', normalize_path(fname)),
+                            lambda: parse(fname),
+                            lambda _: FileStamps([fname], hashed=[fname]))
+
+    def graph(self, key, target_packages, build):
+        """
+        Returns the module graph for ``key``, calling ``build()`` if any file
+        it was constructed from changed.
+        """
+        return self._cached(('graph',) + key, build,
+                            lambda mg: graph_stamps(mg, target_packages))
+
+    @contextlib.contextmanager
+    def outdir_lock(self, dest_dir):
+        with self.lock:
+            lock = self.outdir_locks.setdefault(normalize_path(dest_dir),
+                                                threading.Lock())
+        if not lock.acquire(False):
+            print('waiting for another request building into %s' % dest_dir)
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def status(self):
+        kinds = [key[0] for key in self.entries]
+        return {
+            'requirements_files': kinds.count('requirements'),
+            'module_graphs': kinds.count('graph'),
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+        }
+
+
+class _ClientStream(object):
+    """
+    Forwards text written by a request thread to the client as JSON lines.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        with self.lock:
+            self.sock.sendall(data)
+
+    def write(self, data):
+        if data:
+            self.send({'output': data})
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _read_message(sock_file):
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+class Daemon(object):
+    """
+    Serves ``treeshaker`` command lines over a Unix domain socket, running
+    each request in its own thread.
+
+    Parameters
+    ----------
+    path : str
+        The socket path.
+    idle_timeout : float, optional
+        Exit after this many seconds without requests.
+    """
+    def __init__(self, path, idle_timeout=None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.state = DaemonState()
+        self.started = time.time()
+        self.last_request = time.time()
+        self.active = 0
+        self.served = 0
+        self.lock = threading.Lock()
+        self.stopping = False
+        self.sock = None
+
+    def serve(self):
+        import treeshaker.treeshaker as ts
+
+        if os.path.exists(self.path):
+            if self._is_alive():
+                raise RuntimeError('a daemon is already listening on %s'
+                                   % self.path)
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # create the socket without permissions for others, rather than
+        # restricting them after it was bound
+        umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        self.sock.listen(16)
+        self.sock.settimeout(1.0)
+        ts._daemon_state = self.state
+        # send what each request thread prints to that request's client
+        old_stdout, old_stderr = sys.stdout, sys.stderr
+        sys.stdout = ThreadOutput(old_stdout)
+        sys.stderr = ThreadOutput(old_stderr)
+        print('treeshaker daemon listening on %s' % self.path)
+        try:
+            while not self.stopping:
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.timeout:
+                    if self._idle():
+                        print('stopping after %is without requests'
+                              % self.idle_timeout)
+                        break
+                    continue
+                thread = threading.Thread(target=self._handle, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sys.stdout, sys.stderr = old_stdout, old_stderr
+            ts._daemon_state = None
+            self.sock.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _is_alive(self):
+        try:
+            return request(self.path, {'command': 'ping'}) is not None
+        except (IOError, OSError):
+            return False
+
+    def _idle(self):
+        with self.lock:
+            return self.idle_timeout is not None and not self.active and \
+                time.time() - self.last_request > self.idle_timeout
+
+    def _handle(self, conn):
+        with self.lock:
+            self.active += 1
+            self.last_request = time.time()
+        stream = _ClientStream(conn)
+        try:
+            message = _read_message(conn.makefile('rb'))
+            if message is not None:
+                stream.send(self._run(message, stream))
+        except (IOError, OSError):
+            # the client went away
+            pass
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.served += 1
+                self.last_request = time.time()
+            conn.close()
+
+    def _run(self, message, stream):
+        command = message.get('command')
+        if command == 'ping':
+            return {'result': 'pong'}
+        if command == 'status':
+            status = self.state.status()
+            status.update(pid=os.getpid(), uptime=time.time() - self.started,
+                          requests_served=self.served,
+                          active_requests=self.active - 1)
+            return {'result': status}
+        if command == 'stop':
+            self.stopping = True
+            return {'result': 'stopping'}
+        if command != 'run':
+            return {'error': 'unknown command %r' % command}
+
+        # run a command line, sending its output to the client
+        from treeshaker.treeshaker import dispatch
+
+        argv = message['argv']
+        sys.stdout.local.stream = sys.stderr.local.stream = stream
+        try:
+            dispatch(argv)
+            returncode = 0
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else \
+                int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout.local.stream = sys.stderr.local.stream = None
+        return {'returncode': returncode}
+
+
+def request(path, message, output=None):
+    """
+    Sends a request to the daemon listening on ``path`` and returns its final
+    reply, writing any output of the request to ``output``.
+
+    Returns None if the daemon closed the connection without replying.
+
+    Raises
+    ------
+    RuntimeError
+        If the socket is not owned by the current user, so that whatever
+        listens on it cannot be trusted.
+    """
+    _check_owned(path, S_ISSOCK)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        sock_file = sock.makefile('rb')
+        while True:
+            reply = _read_message(sock_file)
+            if reply is None or 'output' not in reply:
+                return reply
+            (output or sys.stdout).write(reply['output'])
+    finally:
+        sock.close()
+
+
+def _config_arg(argv):
+    for i, arg in enumerate(argv):
+        if arg == '--config' and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith('--config='):
+            return arg.split('=', 1)[1]
+    return 'treeshaker.cfg'
+
+
+def forward(argv):
+    """
+    Runs a command line in a running daemon, if there is one for the config
+    file and working directory.
+
+    Set the environment variable ``TREESHAKER_NO_DAEMON`` to always run
+    locally.
+
+    Returns
+    -------
+    int or None
+        The return code of the command, or None if no daemon is available and
+        the command should be run locally.
+    """
+    if os.environ.get('TREESHAKER_NO_DAEMON') or \
+            not hasattr(socket, 'AF_UNIX') or \
+            (argv and argv[0] in LOCAL_COMMANDS) or \
+            any(arg in ('-', '--changed=-') for arg in argv):
+        return None
+    try:
+        path = socket_path(_config_arg(argv))
+        if not os.path.exists(path):
+            return None
+        reply = request(path, {'command': 'run', 'argv': list(argv)})
+    except (IOError, OSError):
+        return None
+    except RuntimeError as e:
+        print('not using the treeshaker daemon: %s' % e)
+        return None
+    if reply is None:
+        print('the treeshaker daemon closed the connection')
+        return 1
+    return reply['returncode']
+
+
+def daemon_from_config(config='treeshaker.cfg', stop=False, status=False,
+                       idle_timeout=None):
+    """
+    Runs a daemon that serves ``treeshaker`` commands for a config file from
+    the current directory, keeping parsed requirements and module graphs in
+    memory between commands. While it runs, ``treeshaker`` commands run in
+    the same directory with the same config are sent to it.
+
+    Parameters
+    ----------
+    config : str
+        The config file.
+    stop : bool
+        Pass True to stop the running daemon instead.
+    status : bool
+        Pass True to print the status of the running daemon instead.
+    idle_timeout : float, optional
+        Exit after this many seconds without requests.
+    """
+    if not os.path.exists(config):
+        raise IOError('could not find config file %s' % config)
+    path = socket_path(config)
+    if stop or status:
+        try:
+            reply = request(path, {'command': 'stop' if stop else 'status'})
+        except (IOError, OSError):
+            reply = None
+        if reply is None:
+            print('no treeshaker daemon is running for %s' % config)
+            sys.exit(1)
+        if status:
+            for key, value in sorted(reply['result'].items()):
+                print('%s: %s' % (key, value))
+        return
+    Daemon(path, idle_timeout=idle_timeout).serve()
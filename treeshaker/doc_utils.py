@@ -1,39 +1,374 @@
 from __future__ import absolute_import
 
-import pydoc
+import ast
+import os
 import re
+import subprocess
+import sys
 from importlib import import_module
 
-import fire
+from treeshaker.cache_utils import hash_file, hash_key
 
 
 ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
+DOC_MODES = ('static', 'import')
 
-def document_function(handle, module_name, function_name, new_name,
-                      pkg_name=None):
-    module = import_module(module_name)
-    function = getattr(module, function_name)
-    handle.write('### %s%s.%s()\n\n' % (
-        '%s.' % pkg_name if pkg_name else '', new_name, function_name))
-    handle.write('```\n')
-    handle.write('from %s%s import %s\n' % (
-        '%s.' % pkg_name, new_name, function_name))
-    handle.write('help(%s)\n' % function_name)
-    handle.write(pydoc.plain(pydoc.TextDoc().docroutine(function)))
-    handle.write('```\n')
-
-
-def document_component(handle, module_name, component_name, new_name):
-    module = import_module(module_name)
-    component = getattr(module, component_name)
-    handle.write('### %s.py\n\n' % new_name)
-    handle.write('```\n')
-    handle.write(ansi_escape.sub(
-        '',
-        fire.helptext.HelpText(
+# bump this when the rendered documentation changes, to invalidate the cache
+DOC_VERSION = 1
+
+_FUNCTION_DEFS = tuple(getattr(ast, name)
+                       for name in ('FunctionDef', 'AsyncFunctionDef')
+                       if hasattr(ast, name))
+
+
+class SourceText(object):
+    """
+    Stands in for a default value or annotation that cannot be evaluated
+    statically, rendering as its source code.
+
+    Examples
+    --------
+    >>> from treeshaker.doc_utils import SourceText
+    >>> SourceText('np.float64')
+    np.float64
+    """
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
+def _source(node):
+    """
+    Returns the source code of an expression node.
+    """
+    if hasattr(ast, 'unparse'):
+        return ast.unparse(node)
+    # Python < 3.9, render names and attributes and elide anything else
+    if isinstance(node, ast.Attribute):
+        return '%s.%s' % (_source(node.value), node.attr)
+    return getattr(node, 'id', None) or '...'
+
+
+def _arg_name(arg):
+    """
+    Returns the name of an argument node, which is a ``Name`` in Python 2
+    and an ``arg`` (or, for ``*args`` and ``**kwargs``, a str) in Python 3.
+    """
+    if isinstance(arg, str):
+        return arg
+    return getattr(arg, 'arg', None) or arg.id
+
+
+def _value(node):
+    """
+    Evaluates a default value if it is a literal, otherwise returns a
+    ``SourceText`` rendering as its source code.
+    """
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return SourceText(_source(node))
+
+
+def _annotation(node):
+    return None if node is None else SourceText(_source(node))
+
+
+def make_function(node, module_name, qualname=None):
+    """
+    Builds a stub function with the signature, annotations and docstring of a
+    function definition, without executing any of the code of its module.
+
+    Default values are evaluated if they are literals and are otherwise
+    replaced by objects whose repr is their source code. Decorators are
+    ignored.
+
+    Parameters
+    ----------
+    node : ast.FunctionDef or ast.AsyncFunctionDef
+        The function definition.
+    module_name : str
+        The name of the module containing the definition.
+    qualname : str, optional
+        The qualified name, defaults to the function's name.
+
+    Returns
+    -------
+    function
+        The stub.
+
+    Examples
+    --------
+    >>> import ast, pydoc
+    >>> from treeshaker.doc_utils import make_function
+    >>> node = ast.parse('def f(x, y=2, z=np.pi, *a, **kw):\\n'
+    ...                  '    "Adds."\\n').body[0]
+    >>> f = make_function(node, 'mod')
+    >>> print(pydoc.plain(pydoc.TextDoc().docroutine(f)))
+    f(x, y=2, z=np.pi, *a, **kw)
+        Adds.
+    <BLANKLINE>
+    """
+    args = node.args
+    params = []
+    defaults = {}
+    annotations = {}
+    positional = getattr(args, 'posonlyargs', []) + args.args
+    first_default = len(positional) - len(args.defaults)
+    kwonlyargs = getattr(args, 'kwonlyargs', [])
+    for i, arg in enumerate(positional):
+        if i >= first_default:
+            defaults['_d%i' % i] = _value(args.defaults[i - first_default])
+            params.append('%s=_d%i' % (_arg_name(arg), i))
+        else:
+            params.append(_arg_name(arg))
+        if i == len(getattr(args, 'posonlyargs', [])) - 1:
+            params.append('/')
+    if args.vararg is not None:
+        params.append('*' + _arg_name(args.vararg))
+    elif kwonlyargs:
+        params.append('*')
+    for i, (arg, default) in enumerate(
+            zip(kwonlyargs, getattr(args, 'kw_defaults', []))):
+        if default is not None:
+            defaults['_k%i' % i] = _value(default)
+            params.append('%s=_k%i' % (arg.arg, i))
+        else:
+            params.append(arg.arg)
+    if args.kwarg is not None:
+        params.append('**' + _arg_name(args.kwarg))
+    for arg in positional + kwonlyargs + \
+            [a for a in (args.vararg, args.kwarg) if a is not None]:
+        if getattr(arg, 'annotation', None) is not None:
+            annotations[arg.arg] = _annotation(arg.annotation)
+    if getattr(node, 'returns', None) is not None:
+        annotations['return'] = _annotation(node.returns)
+
+    namespace = {}
+    exec('def %s(%s):\n    pass\n' % (node.name, ', '.join(params)),
+         dict(defaults), namespace)
+    function = namespace[node.name]
+    function.__doc__ = ast.get_docstring(node, clean=False)
+    function.__module__ = module_name
+    function.__qualname__ = qualname or node.name
+    function.__annotations__ = annotations
+    return function
+
+
+def make_class(node, module_name):
+    """
+    Builds a stub class with the docstring, ``__init__()`` signature and
+    public methods of a class definition, without executing any of the code
+    of its module. Base classes are ignored.
+    """
+    members = {'__doc__': ast.get_docstring(node, clean=False),
+               '__module__': module_name}
+    for child in node.body:
+        if isinstance(child, _FUNCTION_DEFS) and \
+                (not child.name.startswith('_') or child.name == '__init__'):
+            function = make_function(child, module_name,
+                                     '%s.%s' % (node.name, child.name))
+            decorators = [_source(d) for d in child.decorator_list]
+            if 'staticmethod' in decorators:
+                function = staticmethod(function)
+            elif 'classmethod' in decorators:
+                function = classmethod(function)
+            members[child.name] = function
+    return type(node.name, (object,), members)
+
+
+def find_definition(filename, name, module_name):
+    """
+    Builds a stub for a top-level function or class defined in a source file.
+
+    Returns
+    -------
+    function, type or None
+        The stub, or None if ``name`` is not defined by a top-level ``def`` or
+        ``class`` statement (for example if it is imported from another module
+        or assigned), in which case the module must be imported.
+    """
+    with open(filename, 'rb') as handle:
+        tree = ast.parse(handle.read(), filename)
+    found = None
+    for node in tree.body:
+        if isinstance(node, _FUNCTION_DEFS + (ast.ClassDef,)) and \
+                node.name == name:
+            found = node
+        elif isinstance(node, (ast.Assign, ast.Import, ast.ImportFrom)):
+            # a later rebinding of the name makes the definition irrelevant
+            targets = [alias.asname or alias.name.split('.')[0]
+                       for alias in getattr(node, 'names', [])] + \
+                [getattr(t, 'id', None) for t in getattr(node, 'targets', [])]
+            if name in targets:
+                found = None
+    if found is None:
+        return None
+    if isinstance(found, ast.ClassDef):
+        return make_class(found, module_name)
+    return make_function(found, module_name)
+
+
+def format_function(function, function_name, new_name, pkg_name=None):
+    """
+    Renders the documentation of a function as pydoc help text.
+    """
+    import pydoc
+
+    prefix = '%s.' % pkg_name if pkg_name else ''
+    return ''.join([
+        '### %s%s.%s()\n\n' % (prefix, new_name, function_name),
+        '```\n',
+        'from %s%s import %s\n' % (prefix, new_name, function_name),
+        'help(%s)\n' % function_name,
+        pydoc.plain(pydoc.TextDoc().docroutine(function)),
+        '```\n',
+    ])
+
+
+def format_component(component, new_name):
+    """
+    Renders the help text of a fire component.
+    """
+    import fire.helptext
+    import fire.trace
+
+    return ''.join([
+        '### %s.py\n\n' % new_name,
+        '```\n',
+        ansi_escape.sub('', fire.helptext.HelpText(
             component,
             trace=fire.trace.FireTrace(component, new_name + '.py')
-        )
-    ))
-    handle.write('\n```\n')
+        )),
+        '\n```\n',
+    ])
+
+
+def render(kind, module_name, name, new_name, pkg_name=None):
+    """
+    Renders documentation by importing the module.
+
+    Parameters
+    ----------
+    kind : {'function', 'component'}
+        Whether to render pydoc help or fire help text.
+    module_name, name : str
+        The module and the name of the object in it.
+    new_name : str
+        The name of the module in the output.
+    pkg_name : str, optional
+        The name of the package in the output.
+    """
+    obj = getattr(import_module(module_name), name)
+    if kind == 'function':
+        return format_function(obj, name, new_name, pkg_name=pkg_name)
+    return format_component(obj, new_name)
+
+
+def render_in_subprocess(kind, module_name, name, new_name, pkg_name=None):
+    """
+    Like ``render()``, but imports the module in a fresh interpreter, so that
+    its import-time side effects do not affect this process. The interpreter
+    sees the same ``sys.path`` as this process.
+
+    Raises
+    ------
+    RuntimeError
+        If importing or rendering fails.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p or os.getcwd() for p in sys.path)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'treeshaker.doc_utils', kind, module_name, name,
+         new_name] + ([pkg_name] if pkg_name else []),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError('could not document %s.%s by importing it:\n%s'
+                           % (module_name, name,
+                              stderr.decode('utf-8', 'replace')))
+    return stdout.decode('utf-8')
+
+
+def document(kind, module_name, name, new_name, pkg_name=None, filename=None,
+             mode='static', cache=None):
+    """
+    Renders the documentation of a function or fire component.
+
+    In ``'static'`` mode, the signature and docstring are read from the source
+    file without importing it, if the object is a function or class defined
+    at the top level of the module. Otherwise, and in ``'import'`` mode, the
+    module is imported in a subprocess, and the result is cached keyed on the
+    hash of the source file.
+
+    Parameters
+    ----------
+    kind : {'function', 'component'}
+        Whether to render pydoc help or fire help text.
+    module_name, name : str
+        The module and the name of the object in it.
+    new_name : str
+        The name of the module in the output.
+    pkg_name : str, optional
+        The name of the package in the output.
+    filename : str, optional
+        The source file of the module. Required for static extraction.
+    mode : {'static', 'import'}
+        How to extract the documentation.
+    cache : FileCache, optional
+        Cache for documentation rendered by importing.
+
+    Returns
+    -------
+    str
+        The documentation.
+    """
+    if mode not in DOC_MODES:
+        raise ValueError('unknown doc_extraction %r, expected one of %s'
+                         % (mode, ', '.join(DOC_MODES)))
+    if mode == 'static' and filename is not None:
+        obj = find_definition(filename, name, module_name)
+        if obj is not None:
+            if kind == 'function':
+                return format_function(obj, name, new_name, pkg_name=pkg_name)
+            return format_component(obj, new_name)
+        print('%s is not defined in %s, importing it to document it'
+              % (name, module_name))
+
+    key = None
+    if cache is not None and filename is not None:
+        key = hash_key(DOC_VERSION, kind, module_name, name, new_name,
+                       pkg_name, hash_file(filename), sys.executable)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.decode('utf-8')
+    text = render_in_subprocess(kind, module_name, name, new_name,
+                                pkg_name=pkg_name)
+    if key is not None:
+        cache.put(key, text.encode('utf-8'))
+    return text
+
+
+def document_function(handle, module_name, function_name, new_name,
+                      pkg_name=None, filename=None, mode='static', cache=None):
+    handle.write(document('function', module_name, function_name, new_name,
+                          pkg_name=pkg_name, filename=filename, mode=mode,
+                          cache=cache))
+
+
+def document_component(handle, module_name, component_name, new_name,
+                       filename=None, mode='static', cache=None):
+    handle.write(document('component', module_name, component_name, new_name,
+                          filename=filename, mode=mode, cache=cache))
+
+
+def main():
+    # entry point for render_in_subprocess()
+    sys.stdout.write(render(*sys.argv[1:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,449 @@
+from __future__ import absolute_import
+
+import os
+import subprocess
+import sys
+
+
+# the budgets that can be set in the config file, and the footprint metric
+# each one limits
+BUDGETS = (
+    ('max_bytes', 'total_bytes'),
+    ('max_modules', 'module_count'),
+    ('max_import_time', 'import_time'),
+)
+
+# bump this when the structure of the footprint report changes
+FOOTPRINT_VERSION = 1
+
+# runs of the import time measurement, the fastest one is reported
+IMPORT_TIME_RUNS = 3
+
+
+def package_size(mg, target_packages):
+    """
+    Returns the total size in bytes and the number of the ``.py`` files of the
+    full ``target_packages``, as found on disk.
+    """
+    total = count = 0
+    for package in target_packages:
+        node = mg.findNode(package)
+        if node is None:
+            continue
+        if not getattr(node, 'packagepath', None):
+            if node.filename and node.filename.endswith('.py'):
+                total += os.path.getsize(node.filename)
+                count += 1
+            continue
+        for path in node.packagepath:
+            for dirpath, dirnames, fnames in os.walk(path):
+                dirnames[:] = [d for d in dirnames
+                               if d != '__pycache__' and not d.startswith('.')]
+                for fname in fnames:
+                    if fname.endswith('.py'):
+                        total += os.path.getsize(os.path.join(dirpath, fname))
+                        count += 1
+    return total, count
+
+
+def parse_importtime(output, module_name):
+    """
+    Parses the output of ``python -X importtime`` into the imports triggered
+    by importing ``module_name`` (including its parent packages).
+
+    Returns
+    -------
+    list of (str, int) tuples
+        The name and exclusive ("self") import time in microseconds of each
+        module imported.
+
+    Examples
+    --------
+    >>> from treeshaker.footprint import parse_importtime
+    >>> output = '''import time: self [us] | cumulative | imported package
+    ... import time:        50 |         50 | site
+    ... import time:       300 |        300 |   six
+    ... import time:        20 |        320 | pkg
+    ... import time:       100 |        100 |     json
+    ... import time:        10 |        110 |   pkg.util
+    ... import time:        40 |        150 | pkg.app
+    ... '''
+    >>> parse_importtime(output, 'pkg.app')  # doctest: +NORMALIZE_WHITESPACE
+    [('six', 300), ('pkg', 20), ('json', 100), ('pkg.util', 10),
+     ('pkg.app', 40)]
+    """
+    lines = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        raw = parts[2][1:]
+        lines.append((raw.strip(), int(parts[0]),
+                      len(raw) - len(raw.lstrip())))
+    parts = module_name.split('.')
+    wanted = set('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    # lines are in post-order: each top-level import follows the imports it
+    # triggered, which are indented deeper
+    result = []
+    subtree = []
+    for name, self_us, indent in lines:
+        subtree.append((name, self_us))
+        if indent == 0:
+            if name in wanted:
+                result.extend(subtree)
+            subtree = []
+    return result
+
+
+def import_location(dest_dir, new_name, add_setup_py=False,
+                    output_format='dir', archive=None):
+    """
+    Determines how to import a module of a target's output.
+
+    Returns
+    -------
+    (str, str) tuple or None
+        The ``sys.path`` entry and the full name of the module, or None if the
+        output cannot be imported in place (tar.gz archives).
+
+    Examples
+    --------
+    >>> from treeshaker.footprint import import_location
+    >>> import_location('out/app', 'target')  # doctest: +ELLIPSIS
+    ('.../out', 'app.target')
+    >>> import_location('out/app', 'target', add_setup_py=True,
+    ...                 output_format='zip', archive='out/app.zip')
+    ('out/app.zip/app', 'app.target')
+    """
+    pkg_name = os.path.basename(os.path.normpath(dest_dir))
+    module_name = '%s.%s' % (pkg_name, new_name)
+    if output_format == 'dir':
+        if add_setup_py:
+            return dest_dir, module_name
+        # the outdir itself is the package
+        return os.path.dirname(os.path.abspath(dest_dir)), module_name
+    if output_format == 'zip':
+        # zip archives contain the outdir
+        return (os.path.join(archive, pkg_name) if add_setup_py else archive,
+                module_name)
+    if output_format in ('wheel', 'zipapp'):
+        # wheels and zipapps contain the package at their root
+        return archive, module_name
+    return None
+
+
+def measure_import_time(module_name, path, runs=IMPORT_TIME_RUNS):
+    """
+    Measures the cold import time of a module with ``python -X importtime``
+    in a fresh interpreter that has ``path`` instead of the working directory
+    at the front of ``sys.path``, ignores ``PYTHONPATH`` and does not write
+    bytecode.
+
+    Parameters
+    ----------
+    module_name : str
+        The module to import.
+    path : str
+        The directory (or zip file) to import it from.
+    runs : int
+        The number of measurements. The fastest is returned.
+
+    Returns
+    -------
+    list of (str, int) tuples
+        See ``parse_importtime()``.
+
+    Raises
+    ------
+    RuntimeError
+        If the import fails or ``-X importtime`` is not supported (it was added
+        in Python 3.7).
+    """
+    if sys.version_info < (3, 7):
+        raise RuntimeError('measuring import time requires Python 3.7+')
+    code = 'import sys; sys.path[0] = %r; import %s' \
+        % (os.path.abspath(path), module_name)
+    best = None
+    for _ in range(runs):
+        proc = subprocess.Popen(
+            [sys.executable, '-E', '-B', '-X', 'importtime', '-c', code],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _, stderr = proc.communicate()
+        stderr = stderr.decode('utf-8', 'replace')
+        if proc.returncode != 0:
+            raise RuntimeError('could not import %s from %s:\n%s' % (
+                module_name, path, '\n'.join(
+                    line for line in stderr.splitlines()
+                    if not line.startswith('import time:'))))
+        imports = parse_importtime(stderr, module_name)
+        if best is None or sum(t for _, t in imports) < \
+                sum(t for _, t in best):
+            best = imports
+    return best
+
+
+def attribute_import_time(imports, own_modules, req_index):
+    """
+    Splits import time between the target's own modules, each external
+    requirement and everything else (the standard library and packages not
+    in the requirements).
+
+    Parameters
+    ----------
+    imports : list of (str, int) tuples
+        The output of ``parse_importtime()``.
+    own_modules : set of str
+        The names of the target's modules in the output.
+    req_index : PrefixIndex
+        Maps module names to requirements.
+
+    Returns
+    -------
+    dict
+        Keys ``'total'``, ``'target_modules'`` and ``'other'`` (in seconds),
+        and ``'requirements'``, a map from each requirement line to its import
+        time in seconds.
+    """
+    result = {'total': 0., 'target_modules': 0., 'other': 0.,
+              'requirements': {}}
+    for name, self_us in imports:
+        seconds = self_us / 1e6
+        result['total'] += seconds
+        req = req_index.get(name)
+        if name in own_modules:
+            result['target_modules'] += seconds
+        elif req is not None:
+            result['requirements'][req.line] = \
+                result['requirements'].get(req.line, 0.) + seconds
+        else:
+            result['other'] += seconds
+    return result
+
+
+def module_footprint(our_mods, old_name_to_new_name, package_bytes,
+                     package_modules):
+    """
+    Computes the size of the modules copied for a target and what was saved
+    compared to shipping the full ``target_packages``.
+
+    Returns
+    -------
+    dict
+        Keys ``'modules'`` (a list of dicts with keys ``'name'``,
+        ``'new_name'``, ``'bytes'`` and ``'share'``, largest first),
+        ``'total_bytes'``, ``'module_count'``, ``'package_bytes'``,
+        ``'package_modules'``, ``'saved_bytes'`` and ``'saved_modules'``.
+    """
+    sizes = [(m.identifier, os.path.getsize(m.filename) if m.filename else 0)
+             for m in our_mods]
+    total = sum(size for _, size in sizes)
+    modules = [{'name': name, 'new_name': old_name_to_new_name[name],
+                'bytes': size, 'share': float(size) / total if total else 0.}
+               for name, size in sorted(sizes, key=lambda x: (-x[1], x[0]))]
+    return {
+        'modules': modules,
+        'total_bytes': total,
+        'module_count': len(modules),
+        'package_bytes': package_bytes,
+        'package_modules': package_modules,
+        'saved_bytes': package_bytes - total,
+        'saved_modules': package_modules - len(modules),
+    }
+
+
+def copy_sources(src_dir, dst_dir):
+    """
+    Copies the ``.py`` files of a directory tree, without any bytecode.
+    """
+    import shutil
+
+    for dirpath, dirnames, fnames in os.walk(src_dir):
+        dirnames[:] = [d for d in dirnames if d != '__pycache__']
+        target = os.path.join(dst_dir, os.path.relpath(dirpath, src_dir))
+        for fname in fnames:
+            if fname.endswith('.py'):
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                shutil.copyfile(os.path.join(dirpath, fname),
+                                os.path.join(target, fname))
+
+
+def measure_footprint(mg, target_module_name, our_mods, old_name_to_new_name,
+                      target_packages, req_index, location=None,
+                      sources=None):
+    """
+    Computes the footprint of a target's output.
+
+    Parameters
+    ----------
+    mg : ModuleGraph or CachedModuleGraph
+        The module import graph.
+    target_module_name : str
+        The name of the target module.
+    our_mods : set of Node
+        The modules copied to the output.
+    old_name_to_new_name : dict
+        The new name of each module in the output.
+    target_packages : list of str
+        The packages the modules were copied from.
+    req_index : PrefixIndex
+        Maps module names to requirements.
+    location : (str, str) tuple, optional
+        The output of ``import_location()`` for the target module. Pass it to
+        measure the import time.
+    sources : (str, str) tuple, optional
+        For outputs that ship bytecode next to their sources, the outdir and
+        its path relative to the ``sys.path`` entry in ``location``. Pass it to
+        also measure the import time of a copy of the sources without the
+        bytecode.
+
+    Returns
+    -------
+    dict
+        The output of ``module_footprint()``, with ``'import_time'`` set to
+        the output of ``attribute_import_time()`` (None if it was not
+        measured), ``'import_error'`` set to the reason if the measurement
+        failed and ``'import_time_without_bytecode'`` set to the total import
+        time of the sources alone if ``sources`` was passed.
+    """
+    package_bytes, package_modules = package_size(mg, target_packages)
+    footprint = module_footprint(our_mods, old_name_to_new_name,
+                                 package_bytes, package_modules)
+    footprint['import_time'] = footprint['import_error'] = None
+    footprint['import_time_without_bytecode'] = None
+    if location is None:
+        return footprint
+    path, module_name = location
+    prefix = module_name[:-len(old_name_to_new_name[target_module_name])]
+    own_modules = set(prefix + n for n in old_name_to_new_name.values())
+    parts = prefix.rstrip('.').split('.') if prefix else []
+    own_modules.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    try:
+        imports = measure_import_time(module_name, path)
+    except RuntimeError as e:
+        footprint['import_error'] = str(e)
+        return footprint
+    footprint['import_time'] = attribute_import_time(imports, own_modules,
+                                                     req_index)
+    if sources is not None:
+        import shutil
+        import tempfile
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            copy_sources(sources[0], os.path.join(tmp_dir, sources[1]))
+            imports = measure_import_time(module_name, tmp_dir)
+        except RuntimeError as e:
+            footprint['import_error'] = str(e)
+            return footprint
+        finally:
+            shutil.rmtree(tmp_dir)
+        footprint['import_time_without_bytecode'] = attribute_import_time(
+            imports, own_modules, req_index)['total']
+    return footprint
+
+
+def check_budgets(footprint, budgets):
+    """
+    Compares a footprint against budgets.
+
+    Parameters
+    ----------
+    footprint : dict
+        The footprint, with ``'import_time'`` set to the output of
+        ``attribute_import_time()`` or None.
+    budgets : dict
+        Map from budget names in ``BUDGETS`` to limits. Missing or None
+        limits are not enforced.
+
+    Returns
+    -------
+    list of str
+        A description of each exceeded budget.
+
+    Examples
+    --------
+    >>> from treeshaker.footprint import check_budgets
+    >>> check_budgets({'total_bytes': 2048, 'module_count': 3,
+    ...                'import_time': {'total': 0.25}},
+    ...               {'max_bytes': 1024, 'max_import_time': 0.5})
+    ['total_bytes is 2048, exceeding max_bytes=1024']
+    """
+    violations = []
+    for budget, metric in BUDGETS:
+        limit = budgets.get(budget)
+        if limit is None:
+            continue
+        value = footprint.get(metric)
+        if metric == 'import_time':
+            if value is None:
+                violations.append('could not measure import time for %s'
+                                  % budget)
+                continue
+            value = value['total']
+        if value > limit:
+            violations.append('%s is %s, exceeding %s=%s'
+                              % (metric, value, budget, limit))
+    return violations
+
+
+def format_footprint(target, footprint, top=10):
+    """
+    Renders a footprint as lines of text, listing the ``top`` largest modules
+    and the requirements that take longest to import.
+    """
+    from treeshaker.copy_utils import format_bytes
+
+    lines = ['footprint of %s: %i modules, %s (full target_packages: %i '
+             'modules, %s; saved %i modules, %s)'
+             % (target, footprint['module_count'],
+                format_bytes(footprint['total_bytes']),
+                footprint['package_modules'],
+                format_bytes(footprint['package_bytes']),
+                footprint['saved_modules'],
+                format_bytes(footprint['saved_bytes']))]
+    for m in footprint['modules'][:top]:
+        lines.append('  %10s %5.1f%%  %s' % (format_bytes(m['bytes']),
+                                             100 * m['share'], m['name']))
+    if len(footprint['modules']) > top:
+        lines.append('  ... %i more' % (len(footprint['modules']) - top))
+    import_time = footprint.get('import_time')
+    if import_time is not None:
+        parts = ['target modules %.1f ms'
+                 % (1e3 * import_time['target_modules'])]
+        parts.extend('%s %.1f ms' % (req, 1e3 * t) for req, t in sorted(
+            import_time['requirements'].items(), key=lambda x: -x[1]))
+        parts.append('other %.1f ms' % (1e3 * import_time['other']))
+        lines.append('import time: %.1f ms (%s)'
+                     % (1e3 * import_time['total'], ', '.join(parts)))
+        without = footprint.get('import_time_without_bytecode')
+        if without is not None:
+            lines.append('import time without bytecode: %.1f ms (bytecode '
+                         'makes cold imports %.1fx faster)'
+                         % (1e3 * without, without / import_time['total']
+                            if import_time['total'] else 1.))
+    elif footprint.get('import_error'):
+        lines.append('import time: not measured, %s'
+                     % footprint['import_error'].splitlines()[0])
+    return lines
+
+
+def build_footprint_report(summaries):
+    """
+    Collects the footprints and budget violations from the summaries returned
+    by ``process_module()`` into a JSON-serializable report.
+    """
+    import platform
+
+    import treeshaker
+
+    return {
+        'version': FOOTPRINT_VERSION,
+        'treeshaker_version': treeshaker.__version__,
+        'python': platform.python_version(),
+        'targets': dict(
+            (target, dict(summary['footprint'],
+                          budget_violations=summary['budget_violations']))
+            for target, summary in summaries.items()
+            if summary['footprint'] is not None),
+    }
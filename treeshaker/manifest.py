@@ -0,0 +1,226 @@
+from __future__ import absolute_import
+
+import json
+import os
+import threading
+
+from treeshaker.cache_utils import hash_bytes, hash_file
+
+
+MANIFEST_NAME = '.treeshaker-manifest.json'
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """
+    Tracks the files treeshaker wrote into an output directory, together with
+    hashes of the inputs they were generated from and of their contents.
+
+    A rebuild consults the manifest to skip regenerating files whose inputs did
+    not change, avoids rewriting files whose new content is identical to what
+    is already on disk (preserving their mtimes), and deletes files that the
+    previous build wrote but the current one no longer produces.
+
+    Files can be written from several threads at once.
+
+    Parameters
+    ----------
+    dest_dir : str
+        The output directory.
+    check : bool
+        Pass True to only compare inputs against the manifest. Nothing is
+        written, and ``stale`` lists every file that a build would touch.
+    fname : str, optional
+        The manifest file. Defaults to ``MANIFEST_NAME`` inside ``dest_dir``.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> from treeshaker.manifest import Manifest
+    >>> dest_dir = tempfile.mkdtemp()
+    >>> m = Manifest(dest_dir)
+    >>> m.write('a.py', b'x = 1\\n', {'source': 'abc'})
+    True
+    >>> m.save()
+    >>> m = Manifest(dest_dir)
+    >>> m.is_fresh('a.py', {'source': 'abc'})
+    True
+    >>> m.is_fresh('a.py', {'source': 'def'})
+    False
+    >>> m.write('a.py', b'x = 1\\n', {'source': 'def'})  # same content
+    False
+    """
+    def __init__(self, dest_dir, check=False, fname=None):
+        self.dest_dir = dest_dir
+        self.fname = fname or os.path.join(dest_dir, MANIFEST_NAME)
+        self.check = check
+        self.old = {}
+        self.new = {}
+        self.stale = []
+        self.written = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        if os.path.exists(self.fname):
+            with open(self.fname, 'r') as handle:
+                data = json.load(handle)
+            if data.get('version') == MANIFEST_VERSION:
+                self.old = data['files']
+
+    def path(self, relpath):
+        return os.path.join(self.dest_dir, relpath)
+
+    def _matches_output(self, relpath, entry):
+        try:
+            st = os.stat(self.path(relpath))
+        except OSError:
+            return False
+        if [st.st_size, st.st_mtime] == entry['stat']:
+            return True
+        # copies that were never hashed must be redone
+        return entry['output'] is not None and \
+            hash_file(self.path(relpath)) == entry['output']
+
+    def is_fresh(self, relpath, inputs):
+        """
+        Returns True if ``relpath`` was generated from exactly ``inputs`` by
+        the previous build and has not been modified since. Fresh files are
+        recorded in the new manifest and need not be regenerated.
+
+        In check mode, non-fresh files are added to ``stale``.
+        """
+        entry = self.old.get(relpath)
+        if entry is not None and entry['inputs'] == inputs and \
+                self._matches_output(relpath, entry):
+            with self._lock:
+                self.new[relpath] = entry
+                self.skipped += 1
+            return True
+        with self._lock:
+            if self.check and relpath not in self.stale:
+                self.stale.append(relpath)
+        return False
+
+    def _record(self, relpath, inputs, output, written=None):
+        # written is the number of bytes written, None if the file was skipped
+        st = os.stat(self.path(relpath))
+        with self._lock:
+            self.new[relpath] = {'inputs': inputs, 'output': output,
+                                 'stat': [st.st_size, st.st_mtime]}
+            if written is None:
+                self.skipped += 1
+            else:
+                self.bytes_written += written
+                self.written += 1
+
+    def write(self, relpath, data, inputs):
+        """
+        Writes ``data`` (bytes) to ``relpath`` unless the file already has
+        exactly this content.
+
+        Returns
+        -------
+        bool
+            True if the file was written.
+        """
+        if self.check:
+            self.is_fresh(relpath, inputs)
+            return False
+        output = hash_bytes(data)
+        fname = self.path(relpath)
+        if os.path.exists(fname) and hash_file(fname) == output:
+            self._record(relpath, inputs, output)
+            return False
+        if not os.path.isdir(os.path.dirname(fname)):
+            try:
+                os.makedirs(os.path.dirname(fname))
+            except OSError:
+                # created by another thread in the meantime
+                if not os.path.isdir(os.path.dirname(fname)):
+                    raise
+        with open(fname, 'wb') as handle:
+            handle.write(data)
+        self._record(relpath, inputs, output, written=len(data))
+        return True
+
+    def copy(self, relpath, src, inputs, strategy='copy'):
+        """
+        Copies the file ``src`` to ``relpath`` unless the destination already
+        has the same content.
+
+        Returns
+        -------
+        bool
+            True if the file was copied.
+        """
+        return self.copy_many([(relpath, src, inputs)], strategy=strategy)[0]
+
+    def copy_many(self, items, strategy='copy', max_workers=None):
+        """
+        Copies files concurrently, skipping those whose inputs are unchanged
+        (see ``is_fresh()``) and those whose destination already matches the
+        source in size and hash. Bytes written through hard links, symbolic
+        links and reflinks are not counted in ``bytes_written``.
+
+        Parameters
+        ----------
+        items : list of (str, str, dict) tuples
+            The ``(relpath, src, inputs)`` of each file.
+        strategy : str
+            How to copy the files, see ``treeshaker.copy_utils.copy_file()``.
+        max_workers : int, optional
+            The number of threads to copy with.
+
+        Returns
+        -------
+        list of bool
+            For each item, True if the file was copied.
+        """
+        from treeshaker.copy_utils import copy_files
+
+        todo = [i for i, (relpath, _, inputs) in enumerate(items)
+                if not self.is_fresh(relpath, inputs)]
+        copied = [False] * len(items)
+        if self.check or not todo:
+            return copied
+        results = copy_files([(items[i][1], self.path(items[i][0]))
+                              for i in todo],
+                             strategy=strategy, max_workers=max_workers)
+        for i, (written, output) in zip(todo, results):
+            relpath, _, inputs = items[i]
+            self._record(relpath, inputs, output, written=written)
+            copied[i] = written is not None
+        return copied
+
+    def removed(self):
+        """
+        Returns the files written by the previous build that the current build
+        did not produce.
+        """
+        return sorted(set(self.old) - set(self.new) - set(self.stale))
+
+    def prune(self):
+        """
+        Deletes the files returned by ``removed()``, and the subdirectories
+        (such as ``__pycache__``) they leave empty.
+        """
+        removed = self.removed()
+        if self.check:
+            self.stale.extend(removed)
+            return removed
+        for relpath in removed:
+            if os.path.lexists(self.path(relpath)):
+                os.remove(self.path(relpath))
+        for dirname in sorted(set(os.path.dirname(r) for r in removed
+                                  if os.path.dirname(r)), reverse=True):
+            if os.path.isdir(self.path(dirname)) and \
+                    not os.listdir(self.path(dirname)):
+                os.rmdir(self.path(dirname))
+        return removed
+
+    def save(self):
+        if self.check:
+            return
+        with open(self.fname, 'w') as handle:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.new}, handle,
+                      indent=1, sort_keys=True)
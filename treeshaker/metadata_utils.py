@@ -0,0 +1,500 @@
+from __future__ import absolute_import
+
+import os
+import re
+import sys
+import threading
+
+from treeshaker.cache_utils import hash_key
+
+
+# bump this when the modules found for a distribution change, to invalidate
+# the persisted module indexes
+MODULE_INDEX_VERSION = 1
+
+# bump this when the names, versions or requirements read for a distribution
+# change, to invalidate the persisted distribution tables
+DIST_INDEX_VERSION = 1
+
+# the index of the running interpreter's environment, see environment_index()
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def canonicalize_name(name):
+    """
+    Normalizes a distribution name as in PEP 503.
+
+    Examples
+    --------
+    >>> from treeshaker.metadata_utils import canonicalize_name
+    >>> canonicalize_name('Requirements_Parser')
+    'requirements-parser'
+    >>> canonicalize_name('zope.interface')
+    'zope-interface'
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _packaging():
+    """
+    Returns the ``packaging.requirements`` module, falling back to the copy
+    vendored in pip, which pip-tools always installs.
+    """
+    try:
+        from packaging import requirements
+    except ImportError:
+        from pip._vendor.packaging import requirements
+    return requirements
+
+
+def parse_requirement(line):
+    """
+    Parses a PEP 508 requirement, returning None for lines that are not one,
+    such as editable installs.
+
+    Examples
+    --------
+    >>> from treeshaker.metadata_utils import parse_requirement
+    >>> req = parse_requirement('Click>=7.0; python_version >= "3"')
+    >>> req.name, str(req.specifier)
+    ('Click', '>=7.0')
+    >>> parse_requirement('-e ./externaldep') is None
+    True
+    """
+    requirements = _packaging()
+    try:
+        return requirements.Requirement(line)
+    except requirements.InvalidRequirement:
+        return None
+
+
+def environment_fingerprint(path=None):
+    """
+    Fingerprints the distributions installed on ``path`` (defaults to
+    ``sys.path``) by the names of their metadata directories, which include
+    their versions. Installing, upgrading or removing a distribution changes
+    the fingerprint.
+    """
+    entries = []
+    for entry in sys.path if path is None else path:
+        try:
+            names = os.listdir(entry or '.')
+        except OSError:
+            continue
+        entries.append((entry, sorted(
+            name for name in names
+            if name.endswith('.dist-info') or name.endswith('.egg-info'))))
+    return hash_key(entries)
+
+
+def read_headers(dist, names=('Name', 'Version', 'Requires-Dist')):
+    """
+    Reads headers from the metadata of a distribution. Only the header block
+    is split, which is much faster than parsing it with ``dist.metadata``.
+
+    Returns
+    -------
+    dict
+        Map from each header in ``names`` to the list of its values.
+    """
+    text = dist.read_text('METADATA') or dist.read_text('PKG-INFO') or ''
+    headers = dict((name.lower(), []) for name in names)
+    values = None
+    for line in text.partition('\n\n')[0].splitlines():
+        if line[:1] in (' ', '\t'):
+            # a continuation of the previous header
+            if values is not None:
+                values[-1] += ' ' + line.strip()
+            continue
+        name, _, value = line.partition(':')
+        values = headers.get(name.strip().lower())
+        if values is not None:
+            values.append(value.strip())
+    return dict((name, headers[name.lower()]) for name in names)
+
+
+def distribution_modules(files):
+    """
+    Determines the modules a distribution provides from the files it
+    installed, as listed in its ``RECORD``. A module inside a namespace
+    package is named by its full dotted path, so that distributions sharing a
+    namespace are told apart.
+
+    Examples
+    --------
+    >>> from treeshaker.metadata_utils import distribution_modules
+    >>> distribution_modules([
+    ...     'six.py', 'yaml/__init__.py', 'yaml/cyaml.py',
+    ...     '_yaml.cpython-311-x86_64-linux-gnu.so',
+    ...     'google/cloud/storage/__init__.py', 'google/cloud/storage/blob.py',
+    ...     'PyYAML-6.0.dist-info/RECORD', '../../bin/yaml-tool',
+    ...     'yaml/__pycache__/cyaml.cpython-311.pyc'])
+    ['_yaml', 'google.cloud.storage', 'six', 'yaml']
+    """
+    sources = []
+    for path in files:
+        parts = path.replace('\\', '/').split('/')
+        if parts[0] in ('', '.', '..') or '__pycache__' in parts or \
+                parts[0].endswith(('.dist-info', '.egg-info', '.data')):
+            continue
+        name = parts[-1]
+        if name.endswith('.py') or name.endswith(('.so', '.pyd')):
+            sources.append(parts[:-1] + [name.split('.', 1)[0]])
+    packages = set(tuple(parts[:-1]) for parts in sources
+                   if parts[-1] == '__init__')
+    modules = set()
+    for parts in sources:
+        # the outermost regular package, or the module itself if it is only
+        # inside namespace packages
+        for i in range(1, len(parts)):
+            if tuple(parts[:i]) in packages:
+                parts = parts[:i]
+                break
+        if parts[-1] != '__init__' and \
+                not parts[-1].startswith('__editable__'):
+            modules.add('.'.join(parts))
+    return sorted(modules)
+
+
+def _read_modules(dist):
+    """
+    Returns the modules a distribution provides, from its ``RECORD`` or else
+    its ``top_level.txt``.
+    """
+    record = dist.read_text('RECORD')
+    if record:
+        modules = distribution_modules(
+            line.rsplit(',', 2)[0] for line in record.splitlines() if line)
+        if modules:
+            return modules
+    top_level = dist.read_text('top_level.txt') or ''
+    return sorted(set(line.strip() for line in top_level.splitlines()
+                      if line.strip()))
+
+
+class DistributionIndex(object):
+    """
+    Indexes the metadata of the distributions installed in an environment by
+    their canonical names. The ``Requires-Dist`` of each distribution are
+    parsed the first time they are needed, and the modules provided by all
+    distributions (see ``modules()``) are read the first time one is needed.
+    With a ``cache``, the metadata of the distributions is only read when the
+    environment changed since it was persisted.
+
+    Parameters
+    ----------
+    path : list of str, optional
+        The directories to find distributions in. Defaults to ``sys.path``.
+        If a distribution is installed more than once, the first one wins, as
+        for imports.
+    cache : FileCache, optional
+        Pass a cache to persist the name, version and requirements of each
+        distribution and the modules they provide, keyed on
+        ``environment_fingerprint()``.
+    fingerprint : str, optional
+        The ``environment_fingerprint()`` of ``path``, if already known.
+
+    Examples
+    --------
+    >>> from treeshaker.metadata_utils import DistributionIndex
+    >>> index = DistributionIndex()
+    >>> index.version('Six') == index.version('six') is not None
+    True
+    >>> index.modules('requirements-parser')
+    ['requirements']
+
+    A second index with the same cache reads the table of distributions and
+    their modules from it:
+
+    >>> import tempfile
+    >>> from treeshaker.cache_utils import FileCache
+    >>> cache = FileCache(tempfile.mkdtemp())
+    >>> DistributionIndex(cache=cache).modules('six')
+    ['six']
+    >>> cached = DistributionIndex(cache=cache)
+    >>> cached.version('six') == index.version('six'), cached.modules('six')
+    (True, ['six'])
+    >>> [str(r) for r in cached.requires('six')]
+    []
+    """
+    def __init__(self, path=None, cache=None, fingerprint=None):
+        import json
+
+        self.path = path
+        self.cache = cache
+        self.fingerprint = fingerprint
+        # (name, version, Requires-Dist lines) of each distribution, reading
+        # its metadata only once
+        self._dists = None
+        # the distribution objects, only listed if something is not cached
+        self._distributions = None
+        self._requires = {}
+        self._modules = None
+        self._lock = threading.Lock()
+        key = None
+        if cache is not None:
+            if self.fingerprint is None:
+                self.fingerprint = environment_fingerprint(path)
+            key = hash_key('distributions', DIST_INDEX_VERSION,
+                           self.fingerprint, path)
+            data = cache.get(key)
+            if data is not None:
+                self._dists = dict(
+                    (key_, tuple(entry)) for key_, entry
+                    in json.loads(data.decode('utf-8')).items())
+                return
+        self._dists = {}
+        for key_, (dist, headers) in self._list_distributions().items():
+            self._dists[key_] = (headers['Name'][0], headers['Version'][0],
+                                 headers['Requires-Dist'])
+        if key is not None:
+            # resolve the egg-info fallback of requires() up front, since the
+            # distribution objects are not available on a cache hit
+            for key_, (name, version, lines) in self._dists.items():
+                if not lines:
+                    self._dists[key_] = (name, version, list(
+                        self._distributions[key_].requires or ()))
+            cache.put(key, json.dumps(self._dists,
+                                      sort_keys=True).encode('utf-8'))
+
+    def _list_distributions(self):
+        """
+        Lists the distributions on ``path``, returning a dict mapping their
+        canonical names to the distribution and its headers (see
+        ``read_headers()``), and keeps the distributions for ``requires()``
+        and ``module_map()``.
+        """
+        try:
+            from importlib.metadata import distributions
+        except ImportError:
+            from importlib_metadata import distributions
+
+        found = {}
+        for dist in distributions(
+                **({} if self.path is None else {'path': self.path})):
+            headers = read_headers(dist)
+            if not headers['Name'] or not headers['Version']:
+                continue
+            found.setdefault(canonicalize_name(headers['Name'][0]),
+                             (dist, headers))
+        self._distributions = dict(
+            (key, dist) for key, (dist, _) in found.items())
+        return found
+
+    def __contains__(self, name):
+        return canonicalize_name(name) in self._dists
+
+    def __len__(self):
+        return len(self._dists)
+
+    def name(self, name):
+        """
+        Returns the name of a distribution as declared in its metadata.
+        """
+        return self._dists[canonicalize_name(name)][0]
+
+    def version(self, name):
+        """
+        Returns the installed version of a distribution, or None.
+        """
+        dist = self._dists.get(canonicalize_name(name))
+        return None if dist is None else dist[1]
+
+    def requires(self, name):
+        """
+        Returns the parsed ``Requires-Dist`` of an installed distribution.
+        """
+        key = canonicalize_name(name)
+        if key not in self._requires:
+            lines = self._dists[key][2]
+            if not lines and self._distributions is not None:
+                # egg-info keeps its requirements in requires.txt
+                lines = self._distributions[key].requires or ()
+            self._requires[key] = [r for r in map(parse_requirement, lines)
+                                   if r is not None]
+        return self._requires[key]
+
+    def module_map(self):
+        """
+        Returns a dict mapping the canonical name of each distribution to the
+        modules it provides, loading it from ``cache`` if possible.
+        """
+        import json
+
+        with self._lock:
+            if self._modules is not None:
+                return self._modules
+            key = None
+            if self.cache is not None:
+                if self.fingerprint is None:
+                    self.fingerprint = environment_fingerprint(self.path)
+                key = hash_key(MODULE_INDEX_VERSION, self.fingerprint,
+                               self.path)
+                data = self.cache.get(key)
+                if data is not None:
+                    self._modules = json.loads(data.decode('utf-8'))
+                    return self._modules
+            if self._distributions is None:
+                self._list_distributions()
+            self._modules = dict(
+                (key_, _read_modules(self._distributions[key_]))
+                for key_ in self._dists)
+            if key is not None:
+                self.cache.put(key, json.dumps(
+                    self._modules, sort_keys=True).encode('utf-8'))
+            return self._modules
+
+    def modules(self, name):
+        """
+        Returns the modules an installed distribution provides, or None if it
+        is not installed or its metadata does not say.
+        """
+        return self.module_map().get(canonicalize_name(name)) or None
+
+    def pin(self, roots):
+        """
+        Pins requirements and their transitive dependencies to the installed
+        versions, following ``Requires-Dist`` whose environment markers
+        apply to the running interpreter and the requested extras.
+
+        Parameters
+        ----------
+        roots : list of str
+            The requirement lines to start from.
+
+        Returns
+        -------
+        list of str
+            ``name==version`` for every distribution needed, sorted by
+            canonical name. Roots whose environment markers do not apply to
+            the running interpreter are skipped, and distributions only
+            required by roots with markers, directly or through other
+            distributions, keep those markers, as in the output of
+            pip-compile.
+
+        Raises
+        ------
+        RuntimeError
+            If a needed distribution is not installed, or the installed
+            version does not satisfy a requirement.
+
+        Examples
+        --------
+        >>> import os, tempfile
+        >>> from treeshaker.metadata_utils import DistributionIndex
+        >>> path = tempfile.mkdtemp()
+        >>> for name, requires in [('app', 'lib>=1'), ('lib', None),
+        ...                        ('tool', 'lib')]:
+        ...     os.mkdir(os.path.join(path, '%s-1.0.dist-info' % name))
+        ...     with open(os.path.join(path, '%s-1.0.dist-info' % name,
+        ...                            'METADATA'), 'w') as handle:
+        ...         _ = handle.write('Name: %s\\nVersion: 1.0\\n' % name)
+        ...         if requires:
+        ...             _ = handle.write('Requires-Dist: %s\\n' % requires)
+        >>> index = DistributionIndex(path=[path])
+        >>> index.pin(['app; python_version >= "2"'])
+        ['app==1.0; python_version >= "2"', 'lib==1.0; python_version >= "2"']
+        >>> index.pin(['app; python_version >= "2"', 'tool'])
+        ['app==1.0; python_version >= "2"', 'lib==1.0', 'tool==1.0']
+        """
+        versions = {}
+        extras = {}
+        # None for distributions reached from an unmarked root, else the set
+        # of markers of the roots they are reached from
+        markers = {}
+        problems = []
+        queue = [(parse_requirement(line), None) for line in roots]
+        unparsed = [line for line, (req, _) in zip(roots, queue)
+                    if req is None]
+        if unparsed:
+            raise RuntimeError('cannot pin %s from the environment'
+                               % ', '.join(unparsed))
+        queue = [(req, None, None if req.marker is None else str(req.marker))
+                 for req, _ in queue
+                 if req.marker is None or req.marker.evaluate({'extra': ''})]
+
+        def add_marker(key, marker):
+            # returns whether the markers of the distribution were widened
+            if key not in markers:
+                markers[key] = None if marker is None else set([marker])
+            elif markers[key] is None or marker in markers[key]:
+                return False
+            elif marker is None:
+                markers[key] = None
+            else:
+                markers[key].add(marker)
+            return True
+
+        while queue:
+            req, parent, marker = queue.pop()
+            key = canonicalize_name(req.name)
+            if key not in self._dists:
+                problems.append('%s is not installed' % (
+                    req.name if parent is None
+                    else '%s, required by %s' % (req.name, parent)))
+                continue
+            version = self._dists[key][1]
+            if req.specifier and \
+                    not req.specifier.contains(version, prereleases=True):
+                problems.append('%s %s is installed, but %s requires %s' % (
+                    req.name, version, parent or 'requirements.txt', req))
+            new_extras = set(req.extras) - extras.get(key, set())
+            widened = add_marker(key, marker)
+            if key in versions and not new_extras and not widened:
+                continue
+            versions[key] = version
+            extras[key] = extras.get(key, set()) | new_extras
+            for dep in self.requires(key):
+                if dep.marker is not None and not any(
+                        dep.marker.evaluate({'extra': extra})
+                        for extra in sorted(extras[key]) or ['']):
+                    continue
+                # dependencies apply wherever the distribution does
+                for marker in [None] if markers[key] is None \
+                        else sorted(markers[key]):
+                    queue.append((dep, self.name(key), marker))
+        if problems:
+            raise RuntimeError('cannot pin requirements from the environment: '
+                               '%s' % '; '.join(sorted(set(problems))))
+        return ['%s==%s%s' % (key, versions[key], _format_markers(markers[key]))
+                for key in sorted(versions)]
+
+
+def _format_markers(markers):
+    """
+    Formats the markers of a pinned distribution as a requirement suffix.
+    """
+    if not markers:
+        return ''
+    if len(markers) == 1:
+        return '; %s' % list(markers)[0]
+    return '; %s' % ' or '.join('(%s)' % m for m in sorted(markers))
+
+
+def environment_index(cache=None, refresh=False):
+    """
+    Returns the ``DistributionIndex`` of the running interpreter's
+    environment, shared between targets and built the first time it is
+    needed.
+
+    Parameters
+    ----------
+    cache : FileCache, optional
+        Passed to the ``DistributionIndex`` if it is (re)built.
+    refresh : bool
+        Pass True to rebuild the index if ``environment_fingerprint()``
+        changed since it was built. Fingerprinting lists every ``sys.path``
+        entry, so treeshaker does this once per run rather than per target.
+    """
+    global _environment
+    with _environment_lock:
+        if _environment is None or refresh:
+            fingerprint = environment_fingerprint()
+            if _environment is None or _environment[0] != fingerprint:
+                _environment = (fingerprint, DistributionIndex(
+                    cache=cache, fingerprint=fingerprint))
+                # import the requirement parser up front as well, so that
+                # worker processes forked afterwards inherit it
+                _packaging()
+        return _environment[1]
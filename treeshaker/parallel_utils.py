@@ -0,0 +1,175 @@
+from __future__ import absolute_import
+
+import contextlib
+import os
+import sys
+import threading
+
+import six
+
+
+@contextlib.contextmanager
+def capture_output():
+    """
+    Redirects ``sys.stdout`` and ``sys.stderr`` into a buffer.
+
+    Output from subprocesses started through
+    ``treeshaker.subprocess_utils.run_command()`` is forwarded through
+    ``sys.stdout`` and is therefore captured as well.
+
+    Yields
+    ------
+    six.StringIO
+        The buffer. Read it with ``getvalue()`` after the block exits.
+    """
+    buf = six.StringIO()
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = buf
+    try:
+        yield buf
+    finally:
+        sys.stdout, sys.stderr = old_stdout, old_stderr
+
+
+class ThreadOutput(object):
+    """
+    A replacement for ``sys.stdout`` and ``sys.stderr`` that sends what a
+    thread prints to the stream set in ``local.stream`` by that thread, and
+    everything else to the original stream.
+    """
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _stream(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, data):
+        return self._stream().write(data)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+
+@contextlib.contextmanager
+def thread_output():
+    """
+    Replaces ``sys.stdout`` and ``sys.stderr`` with ``ThreadOutput`` objects,
+    unless they already are, and restores them afterwards.
+
+    Yields
+    ------
+    stdout, stderr : ThreadOutput
+        The replacements.
+    """
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    if not isinstance(sys.stdout, ThreadOutput):
+        sys.stdout = ThreadOutput(old_stdout)
+    if not isinstance(sys.stderr, ThreadOutput):
+        sys.stderr = ThreadOutput(old_stderr)
+    try:
+        yield sys.stdout, sys.stderr
+    finally:
+        sys.stdout, sys.stderr = old_stdout, old_stderr
+
+
+def group_conflicting(items, keys):
+    """
+    Groups items that share any key, so that they can be run serially while
+    unrelated groups run in parallel.
+
+    Parameters
+    ----------
+    items : list
+        The items to group.
+    keys : dict
+        Map from each item to an iterable of hashable keys. Two items conflict
+        if they have any key in common. Conflicts are transitive.
+
+    Returns
+    -------
+    list of list
+        The groups. Items keep their original relative order within each group
+        and groups are ordered by their first item.
+
+    Examples
+    --------
+    >>> from treeshaker.parallel_utils import group_conflicting
+    >>> group_conflicting(['a', 'b', 'c', 'd'],
+    ...                   {'a': ['x'], 'b': ['y'], 'c': ['z', 'x'], 'd': []})
+    [['a', 'c'], ['b'], ['d']]
+    >>> group_conflicting(['a', 'b', 'c'],
+    ...                   {'a': ['x'], 'b': ['x', 'y'], 'c': ['y']})
+    [['a', 'b', 'c']]
+    """
+    parent = {item: item for item in items}
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    owner = {}
+    for item in items:
+        for key in keys[item]:
+            if key in owner:
+                parent[find(item)] = find(owner[key])
+            else:
+                owner[key] = item
+
+    groups = {}
+    order = []
+    for item in items:
+        root = find(item)
+        if root not in groups:
+            groups[root] = []
+            order.append(root)
+        groups[root].append(item)
+    return [groups[root] for root in order]
+
+
+def normalize_path(path):
+    """
+    Normalizes a path so that it can be used to detect two targets writing to
+    the same location.
+    """
+    return os.path.normcase(os.path.abspath(path))
+
+
+def pool_jobs(jobs=None):
+    """
+    Returns the number of worker processes to start a process pool with:
+    ``jobs``, defaulting to the number of CPUs, or 1 where a pool must not be
+    started. Pools are not nested inside the workers of ``--jobs``, and
+    processes are not forked from threads other than the main thread (such as
+    the request handlers of the daemon), as that is unsafe.
+    """
+    import multiprocessing
+    import threading
+    if multiprocessing.current_process().name != 'MainProcess':
+        return 1
+    if threading.current_thread().name != 'MainThread':
+        return 1
+    return jobs or multiprocessing.cpu_count()
+
+
+def get_process_pool(jobs):
+    """
+    Creates a process pool with ``jobs`` workers.
+
+    Where possible the workers are forked, so that module-level state prepared
+    in the parent process (such as shared module graphs) is inherited instead
+    of being recomputed in each worker.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        import multiprocessing
+        context = multiprocessing.get_context('fork')
+    except (AttributeError, ValueError):
+        return ProcessPoolExecutor(max_workers=jobs)
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=context)
@@ -1,8 +1,72 @@
+"""
+Maps PyPI distribution names to the names of the modules they provide, for
+requirements whose installed metadata does not say (see
+``treeshaker.requirements_utils.build_requirement_index()``).
+
+The mapping is maintained in ``pypi_names.txt`` (one ``module:pypi-name`` pair
+per line) and compiled into the generated module ``treeshaker._pypi_names``,
+which is imported the first time a name is converted. Importing the generated
+module only unmarshals its cached bytecode, which is much faster than parsing
+the text file on every startup. After editing ``pypi_names.txt``, regenerate it
+by running
+
+    $ python -m treeshaker.pypi_names
+
+Pass ``--check`` to only test whether the generated module is up to date.
+"""
 from __future__ import absolute_import
 
+import os
+import sys
+
+
+TXT_FNAME = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'pypi_names.txt')
+PY_FNAME = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '_pypi_names.py')
+
+_data = None
+
+
+def load_mapping_txt(fname=TXT_FNAME):
+    """
+    Parses ``pypi_names.txt`` into a dict mapping PyPI names to module names,
+    with dashes converted to underscores.
+    """
+    with open(fname, 'r') as f:
+        return dict(x.strip().replace('-', '_').split(':')[::-1] for x in f
+                    if x.strip())
+
+
+def format_mapping_module(data):
+    """
+    Formats the source code of the generated ``treeshaker._pypi_names``
+    module.
+
+    Examples
+    --------
+    >>> from treeshaker.pypi_names import format_mapping_module
+    >>> print(format_mapping_module({'scikit_learn': 'sklearn'}))
+    # generated by `python -m treeshaker.pypi_names`, do not edit
+    PYPI_NAMES = {
+        'scikit_learn': 'sklearn',
+    }
+    <BLANKLINE>
+    """
+    lines = ['# generated by `python -m treeshaker.pypi_names`, do not edit',
+             'PYPI_NAMES = {']
+    lines.extend('    %r: %r,' % (str(k), str(v))
+                 for k, v in sorted(data.items()))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
 
-with open(__file__.replace('.pyc', '.txt').replace('.py', '.txt'), 'r') as f:
-    data = dict(x.strip().replace('-', '_').split(':')[::-1] for x in f)
+
+def _get_mapping():
+    global _data
+    if _data is None:
+        from treeshaker._pypi_names import PYPI_NAMES
+        _data = PYPI_NAMES
+    return _data
 
 
 def convert_from_pypi(pypi_name):
@@ -12,7 +76,8 @@ def convert_from_pypi(pypi_name):
 
     This function uses the mapping from
     https://github.com/bndr/pipreqs/blob/master/pipreqs/mapping, which should
-    exist as ``pypi_names.txt`` next to this file.
+    exist as ``pypi_names.txt`` next to this file and is compiled into
+    ``treeshaker/_pypi_names.py``.
 
     To maximize consistency, we convert all dashes to underscores, both when
     loading the mapping and also when resolving the name. The returned name
@@ -35,4 +100,23 @@ def convert_from_pypi(pypi_name):
     'numpy'
     """
     pypi_name = pypi_name.replace('-', '_')
-    return data.get(pypi_name, pypi_name)
+    return _get_mapping().get(pypi_name, pypi_name)
+
+
+def main():
+    content = format_mapping_module(load_mapping_txt())
+    if '--check' in sys.argv[1:]:
+        with open(PY_FNAME, 'r') as handle:
+            if handle.read() != content:
+                print('%s is out of date, run python -m treeshaker.pypi_names'
+                      % PY_FNAME)
+                sys.exit(1)
+        print('%s is up to date' % PY_FNAME)
+        return
+    with open(PY_FNAME, 'w') as handle:
+        handle.write(content)
+    print('wrote %s' % PY_FNAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+from treeshaker.pypi_names import convert_from_pypi
+
+
+class PrefixIndex(object):
+    """
+    Maps dotted module names to values, matching on dotted-prefix boundaries.
+
+    Looking up ``'a.b.c'`` returns the value stored under ``'a.b.c'``,
+    ``'a.b'`` or ``'a'`` (the longest match wins), so each lookup costs one
+    dict access per component of the name instead of a scan over every key.
+
+    Parameters
+    ----------
+    items : iterable of (str, object) pairs
+        The dotted names and their values. If a name appears more than once,
+        the first value is kept.
+
+    Examples
+    --------
+    >>> from treeshaker.requirements_utils import PrefixIndex
+    >>> index = PrefixIndex([('six', 1), ('google.protobuf', 2)])
+    >>> index.get('six.moves')
+    1
+    >>> index.get('sixel') is None
+    True
+    >>> index.get('google.protobuf.message')
+    2
+    >>> 'google.cloud' in index
+    False
+    """
+    def __init__(self, items):
+        self._items = {}
+        for name, value in items:
+            self._items.setdefault(name, value)
+
+    def get(self, identifier, default=None):
+        if identifier in self._items:
+            return self._items[identifier]
+        parts = identifier.split('.')
+        for i in range(len(parts) - 1, 0, -1):
+            prefix = '.'.join(parts[:i])
+            if prefix in self._items:
+                return self._items[prefix]
+        return default
+
+    def __contains__(self, identifier):
+        return self.get(identifier, self) is not self
+
+    def __len__(self):
+        return len(self._items)
+
+
+def build_requirement_index(all_reqs, index=None):
+    """
+    Builds an index from module names to the requirements that provide them.
+
+    The modules of each requirement are read from the metadata of the
+    installed distribution (see ``DistributionIndex.modules()``), which also
+    covers distributions that provide several top-level modules or modules
+    inside namespace packages. Requirements that are not installed are
+    matched through the vendored mapping of ``convert_from_pypi()``.
+
+    Parameters
+    ----------
+    all_reqs : list of requirements.requirement.Requirement
+        The parsed requirements. When two requirements provide the same module,
+        the one listed first wins.
+    index : DistributionIndex, optional
+        The installed distributions. Defaults to
+        ``treeshaker.metadata_utils.environment_index()``.
+
+    Returns
+    -------
+    PrefixIndex
+        Look up a module identifier to get the requirement that provides it,
+        or None if no requirement does.
+    """
+    from treeshaker.metadata_utils import environment_index
+
+    if index is None:
+        index = environment_index()
+    return PrefixIndex((module, req) for req in all_reqs
+                       for module in index.modules(req.name) or
+                       [convert_from_pypi(req.name)])
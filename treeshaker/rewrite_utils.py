@@ -0,0 +1,402 @@
+from __future__ import absolute_import
+
+import codecs
+import io
+import re
+import tokenize
+
+import six
+
+
+# bump this when the output of the rewriter changes, so that outputs written
+# by an older version are not considered up to date
+REWRITE_VERSION = 2
+
+# a PEP 263 encoding declaration
+_CODING_COOKIE = re.compile(br'^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)')
+
+# tokens that do not change whether the next token starts a statement
+_TRANSPARENT_TOKENS = {tokenize.NL, tokenize.COMMENT}
+
+
+def source_encoding(data):
+    """
+    Returns the encoding of Python source code given as bytes, as declared
+    by a byte order mark or PEP 263 encoding declaration, defaulting to
+    UTF-8.
+
+    Examples
+    --------
+    >>> from treeshaker.rewrite_utils import source_encoding
+    >>> print(source_encoding(b'# -*- coding: cp1252 -*-\\nx = 1\\n'))
+    cp1252
+    >>> print(source_encoding(b'x = 1\\n'))
+    utf-8
+    """
+    if six.PY3:
+        return tokenize.detect_encoding(io.BytesIO(data).readline)[0]
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for line in data.splitlines()[:2]:
+        match = _CODING_COOKIE.match(line)
+        if match:
+            return match.group(1).decode('ascii')
+        if line.strip() and not line.lstrip().startswith(b'#'):
+            break
+    return 'utf-8'
+
+
+def _statement_spans(tokens):
+    """
+    Yields ``(start, end)`` index ranges into ``tokens`` for every import
+    statement, where ``start`` is the index of the ``import`` or ``from``
+    keyword and ``end`` is the index one past its last token.
+    """
+    at_start = True
+    depth = 0
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        if tok[0] in _TRANSPARENT_TOKENS:
+            i += 1
+            continue
+        if at_start and tok[0] == tokenize.NAME and \
+                tok[1] in ('import', 'from'):
+            j = i + 1
+            inner = 0
+            while j < n:
+                t = tokens[j]
+                if t[0] in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                    break
+                if t[0] == tokenize.OP:
+                    if t[1] == '(':
+                        inner += 1
+                    elif t[1] == ')':
+                        inner -= 1
+                    elif t[1] == ';' and inner == 0:
+                        break
+                j += 1
+            stop = j
+            while tokens[stop - 1][0] in _TRANSPARENT_TOKENS:
+                stop -= 1
+            yield i, stop
+            i = j
+            at_start = False
+            continue
+        if tok[0] == tokenize.OP:
+            if tok[1] in '([{':
+                depth += 1
+            elif tok[1] in ')]}':
+                depth -= 1
+        at_start = tok[0] in (tokenize.NEWLINE, tokenize.INDENT,
+                              tokenize.DEDENT) or \
+            (tok[0] == tokenize.OP and tok[1] in (';', ':') and depth == 0)
+        i += 1
+
+
+def _parse_dotted(tokens, i, end):
+    """
+    Reads a dotted name starting at ``tokens[i]``. Returns the name and the
+    index of the first token after it.
+    """
+    parts = []
+    while i < end and tokens[i][0] == tokenize.NAME and \
+            tokens[i][1] != 'import':
+        parts.append(tokens[i][1])
+        if i + 1 < end and tokens[i + 1][:2] == (tokenize.OP, '.'):
+            i += 2
+        else:
+            i += 1
+            break
+    return '.'.join(parts), i
+
+
+def _parse_alias(tokens, i, end):
+    """
+    Reads an optional ``as <name>`` clause. Returns the alias (or None) and the
+    index of the first token after it.
+    """
+    if i < end and tokens[i][:2] == (tokenize.NAME, 'as'):
+        return tokens[i + 1][1], i + 2
+    return None, i
+
+
+def _format_alias(name, alias):
+    return '%s as %s' % (name, alias) if alias and alias != name else name
+
+
+def _join_statements(statements, n_lines=0):
+    """
+    Joins generated ``(head, names)`` import statements with ``; ``. If
+    ``n_lines`` is nonzero, the names of the last statement are wrapped in
+    parentheses and padded with newlines, so that the line count of the
+    rewritten source matches the original.
+
+    Examples
+    --------
+    >>> from treeshaker.rewrite_utils import _join_statements
+    >>> _join_statements([('from . import ', 'a'), ('import ', 'os')])
+    'from . import a; import os'
+    >>> _join_statements([('from . import ', 'a')], n_lines=1)
+    'from . import (a\\n)'
+    """
+    texts = ['%s%s' % s for s in statements]
+    if n_lines:
+        head, names = statements[-1]
+        texts[-1] = '%s(%s%s)' % (head, names, '\n' * n_lines)
+    return '; '.join(texts)
+
+
+class ImportRewriter(object):
+    """
+    Rewrites the imports of copied modules to point at their renamed copies.
+
+    The rewriter tokenizes each module once, locates its import statements and
+    rewrites only those statements (plus dotted references such as
+    ``mypkg.mymod.func`` to modules bound by ``import mypkg.mymod``). Strings,
+    comments and unrelated identifiers are never modified, and the formatting
+    of untouched code is preserved exactly. The cost of rewriting a module is
+    linear in its length and independent of the number of copied modules.
+
+    Parameters
+    ----------
+    name_map : dict
+        Map from the original name of each copied module to its new name. The
+        copies are assumed to live in the same package, so they import each
+        other with relative imports.
+
+    Examples
+    --------
+    >>> from treeshaker.rewrite_utils import ImportRewriter
+    >>> rewriter = ImportRewriter({'mypkg.target': 'target',
+    ...                            'mypkg.dep': 'dep_mypkg',
+    ...                            'otherpkg.dep': 'dep_otherpkg'})
+    >>> print(rewriter.rewrite(
+    ...     'from mypkg.dep import f  # mypkg.dep\\n'
+    ...     'from otherpkg import dep\\n'
+    ...     'import mypkg.dep\\n'
+    ...     'x = mypkg.dep.g("mypkg.dep")\\n', 'mypkg.target'))
+    from .dep_mypkg import f  # mypkg.dep
+    from . import dep_otherpkg as dep
+    from . import dep_mypkg
+    x = dep_mypkg.g("mypkg.dep")
+    <BLANKLINE>
+    >>> print(rewriter.rewrite('from .dep import f, g\\n', 'mypkg.target'))
+    from .dep_mypkg import f, g
+    <BLANKLINE>
+    >>> print(rewriter.rewrite('from . import dep, other\\n', 'mypkg.target'))
+    from . import dep_mypkg as dep; from . import other
+    <BLANKLINE>
+    """
+    def __init__(self, name_map):
+        self.name_map = name_map
+
+    def _resolve(self, level, name, module_name, is_package):
+        if not level:
+            return name
+        parts = module_name.split('.')
+        if not is_package:
+            parts = parts[:-1]
+        if level > 1:
+            parts = parts[:-(level - 1)]
+        if name:
+            parts.append(name)
+        return '.'.join(parts)
+
+    def _rewrite_from(self, tokens, start, end, module_name, is_package,
+                      edits):
+        # parse "from <dots><dotted> import <names>"
+        i = start + 1
+        level = 0
+        while tokens[i][0] == tokenize.OP and tokens[i][1] in ('.', '...'):
+            level += len(tokens[i][1])
+            i += 1
+        name, i = _parse_dotted(tokens, i, end)
+        mod_end = i - 1
+        absolute = self._resolve(level, name, module_name, is_package)
+        i += 1  # skip "import"
+        names = []
+        while i < end:
+            tok = tokens[i]
+            if tok[0] == tokenize.NAME or tok[1] == '*':
+                alias, j = _parse_alias(tokens, i + 1, end)
+                names.append((tok[1], alias))
+                i = j
+            else:
+                i += 1
+
+        # split names into copied submodules and everything else
+        submodules = [(n, a) for n, a in names
+                      if '%s.%s' % (absolute, n) in self.name_map]
+        others = [(n, a) for n, a in names
+                  if '%s.%s' % (absolute, n) not in self.name_map]
+        if absolute in self.name_map:
+            module_text = '.' + self.name_map[absolute]
+        else:
+            module_text = None
+
+        # common case: only the module name changes
+        if not submodules:
+            if module_text is not None:
+                edits.append((tokens[start + 1][2], tokens[mod_end][3],
+                              module_text))
+            return
+
+        # rewrite the whole statement
+        statements = []
+        imported = ', '.join(
+            _format_alias(self.name_map['%s.%s' % (absolute, n)], a or n)
+            for n, a in submodules)
+        statements.append(('from . import ', imported))
+        if others:
+            if module_text is None:
+                module_text = '.' * level + name
+            statements.append((
+                'from %s import ' % module_text,
+                ', '.join(_format_alias(n, a) for n, a in others)))
+        n_lines = tokens[end - 1][3][0] - tokens[start][2][0]
+        edits.append((tokens[start][2], tokens[end - 1][3],
+                      _join_statements(statements, n_lines)))
+
+    def _rewrite_import(self, tokens, start, end, bindings, edits):
+        # parse "import <dotted> [as <name>], ..."
+        i = start + 1
+        items = []
+        while i < end:
+            name, i = _parse_dotted(tokens, i, end)
+            alias, i = _parse_alias(tokens, i, end)
+            items.append((name, alias))
+            i += 1  # skip ","
+        if not any(name in self.name_map for name, _ in items):
+            return
+
+        statements = []
+        plain = []
+        for name, alias in items:
+            if name not in self.name_map:
+                plain.append(_format_alias(name, alias))
+                continue
+            if plain:
+                statements.append(('import ', ', '.join(plain)))
+                plain = []
+            new_name = self.name_map[name]
+            if alias:
+                statements.append(('from . import ',
+                                   _format_alias(new_name, alias)))
+            elif '.' in name:
+                # "import a.b" binds "a"; references to "a.b" are rewritten
+                statements.append(('from . import ', new_name))
+                bindings[name] = new_name
+            else:
+                statements.append(('from . import ',
+                                   _format_alias(new_name, name)))
+        if plain:
+            statements.append(('import ', ', '.join(plain)))
+        edits.append((tokens[start][2], tokens[end - 1][3],
+                      _join_statements(statements)))
+
+    def _rewrite_references(self, tokens, skip, bindings, edits):
+        # rewrite "a.b.attr" to "new.attr" for modules bound as "import a.b"
+        heads = {}
+        for name in bindings:
+            heads.setdefault(name.split('.', 1)[0], []).append(name)
+        for chains in heads.values():
+            chains.sort(key=len, reverse=True)
+        n = len(tokens)
+        for i, tok in enumerate(tokens):
+            if tok[0] != tokenize.NAME or tok[1] not in heads or i in skip:
+                continue
+            if i > 0 and tokens[i - 1][:2] == (tokenize.OP, '.'):
+                continue
+            for chain in heads[tok[1]]:
+                parts = chain.split('.')
+                j = i
+                for k, part in enumerate(parts):
+                    if k and not (j < n and
+                                  tokens[j][:2] == (tokenize.OP, '.')):
+                        break
+                    if k:
+                        j += 1
+                    if not (j < n and tokens[j][:2] == (tokenize.NAME, part)):
+                        break
+                    j += 1
+                else:
+                    edits.append((tok[2], tokens[j - 1][3], bindings[chain]))
+                    break
+
+    def rewrite(self, source, module_name, is_package=False):
+        """
+        Rewrites the imports in the source code of one module.
+
+        Parameters
+        ----------
+        source : str
+            The source code of the module.
+        module_name : str
+            The original name of the module, used to resolve relative imports.
+        is_package : bool
+            Pass True if the module is a package ``__init__``.
+
+        Returns
+        -------
+        str
+            The rewritten source code.
+        """
+        lines = io.StringIO(six.text_type(source)).readlines()
+        tokens = list(tokenize.generate_tokens(iter(lines).__next__
+                                               if six.PY3 else
+                                               iter(lines).next))
+
+        edits = []
+        bindings = {}
+        skip = set()
+        for start, end in _statement_spans(tokens):
+            skip.update(range(start, end))
+            if tokens[start][1] == 'from':
+                self._rewrite_from(tokens, start, end, module_name,
+                                   is_package, edits)
+            else:
+                self._rewrite_import(tokens, start, end, bindings, edits)
+        if bindings:
+            self._rewrite_references(tokens, skip, bindings, edits)
+        if not edits:
+            return source
+
+        # apply the edits, which do not overlap, in a single pass
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+        pieces = []
+        last = 0
+        for (srow, scol), (erow, ecol), text in sorted(edits):
+            start = offsets[srow - 1] + scol
+            pieces.append(source[last:start])
+            pieces.append(text)
+            last = offsets[erow - 1] + ecol
+        pieces.append(source[last:])
+        return ''.join(pieces)
+
+    def rewrite_bytes(self, data, module_name, is_package=False):
+        """
+        Like ``rewrite()``, but takes and returns the source code as bytes,
+        in the encoding declared by the module (see ``source_encoding()``).
+
+        Examples
+        --------
+        >>> from treeshaker.rewrite_utils import ImportRewriter
+        >>> rewriter = ImportRewriter({'mypkg.target': 'target',
+        ...                            'mypkg.dep': 'dep_mypkg'})
+        >>> source = u'# caf\\xe9\\nimport mypkg.dep\\ns = "\\xe9t\\xe9"\\n'
+        >>> rewriter.rewrite_bytes(source.encode('utf-8'), 'mypkg.target') \\
+        ...     == source.replace(u'import mypkg.dep',
+        ...                       u'from . import dep_mypkg').encode('utf-8')
+        True
+        >>> latin = b'# coding: latin-1\\n# \\xe9\\nfrom mypkg.dep import f\\n'
+        >>> rewriter.rewrite_bytes(latin, 'mypkg.target').endswith(
+        ...     b'# \\xe9\\nfrom .dep_mypkg import f\\n')
+        True
+        """
+        encoding = source_encoding(data)
+        return self.rewrite(data.decode(encoding), module_name,
+                            is_package=is_package).encode(encoding)
@@ -0,0 +1,321 @@
+from __future__ import absolute_import
+
+import os
+import pickle
+import sys
+import time
+
+from treeshaker.cache_utils import FileCache, file_lock, hash_file, hash_key
+
+
+CACHE_VERSION = 1
+
+# maximum number of module records kept per environment
+DEFAULT_MAX_ENTRIES = 100000
+
+# node kinds that are not backed by a file and never go stale
+STATIC_KINDS = {'BuiltinModule', 'ExcludedModule', 'NamespacePackage'}
+
+
+class CachedNode(object):
+    """
+    A lightweight stand-in for a modulegraph node, reconstructed from the scan
+    cache.
+
+    It exposes the attributes of modulegraph nodes that treeshaker uses
+    (``identifier``, ``filename``, ``packagepath``, ``globalnames``), so code
+    that consumes the graph does not need to know where it came from.
+    """
+    def __init__(self, identifier, kind, filename=None, packagepath=None,
+                 globalnames=(), starimports=(), missing=False):
+        self.identifier = identifier
+        self.kind = kind
+        self.filename = filename
+        self.packagepath = packagepath
+        self.globalnames = set(globalnames)
+        self.starimports = set(starimports)
+        self.missing = missing
+
+    def __eq__(self, other):
+        return self.identifier == getattr(other, 'identifier', None)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self.identifier < other.identifier
+
+    def __hash__(self):
+        return hash(self.identifier)
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.kind, self.identifier, self.filename)
+
+
+class CachedModuleGraph(object):
+    """
+    A module import graph reconstructed from scan cache records.
+
+    Implements the subset of the ``modulegraph.modulegraph.ModuleGraph`` API
+    used by ``process_module()``: ``findNode()``, ``getReferences()`` and
+    ``flatten()``.
+    """
+    def __init__(self, records):
+        self._nodes = {}
+        self._refs = {}
+        for identifier, record in records.items():
+            self._nodes[identifier] = CachedNode(
+                identifier, record['kind'], filename=record['filename'],
+                packagepath=record['packagepath'],
+                globalnames=record['globalnames'],
+                starimports=record['starimports'],
+                missing=record['missing'])
+            self._refs[identifier] = [r for r in record['refs']
+                                      if r in records]
+
+    def findNode(self, name):
+        return self._nodes.get(getattr(name, 'identifier', name))
+
+    def getReferences(self, fromnode):
+        identifier = getattr(fromnode, 'identifier', fromnode)
+        for ref in self._refs.get(identifier, ()):
+            yield self._nodes[ref]
+
+    def flatten(self):
+        return iter(self._nodes.values())
+
+
+def is_missing_module(node):
+    """
+    Returns True if ``node`` represents a module that could not be found, for
+    both modulegraph nodes and ``CachedNode`` instances.
+    """
+    if isinstance(node, CachedNode):
+        return node.missing
+    from modulegraph.modulegraph import MissingModule
+    return isinstance(node, MissingModule)
+
+
+def _node_record(mg, node):
+    from modulegraph.modulegraph import MissingModule
+
+    filename = node.filename if isinstance(node.filename, str) else None
+    record = {
+        'kind': type(node).__name__,
+        'filename': filename,
+        'packagepath': list(node.packagepath)
+        if node.packagepath is not None else None,
+        'globalnames': set(node.globalnames),
+        'starimports': set(node.starimports),
+        'missing': isinstance(node, MissingModule),
+        'refs': [r.identifier for r in mg.getReferences(node)],
+        'stat': None,
+        'sha': None,
+    }
+    if filename and os.path.isfile(filename):
+        st = os.stat(filename)
+        record['stat'] = (st.st_mtime, st.st_size)
+        record['sha'] = hash_file(filename)
+    return record
+
+
+class ScanCache(object):
+    """
+    Persistent cache of per-module import scan results.
+
+    For every module that modulegraph scans we store its kind, file location,
+    ``globalnames`` and the identifiers of the modules it references, keyed by
+    module identifier and validated against the file's mtime, size and content
+    hash. On the next run the module graph is reconstructed from the cached
+    records and only the modules whose files changed (or that were never seen
+    before) are scanned again.
+
+    Records are stored in one file per environment (interpreter, ``sys.path``
+    and excludes), inside a size-bounded ``FileCache``. Targets and worker
+    processes sharing the cache merge the records they scanned or used into
+    the file under a lock, so that none of them drops the others' records.
+
+    Parameters
+    ----------
+    directory : str
+        The cache directory.
+    max_entries : int
+        The maximum number of module records kept per environment. The least
+        recently used records are dropped first.
+    """
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES):
+        self.files = FileCache(os.path.join(directory, 'scan'))
+        self.lock_file = os.path.join(directory, 'scan.lock')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, excludes):
+        return hash_key(CACHE_VERSION, sys.version, sys.executable, sys.path,
+                        sorted(excludes))
+
+    def load(self, excludes):
+        data = self.files.get(self._key(excludes))
+        if data is None:
+            return {}
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return {}
+
+    def save(self, excludes, updates):
+        """
+        Merges the records in ``updates`` into the stored records, replacing
+        the stored records of the same modules.
+        """
+        with file_lock(self.lock_file):
+            records = self.load(excludes)
+            records.update(updates)
+            if len(records) > self.max_entries:
+                keep = sorted(records,
+                              key=lambda i: records[i].get('used', 0),
+                              reverse=True)[:self.max_entries]
+                records = {i: records[i] for i in keep}
+            self.files.put(self._key(excludes), pickle.dumps(records, 2))
+
+    def is_valid(self, identifier, record, target_packages):
+        """
+        Checks whether a cached record still describes the module on disk,
+        refreshing its stored mtime and size if only those changed.
+        """
+        if record['missing']:
+            # a missing module inside the target packages may have been added
+            return identifier.split('.')[0] not in target_packages
+        if record['kind'] in STATIC_KINDS or record['stat'] is None:
+            return record['filename'] is None or \
+                record['kind'] in STATIC_KINDS
+        try:
+            st = os.stat(record['filename'])
+        except OSError:
+            return False
+        if (st.st_mtime, st.st_size) == record['stat']:
+            return True
+        if st.st_size != record['stat'][1] or \
+                hash_file(record['filename']) != record['sha']:
+            return False
+        record['stat'] = (st.st_mtime, st.st_size)
+        return True
+
+    def build_graph(self, target_module_names, target_packages, excludes):
+        """
+        Constructs a module import graph, reusing cached scan results for all
+        modules whose files did not change.
+
+        Parameters
+        ----------
+        target_module_names : list of str
+            The names of the target modules to include in the graph.
+        target_packages : list of str
+            The packages whose modules may be copied to the output directory.
+        excludes : set of str
+            Module names to exclude from the graph, as passed to
+            ``modulegraph.find_modules.find_modules()``.
+
+        Returns
+        -------
+        CachedModuleGraph
+            The graph, containing every node reachable from the targets.
+        """
+        from modulegraph.find_modules import find_modules
+        from modulegraph.modulegraph import ExcludedModule
+
+        records = self.load(excludes)
+        now = time.time()
+
+        # walk the cached records, collecting modules that must be rescanned
+        valid = {}
+        to_scan = set()
+        stack = list(target_module_names)
+        seen = set(stack)
+        while stack:
+            identifier = stack.pop()
+            record = records.get(identifier)
+            if record is None:
+                to_scan.add(identifier)
+                continue
+            if self.is_valid(identifier, record, target_packages):
+                valid[identifier] = record
+            else:
+                # keep walking the stale references, since the changed module
+                # most likely still imports most of them
+                to_scan.add(identifier)
+            for ref in record['refs']:
+                if ref not in seen:
+                    seen.add(ref)
+                    stack.append(ref)
+
+        # rescan changed and unknown modules, excluding every module we already
+        # have a valid record for so that modulegraph stops at its boundary
+        # packages are never excluded, since their submodules could not be
+        # imported through an excluded package
+        scanned = set()
+        if to_scan:
+            cached_excludes = set(i for i, r in valid.items()
+                                  if r['kind'] not in ('Package',
+                                                       'NamespacePackage'))
+            mg = find_modules(includes=tuple(to_scan),
+                              excludes=set(excludes) | cached_excludes)
+            for node in mg.flatten():
+                if node.identifier in cached_excludes and \
+                        isinstance(node, ExcludedModule):
+                    continue
+                record = _node_record(mg, node)
+                valid[node.identifier] = records[node.identifier] = record
+                scanned.add(node.identifier)
+
+            # includes that modulegraph could not import at all
+            for identifier in to_scan - scanned:
+                valid[identifier] = records[identifier] = {
+                    'kind': 'MissingModule', 'filename': None,
+                    'packagepath': None, 'globalnames': set(),
+                    'starimports': set(), 'missing': True, 'refs': [],
+                    'stat': None, 'sha': None}
+
+            # merge globalnames of star imports resolved through the cache
+            for identifier in scanned:
+                record = valid[identifier]
+                for name in list(record['starimports']):
+                    if name in cached_excludes:
+                        other = valid[name]
+                        record['globalnames'].update(other['globalnames'])
+                        record['starimports'].update(other['starimports'])
+                        record['starimports'].discard(name)
+
+        # keep only the nodes reachable from the targets
+        reachable = {}
+        stack = [i for i in target_module_names if i in valid]
+        while stack:
+            identifier = stack.pop()
+            if identifier in reachable:
+                continue
+            record = valid[identifier]
+            record['used'] = now
+            reachable[identifier] = record
+            stack.extend(r for r in record['refs']
+                         if r in valid and r not in reachable)
+
+        # count file-backed modules that were reused or scanned
+        hits = misses = 0
+        for identifier, record in reachable.items():
+            if record['filename'] is None:
+                continue
+            if identifier in scanned:
+                misses += 1
+            else:
+                hits += 1
+        self.hits += hits
+        self.misses += misses
+        print('module scan cache: %i hits, %i misses' % (hits, misses))
+
+        # write back only what this build scanned or used, as other builds
+        # may have updated the records of other modules meanwhile
+        updates = dict(reachable)
+        updates.update((i, records[i]) for i in scanned | to_scan
+                       if i in records)
+        self.save(excludes, updates)
+        return CachedModuleGraph(reachable)
@@ -0,0 +1,194 @@
+from __future__ import absolute_import
+
+import json
+import os
+import shlex
+
+import six
+
+from treeshaker.cache_utils import atomic_write, hash_file, hash_key
+from treeshaker.parallel_utils import normalize_path
+from treeshaker.subprocess_utils import run_command
+
+
+FINGERPRINT_NAME = '.treeshaker-fingerprint'
+SDIST_COMMAND = 'python setup.py --quiet sdist'
+
+# directories that building an sdist writes to, or that never end up in one
+_IGNORED_DIRS = {'dist', 'build', '__pycache__'}
+
+
+def _is_ignored_dir(dirname):
+    return dirname in _IGNORED_DIRS or dirname.startswith('.') or \
+        dirname.endswith('.egg-info')
+
+
+def source_fingerprint(source_path):
+    """
+    Computes a fingerprint of the source tree of a local package from the
+    relative paths and contents of its files. Build outputs (``dist/``,
+    ``build/``, ``*.egg-info``), bytecode and hidden files are ignored, so
+    building an sdist does not change the fingerprint.
+    """
+    files = []
+    for dirpath, dirnames, fnames in os.walk(source_path):
+        dirnames[:] = sorted(d for d in dirnames if not _is_ignored_dir(d))
+        for fname in sorted(fnames):
+            if fname.startswith('.') or fname.endswith(('.pyc', '.pyo')):
+                continue
+            path = os.path.join(dirpath, fname)
+            relpath = os.path.relpath(path, source_path).replace('\\', '/')
+            files.append((relpath, hash_file(path)))
+    return hash_key(files)
+
+
+def dist_dir(source_path):
+    """
+    Returns the ``dist/`` directory of a source path, suitable for passing to
+    pip-compile as ``--find-links``.
+    """
+    # backslash pathsep breaks pip_compile() in py2
+    return os.path.join(source_path, 'dist').replace('\\', '/')
+
+
+def _artifacts(dist):
+    return sorted(f for f in os.listdir(dist) if not f.startswith('.'))
+
+
+def sdist_is_fresh(source_path, fingerprint):
+    """
+    Returns True if ``dist/`` contains the artifacts of a previous build of
+    exactly this source tree.
+    """
+    dist = dist_dir(source_path)
+    try:
+        with open(os.path.join(dist, FINGERPRINT_NAME), 'r') as handle:
+            data = json.load(handle)
+    except (IOError, OSError, ValueError):
+        return False
+    return data.get('fingerprint') == fingerprint and \
+        data.get('artifacts') == _artifacts(dist) and bool(data['artifacts'])
+
+
+def build_sdist(source_path, output=None):
+    """
+    Builds an sdist for a local package, unless ``dist/`` already holds one
+    built from an identical source tree.
+
+    Parameters
+    ----------
+    source_path : str
+        The directory containing the package's ``setup.py``.
+    output : file-like, optional
+        Where to write progress and the output of the build. Defaults to
+        ``sys.stdout``.
+
+    Returns
+    -------
+    bool
+        True if the sdist was built, False if the existing one was reused.
+
+    Raises
+    ------
+    RuntimeError
+        If the build fails or does not produce any artifacts.
+    """
+    def log(msg):
+        if output is None:
+            print(msg)
+        else:
+            output.write(msg + '\n')
+
+    fingerprint = source_fingerprint(source_path)
+    if sdist_is_fresh(source_path, fingerprint):
+        log('sdist for %s is up to date' % source_path)
+        return False
+    log('building sdist for %s' % source_path)
+    returncode = run_command(shlex.split(SDIST_COMMAND), cwd=source_path,
+                             output=output)
+    if returncode != 0:
+        raise RuntimeError('building sdist for %s failed with return code %i'
+                           % (source_path, returncode))
+    dist = dist_dir(source_path)
+    if not os.path.isdir(dist) or not _artifacts(dist):
+        raise RuntimeError('building sdist for %s did not produce any files '
+                           'in %s' % (source_path, dist))
+    data = {'fingerprint': fingerprint, 'artifacts': _artifacts(dist)}
+    atomic_write(os.path.join(dist, FINGERPRINT_NAME),
+                 json.dumps(data, indent=1, sort_keys=True).encode('utf-8'))
+    return True
+
+
+class SdistBuilder(object):
+    """
+    Builds the sdists of local packages listed in ``source_paths`` at most
+    once per run.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        The number of sdists to build concurrently in ``build_all()``.
+        Defaults to the number of CPUs.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.done = set()
+
+    def build_all(self, source_paths):
+        """
+        Builds the sdists for all distinct ``source_paths`` concurrently. The
+        output of each build is printed as one block once it finishes.
+
+        Raises
+        ------
+        RuntimeError
+            If any build fails. All builds are allowed to finish first.
+        """
+        import multiprocessing
+        from concurrent.futures import ThreadPoolExecutor
+
+        # deduplicate source paths
+        todo = {}
+        for source_path in source_paths:
+            key = normalize_path(source_path)
+            if key not in self.done:
+                todo.setdefault(key, source_path)
+        if not todo:
+            return
+
+        def build(source_path):
+            buf = six.StringIO()
+            try:
+                build_sdist(source_path, output=buf)
+            except Exception as e:
+                return buf.getvalue(), e
+            return buf.getvalue(), None
+
+        # build
+        max_workers = min(len(todo), self.max_workers or
+                          multiprocessing.cpu_count())
+        failures = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(build, list(todo.values()))
+            for key, (output, error) in zip(list(todo), results):
+                if output:
+                    print(output.rstrip('\n'))
+                if error is not None:
+                    print(str(error))
+                    failures.append(todo[key])
+                else:
+                    self.done.add(key)
+        if failures:
+            raise RuntimeError('building sdists failed for %s'
+                               % ', '.join(failures))
+
+    def build(self, source_path):
+        """
+        Builds the sdist for one source path unless it was already built by
+        this builder, and returns its ``dist/`` directory.
+        """
+        key = normalize_path(source_path)
+        if key not in self.done:
+            build_sdist(source_path)
+            self.done.add(key)
+        return dist_dir(source_path)
@@ -31,8 +31,13 @@ def format_requirements(reqs):
                       for r in reqs)
 
 
+def format_setup_py(name, reqs):
+    return TEMPLATE.replace('<name>', name)\
+        .replace('<install_requires>', format_requirements(sorted(
+            reqs, key=lambda r: r.line)))
+
+
 def write_setup_py(dest_dir, name, reqs):
-    content = TEMPLATE.replace('<name>', name)\
-        .replace('<install_requires>', format_requirements(reqs))
+    content = format_setup_py(name, reqs)
     with open(os.path.join(dest_dir, 'setup.py'), 'w') as handle:
         handle.write(content)
@@ -0,0 +1,476 @@
+from __future__ import absolute_import
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:
+    # Python 2
+    _cpu_time = time.clock
+
+try:
+    _thread_cpu_time = time.thread_time
+except AttributeError:
+    # Python < 3.7
+    _thread_cpu_time = _cpu_time
+
+STATS_VERSION = 1
+
+# callbacks registered with register_hook()
+_hooks = []
+
+# the stack of PhaseTimers of each thread that subprocesses started by
+# run_command() in that thread are attributed to
+_active = threading.local()
+
+
+def register_hook(hook):
+    """
+    Registers a callback that receives build metrics as they are recorded, for
+    example to forward them to an external telemetry system.
+
+    The callback is called as ``hook(event, data)``, where ``event`` is one
+    of:
+
+    * ``'phase'``: a phase of a build ended. ``data`` has keys ``'scope'``
+      (the target module name, or ``'run'``), ``'phase'`` and the metrics
+      described in ``PhaseTimer``.
+    * ``'subprocess'``: a command run through ``run_command()`` exited.
+      ``data`` has keys ``'scope'``, ``'phase'``, ``'command'``,
+      ``'returncode'``, ``'wall'``, ``'cpu'`` and ``'max_rss_kb'``.
+    * ``'target'``: a target was built. ``data`` is the summary returned by
+      ``process_module()``, with an extra key ``'target'``.
+    * ``'run'``: a run finished. ``data`` is the aggregated report written by
+      ``--stats_json``.
+
+    ``'phase'`` and ``'subprocess'`` events are emitted by the process doing
+    the work, which is a worker process when building with ``--jobs``.
+    ``'target'`` and ``'run'`` events are always emitted by the main process.
+    Exceptions raised by hooks are propagated.
+
+    Parameters
+    ----------
+    hook : callable
+        The callback.
+    """
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def unregister_hook(hook):
+    """
+    Removes a callback registered with ``register_hook()``.
+    """
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def load_hook(spec):
+    """
+    Imports a hook given as ``'package.module:function'``.
+    """
+    import importlib
+
+    if ':' not in spec:
+        raise ValueError('stats hook must be given as module:function, got %s'
+                         % spec)
+    module_name, attr = spec.split(':', 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def emit(event, data):
+    for hook in list(_hooks):
+        hook(event, data)
+
+
+def max_rss_kb(who='self'):
+    """
+    Returns the peak resident set size so far of this process (``'self'``) or
+    of its largest waited-for child process (``'children'``), in KiB, or None
+    if it cannot be determined on this platform.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self'
+                               else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+def io_counters():
+    """
+    Returns the number of bytes this process has read and written so far
+    through system calls as a ``(read, written)`` tuple, or None if the
+    platform does not provide these counters (only Linux does).
+    """
+    try:
+        with open('/proc/self/io', 'r') as handle:
+            fields = dict(line.split(':', 1) for line in handle)
+    except (IOError, OSError, ValueError):
+        return None
+    return int(fields['rchar']), int(fields['wchar'])
+
+
+def children_cpu_time():
+    """
+    Returns the user plus system CPU time of all waited-for child processes.
+    """
+    times = os.times()
+    return times[2] + times[3]
+
+
+class PhaseTimer(object):
+    """
+    Measures consecutive phases of a build.
+
+    Calling ``start()`` ends the current phase (if any) and starts the next
+    one, so a linear sequence of steps can be timed without restructuring it.
+    For each phase the following metrics are recorded in ``phases``:
+
+    * ``wall``: elapsed wall time in seconds
+    * ``cpu``: CPU time of this process in seconds
+    * ``children_cpu``: CPU time of child processes that exited during the
+      phase, in seconds
+    * ``max_rss_kb``: peak resident set size of this process at the end of the
+      phase, in KiB (None if unavailable)
+    * ``read_bytes``, ``written_bytes``: bytes read and written by this process
+      during the phase (None if unavailable, or if the phase overlapped with
+      others, see ``task()``)
+
+    Commands run through ``run_command()`` by a thread while the timer is
+    active in it (see ``activate()``) are recorded in ``subprocesses``.
+
+    Phases that run concurrently in threads are timed with ``task()``
+    instead.
+
+    Parameters
+    ----------
+    scope : str
+        Identifies what is being built (a target module name, or ``'run'``)
+        in the events passed to hooks.
+    profile_phases : iterable of str
+        Phases to run under ``cProfile``.
+    profile_prefix : str, optional
+        The profile of each phase in ``profile_phases`` is written to
+        ``<profile_prefix>.<phase>.prof``. Required if ``profile_phases`` is
+        not empty.
+
+    Examples
+    --------
+    >>> from treeshaker.stats import PhaseTimer
+    >>> timer = PhaseTimer()
+    >>> timer.start('parse')
+    >>> timer.start('write')
+    >>> timer.stop()
+    >>> list(timer.timings)
+    ['parse', 'write']
+    >>> sorted(timer.phases['parse'])  # doctest: +NORMALIZE_WHITESPACE
+    ['children_cpu', 'cpu', 'max_rss_kb', 'read_bytes', 'wall',
+     'written_bytes']
+    """
+    def __init__(self, scope='run', profile_phases=(), profile_prefix=None):
+        self.scope = scope
+        self.phases = OrderedDict()
+        self.subprocesses = []
+        self.profile_phases = set(profile_phases)
+        self.profile_prefix = profile_prefix
+        self.profiles = []
+        self._phase = None
+        self._start = None
+        self._profiler = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # whether each running task() phase overlapped with another phase
+        self._overlapped = {}
+
+    @property
+    def timings(self):
+        """
+        Map from each phase to its wall time in seconds.
+        """
+        return OrderedDict((phase, metrics['wall'])
+                           for phase, metrics in self.phases.items())
+
+    def activate(self):
+        """
+        Makes this the timer that commands run by the calling thread are
+        recorded in, until ``deactivate()`` is called.
+        """
+        _active_timers().append(self)
+
+    def deactivate(self):
+        timers = _active_timers()
+        for i in range(len(timers) - 1, -1, -1):
+            if timers[i] is self:
+                del timers[i]
+                break
+
+    def start(self, phase):
+        self.stop()
+        self._phase = phase
+        self._start = (time.time(), _cpu_time(), children_cpu_time(),
+                       io_counters())
+        if phase in self.profile_phases:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _metrics(self, phase):
+        return self.phases.setdefault(phase, {
+            'wall': 0., 'cpu': 0., 'children_cpu': 0., 'max_rss_kb': None,
+            'read_bytes': None, 'written_bytes': None})
+
+    def stop(self):
+        if self._phase is None:
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+            fname = '%s.%s.prof' % (self.profile_prefix, self._phase)
+            self._profiler.dump_stats(fname)
+            self.profiles.append(fname)
+            self._profiler = None
+        wall, cpu, children_cpu, io = self._start
+        io_now = io_counters()
+        metrics = self._metrics(self._phase)
+        metrics['wall'] += time.time() - wall
+        metrics['cpu'] += _cpu_time() - cpu
+        metrics['children_cpu'] += children_cpu_time() - children_cpu
+        metrics['max_rss_kb'] = max_rss_kb()
+        if io is not None and io_now is not None:
+            metrics['read_bytes'] = (metrics['read_bytes'] or 0) + \
+                io_now[0] - io[0]
+            metrics['written_bytes'] = (metrics['written_bytes'] or 0) + \
+                io_now[1] - io[1]
+        data = dict(metrics, scope=self.scope, phase=self._phase)
+        self._phase = None
+        emit('phase', data)
+
+    @contextlib.contextmanager
+    def task(self, phase):
+        """
+        Times a phase that runs in the current thread, possibly concurrently
+        with other phases. Its ``cpu`` is the CPU time of the thread and its
+        ``children_cpu`` the CPU time of the commands run through
+        ``run_command()`` during it, which the timer is activated for. The
+        I/O of this process is recorded for phases that did not overlap with
+        any other phase of the timer, as it cannot be attributed otherwise.
+        """
+        profiler = None
+        if phase in self.profile_phases:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._local.phase = phase
+        self.activate()
+        with self._lock:
+            overlapped = [bool(self._overlapped) or self._phase is not None]
+            for other in self._overlapped.values():
+                other[0] = True
+            self._overlapped[id(overlapped)] = overlapped
+        start, start_cpu, io = time.time(), _thread_cpu_time(), io_counters()
+        try:
+            yield
+        finally:
+            wall = time.time() - start
+            cpu = _thread_cpu_time() - start_cpu
+            io_now = io_counters()
+            self.deactivate()
+            self._local.phase = None
+            if profiler is not None:
+                profiler.disable()
+                fname = '%s.%s.prof' % (self.profile_prefix, phase)
+                profiler.dump_stats(fname)
+            with self._lock:
+                del self._overlapped[id(overlapped)]
+                if profiler is not None:
+                    self.profiles.append(fname)
+                metrics = self._metrics(phase)
+                metrics['wall'] += wall
+                metrics['cpu'] += cpu
+                if not overlapped[0] and io is not None and \
+                        io_now is not None:
+                    metrics['read_bytes'] = (metrics['read_bytes'] or 0) + \
+                        io_now[0] - io[0]
+                    metrics['written_bytes'] = \
+                        (metrics['written_bytes'] or 0) + io_now[1] - io[1]
+                metrics['children_cpu'] = sum([
+                    s['cpu'] for s in self.subprocesses
+                    if s['phase'] == phase], 0.)
+                metrics['max_rss_kb'] = max_rss_kb()
+                data = dict(metrics, scope=self.scope, phase=phase)
+            emit('phase', data)
+
+    @property
+    def phase(self):
+        """
+        The name of the current phase (of the calling thread, for phases timed
+        with ``task()``), or None.
+        """
+        return getattr(self._local, 'phase', None) or self._phase
+
+
+def _active_timers():
+    if not hasattr(_active, 'timers'):
+        _active.timers = []
+    return _active.timers
+
+
+def active_timer():
+    """
+    Returns the innermost PhaseTimer active in the calling thread, or None.
+    """
+    timers = _active_timers()
+    return timers[-1] if timers else None
+
+
+@contextlib.contextmanager
+def attributed_to(timer, phase=None):
+    """
+    Activates ``timer`` in the calling thread inside this block, recording
+    the commands it runs under ``phase``. Use this in threads that run
+    commands on behalf of another thread, passing that thread's
+    ``active_timer()`` and its ``phase``.
+    """
+    if timer is None:
+        yield
+        return
+    old_phase = getattr(timer._local, 'phase', None)
+    timer._local.phase = phase
+    timer.activate()
+    try:
+        yield
+    finally:
+        timer.deactivate()
+        timer._local.phase = old_phase
+
+
+def record_subprocess(command, returncode, wall, cpu):
+    """
+    Records a finished subprocess against the innermost PhaseTimer active in
+    the calling thread and passes it to the registered hooks.
+    """
+    timer = active_timer()
+    data = {
+        'scope': timer.scope if timer is not None else None,
+        'phase': timer.phase if timer is not None else None,
+        'command': command if isinstance(command, str) else ' '.join(command),
+        'returncode': returncode,
+        'wall': wall,
+        'cpu': cpu,
+        'max_rss_kb': max_rss_kb('children'),
+    }
+    if timer is not None:
+        timer.subprocesses.append(data)
+    emit('subprocess', data)
+
+
+def sum_phases(phase_dicts):
+    """
+    Adds up the metrics of several ``PhaseTimer.phases`` dicts. Peak RSS is
+    combined with ``max()``.
+
+    Examples
+    --------
+    >>> from treeshaker.stats import sum_phases
+    >>> a = {'graph': {'wall': 1.0, 'max_rss_kb': 10, 'read_bytes': None}}
+    >>> b = {'graph': {'wall': 2.0, 'max_rss_kb': 5, 'read_bytes': 7}}
+    >>> sum_phases([a, b]) == {
+    ...     'graph': {'wall': 3.0, 'max_rss_kb': 10, 'read_bytes': 7}}
+    True
+    """
+    total = OrderedDict()
+    for phases in phase_dicts:
+        for phase, metrics in phases.items():
+            summed = total.setdefault(phase, {})
+            for key, value in metrics.items():
+                old = summed.get(key)
+                if value is None:
+                    summed[key] = old
+                elif old is None:
+                    summed[key] = value
+                elif key == 'max_rss_kb':
+                    summed[key] = max(old, value)
+                else:
+                    summed[key] = old + value
+    return total
+
+
+def build_report(run_timer, summaries):
+    """
+    Aggregates the run-level metrics and the per-target summaries returned by
+    ``process_module()`` into a JSON-serializable report.
+
+    Parameters
+    ----------
+    run_timer : PhaseTimer
+        The timer for the phases of the run that are not specific to a target.
+    summaries : dict
+        Map from each target to its summary.
+
+    Returns
+    -------
+    dict
+        The report.
+    """
+    import platform
+
+    import treeshaker
+
+    targets = OrderedDict()
+    for target in sorted(summaries):
+        summary = summaries[target]
+        targets[target] = {
+            'phases': summary['phases'],
+            'counts': summary['counts'],
+            'subprocesses': summary['subprocesses'],
+            'pip_compile_cache_hit': summary['pip_compile_cache_hit'],
+            'footprint': summary['footprint'],
+            'critical_path': summary['critical_path'],
+            'io': summary['io'],
+        }
+    counts = {}
+    io = None
+    for summary in summaries.values():
+        for key, value in summary['counts'].items():
+            counts[key] = counts.get(key, 0) + value
+        if summary['io'] is not None:
+            io = dict((key, (io or {}).get(key, 0) + value)
+                      for key, value in summary['io'].items())
+    return {
+        'version': STATS_VERSION,
+        'treeshaker_version': treeshaker.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'run': {
+            'phases': run_timer.phases,
+            'subprocesses': run_timer.subprocesses,
+            'max_rss_kb': max_rss_kb(),
+            'children_max_rss_kb': max_rss_kb('children'),
+        },
+        'targets': targets,
+        'totals': {
+            'phases': sum_phases(t['phases'] for t in targets.values()),
+            'counts': counts,
+            'io': io,
+        },
+    }
+
+
+def write_report(report, fname):
+    with open(fname, 'w') as handle:
+        json.dump(report, handle, indent=1, sort_keys=True)
@@ -0,0 +1,202 @@
+from __future__ import absolute_import
+
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from treeshaker.stats import active_timer, attributed_to, \
+    children_cpu_time, record_subprocess
+
+
+# deadlines of the calling threads, see deadline()
+_deadlines = threading.local()
+
+
+@contextlib.contextmanager
+def deadline(timeout):
+    """
+    Limits the commands run through ``run_command()`` by the calling thread
+    inside this block to end within ``timeout`` seconds from now, in total.
+    Does nothing if ``timeout`` is None.
+    """
+    old = getattr(_deadlines, 'deadline', None)
+    if timeout is not None:
+        new = time.time() + timeout
+        _deadlines.deadline = new if old is None else min(old, new)
+    try:
+        yield
+    finally:
+        _deadlines.deadline = old
+
+
+def time_left():
+    """
+    Returns the seconds left until the ``deadline()`` of the calling thread,
+    or None if there is none.
+    """
+    until = getattr(_deadlines, 'deadline', None)
+    return None if until is None else max(until - time.time(), 0.)
+
+
+def run_command(args, cwd=None, shell=False, output=None, timeout=None):
+    """
+    Runs a command, forwarding its combined stdout and stderr through
+    ``sys.stdout`` (or ``output``).
+
+    The wall time, CPU time and return code of the command are recorded with
+    ``treeshaker.stats.record_subprocess()``.
+
+    Forwarding the output (rather than letting the child process inherit our
+    file descriptors) allows the output of each target's build to be captured
+    and printed as one block when targets are built in parallel.
+
+    Parameters
+    ----------
+    args : list of str or str
+        The command to run, as passed to ``subprocess.Popen``.
+    cwd : str, optional
+        The working directory to run the command in.
+    shell : bool
+        Passed through to ``subprocess.Popen``.
+    output : file-like, optional
+        Where to forward the output to instead of ``sys.stdout``.
+    timeout : float, optional
+        Kill the command after this many seconds. Defaults to the time left
+        until the ``deadline()`` of the calling thread, if any.
+
+    Returns
+    -------
+    int
+        The return code of the command.
+
+    Raises
+    ------
+    RuntimeError
+        If the command was killed because it timed out.
+    """
+    left = time_left()
+    if left is not None:
+        timeout = left if timeout is None else min(timeout, left)
+    start, start_cpu = time.time(), children_cpu_time()
+    # shell commands run in a process group of their own, so that the
+    # commands started by the shell are killed with it
+    group = shell and timeout is not None and hasattr(os, 'killpg')
+    proc = subprocess.Popen(args, cwd=cwd, shell=shell,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            preexec_fn=os.setpgrp if group else None)
+    killer = None
+    killed = []
+    if timeout is not None:
+        def kill():
+            killed.append(True)
+            if group:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            else:
+                proc.kill()
+        killer = threading.Timer(timeout, kill)
+        killer.daemon = True
+        killer.start()
+    output = output or sys.stdout
+    try:
+        for line in iter(proc.stdout.readline, b''):
+            output.write(line.decode('utf-8', 'replace'))
+        proc.stdout.close()
+        returncode = proc.wait()
+    finally:
+        if killer is not None:
+            killer.cancel()
+    record_subprocess(args, returncode, time.time() - start,
+                      children_cpu_time() - start_cpu)
+    if killed:
+        raise RuntimeError('%s timed out after %.1fs'
+                           % (args if isinstance(args, str)
+                              else ' '.join(args), timeout))
+    return returncode
+
+
+def group_commands(commands):
+    """
+    Splits commands into groups that run one after another. Consecutive
+    commands prefixed with ``&`` form a group that runs in parallel.
+
+    Examples
+    --------
+    >>> from treeshaker.subprocess_utils import group_commands
+    >>> group_commands(['make', '& pytest', '&flake8', 'echo done'])
+    [['make'], ['pytest', 'flake8'], ['echo done']]
+    """
+    groups = []
+    parallel = False
+    for cmd in commands:
+        if cmd.startswith('&'):
+            if not parallel:
+                groups.append([])
+            groups[-1].append(cmd[1:].strip())
+            parallel = True
+        else:
+            groups.append([cmd])
+            parallel = False
+    return groups
+
+
+def run_commands(commands, cwd=None, label='command'):
+    """
+    Runs shell commands, see ``group_commands()``. The output of commands
+    running in parallel is printed as one block per command, in order.
+
+    Parameters
+    ----------
+    commands : list of str
+        The commands.
+    cwd : str, optional
+        The working directory to run the commands in.
+    label : str
+        What to call the commands in messages.
+
+    Raises
+    ------
+    RuntimeError
+        If a command exits with a nonzero return code or times out. The
+        remaining groups are not run.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import six
+
+    for group in group_commands(commands):
+        if len(group) == 1:
+            print('running %s: %s' % (label, group[0]))
+            results = [(group[0], run_command(group[0], cwd=cwd, shell=True),
+                        None)]
+        else:
+            # threads do not inherit the deadline and timer of the calling
+            # thread
+            timeout = time_left()
+            timer = active_timer()
+            phase = timer.phase if timer is not None else None
+
+            def run(cmd):
+                buf = six.StringIO()
+                with attributed_to(timer, phase):
+                    return cmd, run_command(cmd, cwd=cwd, shell=True,
+                                            output=buf, timeout=timeout), buf
+
+            print('running %i %ss in parallel' % (len(group), label))
+            with ThreadPoolExecutor(max_workers=len(group)) as pool:
+                results = list(pool.map(run, group))
+        failed = []
+        for cmd, returncode, buf in results:
+            if buf is not None:
+                print('running %s: %s' % (label, cmd))
+                sys.stdout.write(buf.getvalue())
+            if returncode:
+                failed.append('%s (exit code %i)' % (cmd, returncode))
+        if failed:
+            raise RuntimeError('%s failed: %s' % (label, ', '.join(failed)))
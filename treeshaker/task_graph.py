@@ -0,0 +1,260 @@
+from __future__ import absolute_import
+
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import six
+from six.moves import queue
+
+from treeshaker.parallel_utils import thread_output
+from treeshaker.subprocess_utils import deadline
+
+
+# the timeout of tasks added without one, in seconds
+DEFAULT_TASK_TIMEOUT = 3600.
+
+# the tasks of a target build, see treeshaker.treeshaker._build()
+BUILD_TASKS = ('requirements', 'sdist', 'graph', 'closure', 'rewrite',
+               'bytecode', 'pip_compile', 'docs', 'setup_py', 'manifest',
+               'footprint', 'post_build')
+
+# how long to wait for a task that timed out to report that the commands it
+# ran were killed, in seconds
+_GRACE_PERIOD = 1.
+
+Task = namedtuple('Task', ['name', 'fn', 'deps', 'timeout', 'inline'])
+
+
+class TaskGraph(object):
+    """
+    Runs a small graph of named tasks, starting each task as soon as all tasks
+    it depends on have finished, so that tasks waiting for I/O or subprocesses
+    overlap.
+
+    Each task runs in its own thread, and what it prints is shown as one block
+    when it finishes. Tasks added with ``inline=True`` run in the calling
+    thread instead if that is the main thread, because they start process
+    pools, which are only started from the main thread (see
+    ``treeshaker.parallel_utils.pool_jobs()``), and print directly.
+
+    A task that runs longer than its timeout fails the graph. Commands it runs
+    through ``run_command()`` are killed when the timeout expires. Other work
+    in a task's own thread cannot be interrupted and is abandoned in its
+    (daemon) thread. Inline tasks are interrupted with ``SIGALRM`` where
+    available, and otherwise fail when they finish.
+
+    Parameters
+    ----------
+    timer : PhaseTimer, optional
+        Records each task as a phase with ``PhaseTimer.task()``.
+    default_timeout : float
+        The timeout of tasks added without one, in seconds.
+
+    Examples
+    --------
+    >>> from treeshaker.task_graph import TaskGraph
+    >>> graph = TaskGraph()
+    >>> graph.add('parse', lambda: 2)
+    >>> graph.add('fetch', lambda: 3)
+    >>> graph.add('combine', lambda: graph.results['parse'] *
+    ...           graph.results['fetch'], deps=['parse', 'fetch'])
+    >>> graph.run()['combine']
+    6
+    >>> graph.critical_path()[-1]
+    'combine'
+    """
+    def __init__(self, timer=None, default_timeout=DEFAULT_TASK_TIMEOUT):
+        self.timer = timer
+        self.default_timeout = default_timeout
+        self.tasks = OrderedDict()
+        self.results = {}
+        self.times = OrderedDict()
+        self._start = None
+
+    def add(self, name, fn, deps=(), timeout=None, inline=False):
+        """
+        Adds a task.
+
+        Parameters
+        ----------
+        name : str
+            The name of the task, also used as the name of its phase.
+        fn : callable
+            Called without arguments. Its return value is stored in
+            ``results[name]``.
+        deps : list of str
+            The tasks that must finish first. They must already be added.
+        timeout : float, optional
+            The timeout in seconds. Defaults to ``default_timeout``.
+        inline : bool
+            Pass True to run the task in the calling thread if it is the main
+            thread.
+        """
+        if name in self.tasks:
+            raise ValueError('task %s was already added' % name)
+        unknown = [d for d in deps if d not in self.tasks]
+        if unknown:
+            raise ValueError('task %s depends on unknown tasks %s'
+                             % (name, ', '.join(unknown)))
+        self.tasks[name] = Task(name, fn, tuple(deps),
+                                self.default_timeout if timeout is None
+                                else timeout, inline)
+
+    def _call(self, task):
+        start = time.time()
+        try:
+            with deadline(task.timeout):
+                if self.timer is None:
+                    return task.fn()
+                with self.timer.task(task.name):
+                    return task.fn()
+        finally:
+            self.times[task.name] = (start - self._start,
+                                     time.time() - self._start)
+
+    def _call_inline(self, task):
+        if not hasattr(signal, 'setitimer'):
+            return self._call(task)
+
+        def expired(signum, frame):
+            raise RuntimeError('task %s timed out after %gs'
+                               % (task.name, task.timeout))
+
+        start = time.time()
+        old_handler = signal.signal(signal.SIGALRM, expired)
+        old_timer = signal.setitimer(signal.ITIMER_REAL, task.timeout)
+        try:
+            return self._call(task)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
+            if old_timer[0]:
+                # resume the alarm that was pending before the task
+                signal.setitimer(signal.ITIMER_REAL, max(
+                    old_timer[0] - (time.time() - start), 1e-3), old_timer[1])
+
+    def _thread(self, task, done, stdout, stderr):
+        buf = six.StringIO()
+        stdout.local.stream = stderr.local.stream = buf
+        result = exc_info = None
+        try:
+            result = self._call(task)
+        except BaseException:
+            exc_info = sys.exc_info()
+        finally:
+            stdout.local.stream = stderr.local.stream = None
+        done.put((task.name, buf.getvalue(), result, exc_info))
+
+    def run(self):
+        """
+        Runs all tasks. After a task fails, no further tasks are started, the
+        running ones are allowed to finish and the first failure is raised.
+
+        Returns
+        -------
+        dict
+            The ``results``.
+
+        Raises
+        ------
+        RuntimeError
+            If a task times out.
+        """
+        self._start = time.time()
+        # inline tasks only run inline in the main thread, see the class
+        # docstring
+        main = threading.current_thread().name == 'MainThread'
+        pending = list(self.tasks)
+        deadlines = {}
+        done = queue.Queue()
+        failure = None
+        with thread_output() as (stdout, stderr):
+            while pending or deadlines:
+                ready = [] if failure else [
+                    name for name in pending
+                    if all(d in self.results for d in self.tasks[name].deps)]
+                inline = [name for name in ready
+                          if self.tasks[name].inline and main]
+                for name in ready:
+                    task = self.tasks[name]
+                    if name in inline:
+                        continue
+                    pending.remove(name)
+                    deadlines[name] = time.time() + task.timeout
+                    thread = threading.Thread(
+                        target=self._thread,
+                        args=(task, done, stdout, stderr),
+                        name='treeshaker-task-%s' % name)
+                    thread.daemon = True
+                    thread.start()
+                if inline:
+                    task = self.tasks[inline[0]]
+                    pending.remove(task.name)
+                    try:
+                        self.results[task.name] = self._call_inline(task)
+                    except BaseException:
+                        failure = sys.exc_info()
+                        continue
+                    elapsed = self.times[task.name][1] - \
+                        self.times[task.name][0]
+                    if elapsed > task.timeout:
+                        failure = (RuntimeError, RuntimeError(
+                            'task %s timed out after %gs'
+                            % (task.name, task.timeout)), None)
+                    continue
+                if not deadlines:
+                    break
+                try:
+                    name, output, result, exc_info = done.get(
+                        timeout=max(min(deadlines.values()) - time.time(),
+                                    0.) + _GRACE_PERIOD)
+                except queue.Empty:
+                    name = None
+                if name is None:
+                    name = min(deadlines, key=deadlines.get)
+                    raise RuntimeError('task %s timed out after %gs'
+                                       % (name, self.tasks[name].timeout))
+                del deadlines[name]
+                if output:
+                    sys.stdout.write(output)
+                if exc_info is not None:
+                    failure = failure or exc_info
+                else:
+                    self.results[name] = result
+        if failure is not None:
+            six.reraise(*failure)
+        return self.results
+
+    def critical_path(self):
+        """
+        Returns the chain of tasks that determined how long the graph took to
+        run: the task that finished last, preceded by the dependency of each
+        task in the chain that finished last.
+        """
+        if not self.times:
+            return []
+        path = [max(self.times, key=lambda name: self.times[name][1])]
+        while True:
+            deps = [d for d in self.tasks[path[-1]].deps if d in self.times]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda name: self.times[name][1]))
+        return path[::-1]
+
+    def format_critical_path(self):
+        """
+        Renders the critical path with the duration of each task.
+        """
+        path = self.critical_path()
+        if not path:
+            return 'critical path: empty'
+        total = max(end for _, end in self.times.values())
+        return 'critical path: %s (%.2fs of %.2fs)' % (
+            ' -> '.join('%s %.2fs' % (name, self.times[name][1] -
+                                      self.times[name][0])
+                        for name in path),
+            sum(self.times[name][1] - self.times[name][0] for name in path),
+            total)
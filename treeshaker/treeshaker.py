@@ -1,24 +1,80 @@
 from __future__ import absolute_import
 
+import contextlib
 import os
-import shlex
-import shutil
-import subprocess
+import posixpath
+import sys
+import time
+import traceback
 
-import fire
-import requirements
-from modulegraph.modulegraph import MissingModule
-from modulegraph.find_modules import find_modules
-from piptools.scripts.compile import cli as pip_compile
+import six
 
-from treeshaker import __version__
-from treeshaker.config import load_config
-from treeshaker.doc_utils import document_component, document_function
-from treeshaker.pypi_names import convert_from_pypi
-from treeshaker.setup_utils import write_setup_py
+import treeshaker
+from treeshaker.affected_utils import INDEX_NAME, ReverseIndex, \
+    collect_changed_files
+from treeshaker.analysis import GRAPH_SUFFIX, Analysis
+from treeshaker.archive_utils import ArchiveManifest, archive_path, \
+    dist_info_dir, format_wheel_file, format_wheel_metadata, \
+    format_zipapp_main
+from treeshaker.ast_graph import GRAPH_ENGINES, AstGraphBuilder
+from treeshaker.bytecode_utils import BytecodeCompiler
+from treeshaker.cache_utils import DEFAULT_CACHE_DIR, FileCache, hash_bytes, \
+    hash_file, hash_key
+from treeshaker.compile_utils import compile_requirements, \
+    pin_requirements
+from treeshaker.config import ResolvedConfig
+from treeshaker.copy_utils import format_bytes
+from treeshaker.doc_utils import DOC_VERSION, document_component, \
+    document_function
+from treeshaker.footprint import BUDGETS, build_footprint_report, \
+    check_budgets, format_footprint, import_location, measure_footprint
+from treeshaker.manifest import Manifest
+from treeshaker.metadata_utils import environment_fingerprint, \
+    environment_index
+from treeshaker.parallel_utils import capture_output, get_process_pool, \
+    group_conflicting, normalize_path
+from treeshaker.requirements_utils import PrefixIndex, \
+    build_requirement_index
+from treeshaker.rewrite_utils import REWRITE_VERSION, ImportRewriter
+from treeshaker.scan_cache import ScanCache, is_missing_module
+from treeshaker.sdist_utils import SdistBuilder, dist_dir
+from treeshaker.stats import PhaseTimer, build_report, emit, io_counters, \
+    load_hook, register_hook, write_report
+from treeshaker.setup_utils import format_setup_py
+from treeshaker.subprocess_utils import run_commands
+from treeshaker.task_graph import TaskGraph
+
+
+# module graphs shared between targets, set before worker processes are forked
+_shared_graphs = {}
+
+# parsed requirements, module graphs and outdir locks kept in memory between
+# requests by a running daemon (see treeshaker.daemon)
+_daemon_state = None
+
+
+@contextlib.contextmanager
+def outdir_lock(dest_dir):
+    """
+    Prevents concurrent daemon requests from building into the same outdir.
+    Does nothing outside of the daemon.
+    """
+    if _daemon_state is None:
+        yield
+        return
+    with _daemon_state.outdir_lock(dest_dir):
+        yield
 
 
 def load_requirements_txt(fname='requirements.txt'):
+    if _daemon_state is not None:
+        return _daemon_state.requirements(fname, _parse_requirements_txt)
+    return _parse_requirements_txt(fname)
+
+
+def _parse_requirements_txt(fname):
+    import requirements
+
     with open(fname, 'r') as handle:
         all_lines = handle.readlines()
     header_lines = [
@@ -29,6 +85,68 @@ def load_requirements_txt(fname='requirements.txt'):
     return header_lines, list(requirements.parse(''.join(req_lines)))
 
 
+def build_module_graph(target_module_names, target_packages, all_reqs,
+                       scan_cache=None, graph_engine='modulegraph'):
+    """
+    Runs modulegraph (or the ast engine) once to construct a single import
+    graph containing all of the specified target modules.
+
+    The closure of any one target can be recovered from the combined graph by
+    walking ``getReferences()`` starting from that target's node, so targets
+    that share a requirements file and a set of target packages can share a
+    single graph instead of re-parsing the same files once per target.
+
+    Parameters
+    ----------
+    target_module_names : list of str
+        The names of the target modules to include in the graph.
+    target_packages : list of str
+        The packages whose modules may be copied to the output directory.
+    all_reqs : list of requirements.requirement.Requirement
+        The parsed root requirements. These packages will be excluded from the
+        graph (unless they are also target packages).
+    scan_cache : ScanCache, optional
+        Pass a scan cache to reuse the scan results of unchanged modules from
+        previous runs. Only used by the modulegraph engine.
+    graph_engine : {'modulegraph', 'ast'}
+        ``'modulegraph'`` runs modulegraph over the whole transitive graph.
+        ``'ast'`` parses only the modules in ``target_packages`` and records
+        everything else as leaf nodes, which is much faster.
+
+    Returns
+    -------
+    modulegraph.modulegraph.ModuleGraph or CachedModuleGraph
+        The constructed graph.
+    """
+    if graph_engine not in GRAPH_ENGINES:
+        raise ValueError('unknown graph_engine %r, expected one of %s'
+                         % (graph_engine, ', '.join(GRAPH_ENGINES)))
+    if _daemon_state is not None:
+        key = (tuple(sorted(target_module_names)),
+               tuple(sorted(target_packages)),
+               tuple(sorted(r.line for r in all_reqs)), graph_engine)
+        return _daemon_state.graph(key, target_packages, lambda: _build_graph(
+            target_module_names, target_packages, all_reqs, scan_cache,
+            graph_engine))
+    return _build_graph(target_module_names, target_packages, all_reqs,
+                        scan_cache, graph_engine)
+
+
+def _build_graph(target_module_names, target_packages, all_reqs, scan_cache,
+                 graph_engine):
+    if graph_engine == 'ast':
+        return AstGraphBuilder(target_packages).build(target_module_names)
+    excludes = set(r.name for r in all_reqs) - set(target_packages)
+    if scan_cache is not None:
+        return scan_cache.build_graph(target_module_names, target_packages,
+                                      excludes)
+    from modulegraph.find_modules import find_modules
+    return find_modules(
+        includes=tuple(target_module_names),
+        excludes=excludes
+    )
+
+
 def module_is_nonempty(module):
     return bool([x for x in module.globalnames if not x.startswith('_')])
 
@@ -70,31 +188,43 @@ def resolve_function_name(ref, target_module_name, old_name_to_new_name):
     return module_name, component_name, new_name
 
 
-def process_module(target_module_name, target_packages, dest_dir,
-                   requirements_file='requirements.txt', add_init_py=False,
-                   add_setup_py=False, package_data=(), source_paths=(),
-                   readme=None, functions=(), fire_components=(),
-                   post_build_commands=(), verbose=False):
-    # determine package name
-    pkg_name = os.path.split(dest_dir)[1]
+def find_closure(mg, target_module_name, target_packages, all_reqs,
+                 req_index=None):
+    """
+    Walks the module import graph from a target module, collecting the modules
+    from ``target_packages`` it (transitively) imports and the external
+    requirements they import.
 
-    # parse root requirements.txt
-    header_lines, all_reqs = load_requirements_txt(fname=requirements_file)
-    print('parsed %i requirements from requirements.txt' % len(all_reqs))
-
-    # run modulegraph to get modules
-    print('constructing module import graph')
-    mg = find_modules(
-        includes=(target_module_name,),
-        excludes=set(r.name for r in all_reqs) - set(target_packages)
-    )
-    print('found %i nodes in the module import graph' % len(list(mg.flatten())))
+    Parameters
+    ----------
+    mg : ModuleGraph or CachedModuleGraph
+        The module import graph.
+    target_module_name : str
+        The name of the target module.
+    target_packages : list of str
+        The packages whose modules are copied to the output directory.
+    all_reqs : list of Requirement
+        The requirements parsed from requirements.txt.
+    req_index : PrefixIndex, optional
+        The ``build_requirement_index()`` of ``all_reqs``, if already built.
 
-    # analyze the graph
+    Returns
+    -------
+    our_mods, external_mods : set of Node
+        The modules from ``target_packages`` (including the target module) and
+        the modules from external requirements.
+    external_reqs : set of Requirement
+        The external requirements.
+    visited : set of str
+        The identifiers of all nodes visited by the walk.
+    """
     target_node = mg.findNode(target_module_name)
-    if target_node is None or isinstance(target_node, MissingModule):
+    if target_node is None or is_missing_module(target_node):
         raise ImportError('could not import target module %s'
                           % target_module_name)
+    target_index = PrefixIndex((p, p) for p in target_packages)
+    if req_index is None:
+        req_index = build_requirement_index(all_reqs)
     visited = set()
     our_mods = {target_node}
     external_mods = set()
@@ -107,190 +237,1026 @@ def process_module(target_module_name, target_packages, dest_dir,
             if ref.identifier in visited:
                 continue
             visited.add(ref.identifier)
-            if any(x in ref.identifier for x in target_packages):
+            if ref.identifier in target_index:
                 if module_is_nonempty(ref):
                     our_mods.add(ref)
                     stack.append(ref)
                 continue
-            for req in all_reqs:
-                if convert_from_pypi(req.name) in ref.identifier:
-                    external_mods.add(ref)
-                    external_reqs.add(req)
-                    break
-    print('found %i modules imported from target packages'
-          % len(our_mods))
-    print('found %i modules imported from %i external requirements'
-          % (len(external_mods), len(external_reqs)))
-    if verbose:
-        for m in sorted(external_mods):
-            print(m.identifier)
-
-    # fill in new names and new paths
-    old_names = [x.identifier for x in our_mods]
-    new_names = resolve_names(old_names)
-    old_name_to_new_name = {}
-    old_name_to_new_path = {}
-    for old_name, new_name in zip(old_names, new_names):
-        old_name_to_new_name[old_name] = new_name
-        old_name_to_new_path[old_name] = \
-            os.path.join(dest_dir, pkg_name, new_name + '.py') \
-            if add_setup_py else os.path.join(dest_dir, new_name + '.py')
-
-    # make dest_dir
-    if not os.path.exists(dest_dir):
-        os.mkdir(dest_dir)
-    if add_setup_py and not os.path.exists(os.path.join(dest_dir, pkg_name)):
-        os.mkdir(os.path.join(dest_dir, pkg_name))
-
-    # touch __init__.py
-    if add_init_py:
-        if add_setup_py:
-            print('both add_init_py and add_setup_py are set to True')
-            print('__init__.py will be written, but only once '
-                  '(inside the package folder)')
-        else:
-            open(os.path.join(dest_dir, '__init__.py'), 'w').close()
-    if add_setup_py:
-        open(os.path.join(dest_dir, pkg_name, '__init__.py'), 'w').close()
-
-    # copy modules, rewriting imports
-    for m in our_mods:
-        with open(m.filename, 'r') as handle:
-            data = handle.read()
-        for other in sorted(our_mods, key=lambda x: len(x.identifier),
-                            reverse=True):
-            data = data.replace(
-                other.identifier,
-                '.' + old_name_to_new_name[other.identifier])
-        with open(old_name_to_new_path[m.identifier], 'w') as handle:
-            handle.write(data)
-
-    # handle package_data
-    for f in package_data:
-        package_name, f_path = f.split('/', 1)
-        package_path = mg.findNode(package_name).packagepath[0]
-        complete_path = os.path.join(package_path, f_path)
-        shutil.copy(complete_path, dest_dir)
-
-    # write requirements.in
-    req_in_fname = os.path.join(dest_dir, 'requirements.in')
-    with open(req_in_fname, 'w') as handle:
-        handle.write('\n'.join(
-            header_lines + list(sorted([e.line for e in external_reqs]))))
+            req = req_index.get(ref.identifier)
+            if req is not None:
+                external_mods.add(ref)
+                external_reqs.add(req)
+    return our_mods, external_mods, external_reqs, visited
+
+
+def _render_readme(dest_dir, readme_content, fire_components, functions,
+                   target_module_name, old_name_to_new_name, mg, pkg_name=None,
+                   doc_extraction='static', doc_cache=None):
+    """
+    Renders the README of a target: a title, the content of the ``readme``
+    file and the documentation of its ``fire_components`` and ``functions``.
+    """
+    handle = six.StringIO()
+    handle.write('%s\n' % dest_dir)
+    handle.write(('=' * len(dest_dir)) + '\n\n')
+    if readme_content:
+        handle.write(readme_content + '\n')
+    if fire_components:
+        handle.write('Command line tools\n')
+        handle.write('------------------\n\n')
+    for f in fire_components:
+        module_name, name, new_name = resolve_function_name(
+            f, target_module_name, old_name_to_new_name)
+        document_component(
+            handle, module_name, name, new_name,
+            filename=mg.findNode(module_name).filename,
+            mode=doc_extraction, cache=doc_cache)
+    if fire_components and functions:
         handle.write('\n')
+    if functions:
+        handle.write('Python API\n')
+        handle.write('----------\n\n')
+    for f in functions:
+        module_name, name, new_name = resolve_function_name(
+            f, target_module_name, old_name_to_new_name)
+        document_function(
+            handle, module_name, name, new_name, pkg_name=pkg_name,
+            filename=mg.findNode(module_name).filename,
+            mode=doc_extraction, cache=doc_cache)
+    return handle.getvalue()
+
+
+def process_module(target_module_name, target_packages, dest_dir,
+                   requirements_file='requirements.txt', add_init_py=False,
+                   add_setup_py=False, package_data=(), source_paths=(),
+                   readme=None, functions=(), fire_components=(),
+                   post_build_commands=(), verbose=False, module_graph=None,
+                   scan_cache=None, compile_cache=None, sdist_builder=None,
+                   graph_engine='modulegraph', check=False, profile_dir=None,
+                   doc_extraction='static', doc_cache=None,
+                   copy_strategy='copy', output_format='dir',
+                   graph_file=None, footprint=False, budgets=None,
+                   bytecode='none', bytecode_optimize=(0,),
+                   bytecode_invalidation='checked-hash', task_timeouts=None,
+                   resolver='pip-compile'):
+    # determine package name
+    pkg_name = os.path.split(dest_dir)[1]
+
+    # collect facts about the build to report back to the caller
+    timer = PhaseTimer(
+        scope=target_module_name,
+        profile_phases=('graph', 'rewrite') if profile_dir else (),
+        profile_prefix=os.path.join(profile_dir, target_module_name)
+        if profile_dir else None)
+    summary = {'stale': [], 'pip_compile_cache_hit': False, 'counts': {},
+               'phases': timer.phases, 'subprocesses': timer.subprocesses,
+               'profiles': timer.profiles, 'footprint': None,
+               'budget_violations': [], 'critical_path': [], 'io': None}
+    io = io_counters()
+    timer.activate()
+    try:
+        with outdir_lock(dest_dir):
+            _build(target_module_name, target_packages, dest_dir, pkg_name,
+                   timer, summary, requirements_file=requirements_file,
+                   add_init_py=add_init_py, add_setup_py=add_setup_py,
+                   package_data=package_data, source_paths=source_paths,
+                   readme=readme, functions=functions,
+                   fire_components=fire_components,
+                   post_build_commands=post_build_commands, verbose=verbose,
+                   module_graph=module_graph, scan_cache=scan_cache,
+                   compile_cache=compile_cache, sdist_builder=sdist_builder,
+                   graph_engine=graph_engine, check=check,
+                   doc_extraction=doc_extraction, doc_cache=doc_cache,
+                   copy_strategy=copy_strategy, output_format=output_format,
+                   graph_file=graph_file, footprint=footprint,
+                   budgets=budgets, bytecode=bytecode,
+                   bytecode_optimize=bytecode_optimize,
+                   bytecode_invalidation=bytecode_invalidation,
+                   task_timeouts=task_timeouts, resolver=resolver)
+    finally:
+        timer.stop()
+        timer.deactivate()
+        io_now = io_counters()
+        if io is not None and io_now is not None:
+            summary['io'] = {'read_bytes': io_now[0] - io[0],
+                             'written_bytes': io_now[1] - io[1]}
+    summary['timings'] = timer.timings
+    return summary
+
+
+def _build(target_module_name, target_packages, dest_dir, pkg_name, timer,
+           summary, requirements_file, add_init_py, add_setup_py,
+           package_data, source_paths, readme, functions, fire_components,
+           post_build_commands, verbose, module_graph, scan_cache,
+           compile_cache, sdist_builder, graph_engine, check, doc_extraction,
+           doc_cache, copy_strategy, output_format, graph_file, footprint,
+           budgets, bytecode, bytecode_optimize, bytecode_invalidation,
+           task_timeouts, resolver):
+    """
+    Performs the phases of ``process_module()`` as a graph of tasks, timing
+    them with ``timer`` and recording facts about the build in ``summary``.
+
+    The tasks share their results through ``ctx``. Tasks that start process
+    pools run in the calling thread, the others in threads of their own, so
+    that for example sdists are built while the module graph is constructed
+    and ``pip-compile`` runs while modules are rewritten.
+    """
+    ctx = {}
+
+    # make dest_dir, or stream the outputs into an archive
+    if output_format == 'dir':
+        if not check:
+            if not os.path.exists(dest_dir):
+                os.mkdir(dest_dir)
+            if add_setup_py and \
+                    not os.path.exists(os.path.join(dest_dir, pkg_name)):
+                os.mkdir(os.path.join(dest_dir, pkg_name))
+        manifest = Manifest(dest_dir, check=check)
+    else:
+        manifest = ArchiveManifest(
+            archive_path(dest_dir, output_format, pkg_name), output_format,
+            prefix='' if output_format in ('wheel', 'zipapp') and add_setup_py
+            else pkg_name + '/',
+            check=check)
+
+    # parse root requirements.txt
+    def requirements():
+        ctx['header_lines'], ctx['all_reqs'] = \
+            load_requirements_txt(fname=requirements_file)
+        print('parsed %i requirements from requirements.txt'
+              % len(ctx['all_reqs']))
+        # map the modules of the requirements once for the closure walk, the
+        # analysis and the footprint
+        ctx['req_index'] = build_requirement_index(ctx['all_reqs'])
 
     # handle source_paths
-    find_links = []
-    for source_path in source_paths:
-        print('building sdist for %s' % source_path)
-        cmd = 'python setup.py --quiet sdist'
-        subprocess.Popen(shlex.split(cmd), cwd=source_path).wait()
-        # backslash pathsep breaks pip_comple() in py2
-        find_link = os.path.join(source_path, 'dist').replace('\\', '/')
-        assert os.path.exists(find_link)
-        find_links.append(find_link)
-
-    # compile requirements.txt
-    print('writing requirements.txt')
-    req_txt_fname = os.path.join(dest_dir, 'requirements.txt')
-    pip_compile_args = [req_in_fname, '--output-file', req_txt_fname,
-                        '--no-header', '--no-annotate']
-    for f in find_links:
-        pip_compile_args.extend(['--find-links', f])
-    if not verbose:
-        pip_compile_args.append('--quiet')
-    print('compiling requirements: %s %s' %
-          ('pip-compile', ' '.join(pip_compile_args)))
-    pip_compile(args=pip_compile_args, standalone_mode=False)
-    os.remove(req_in_fname)
-
-    # load readme content
-    readme_content = None
-    if readme and os.path.exists(readme):
-        with open(readme, 'r') as handle:
-            readme_content = handle.read()
-
-    # write README
-    if readme_content or fire_components or functions:
-        new_name = old_name_to_new_name[target_module_name]
-        with open(os.path.join(dest_dir, 'README.md'), 'w') as handle:
-            handle.write('%s\n' % dest_dir)
-            handle.write(('=' * len(dest_dir)) + '\n\n')
-            if readme_content:
-                handle.write(readme_content + '\n')
-            if fire_components:
-                handle.write('Command line tools\n')
-                handle.write('------------------\n\n')
-            for f in fire_components:
-                document_component(handle, *resolve_function_name(
-                    f, target_module_name, old_name_to_new_name))
-            if fire_components and functions:
-                handle.write('\n')
-            if functions:
-                handle.write('Python API\n')
-                handle.write('----------\n\n')
-            for f in functions:
-                document_function(handle, *resolve_function_name(
-                    f, target_module_name, old_name_to_new_name),
-                    pkg_name=pkg_name if add_setup_py else None)
-
-    # write setup.py
-    if add_setup_py:
-        print('writing setup.py')
-        write_setup_py(dest_dir, pkg_name, external_reqs)
-
-    # post build commands
-    for cmd in post_build_commands:
-        print('running post_build_command: %s' % cmd)
-        subprocess.Popen(shlex.split(cmd), cwd=dest_dir, shell=True).wait()
-
-
-def run_from_config(target=None, config='treeshaker.cfg', version=False):
-    # short circuit for version
-    if version:
-        print('treeshaker version %s' % __version__)
-        return
+    def sdist():
+        builder = sdist_builder or SdistBuilder()
+        ctx['find_links'] = [dist_dir(p) if check else builder.build(p)
+                             for p in source_paths]
+
+    # run modulegraph to get modules, unless a shared graph was passed in
+    def graph():
+        if module_graph is None:
+            print('constructing module import graph')
+            start = time.time()
+            mg = build_module_graph([target_module_name], target_packages,
+                                    ctx['all_reqs'], scan_cache=scan_cache,
+                                    graph_engine=graph_engine)
+            print('found %i nodes in the module import graph (%.2fs)'
+                  % (len(list(mg.flatten())), time.time() - start))
+        else:
+            mg = module_graph
+        ctx['mg'] = mg
+
+    # analyze the graph
+    def closure():
+        mg = ctx['mg']
+        our_mods, external_mods, external_reqs, visited = find_closure(
+            mg, target_module_name, target_packages, ctx['all_reqs'],
+            req_index=ctx['req_index'])
+        if module_graph is not None:
+            print('closure walk visited %i of %i nodes in the shared module '
+                  'import graph' % (len(visited), len(list(mg.flatten()))))
+        print('found %i modules imported from target packages'
+              % len(our_mods))
+        print('found %i modules imported from %i external requirements'
+              % (len(external_mods), len(external_reqs)))
+        if verbose:
+            for m in sorted(external_mods):
+                print(m.identifier)
+        summary['counts'].update(
+            graph_nodes=len(list(mg.flatten())),
+            graph_edges=sum(len(list(mg.getReferences(n)))
+                            for n in mg.flatten()),
+            visited_nodes=len(visited), bytes_read=0, modules=len(our_mods),
+            external_requirements=len(external_reqs))
+
+        # fill in new names and new paths
+        old_names = [x.identifier for x in our_mods]
+        new_names = resolve_names(old_names)
+        old_name_to_new_name = {}
+        old_name_to_new_path = {}
+        for old_name, new_name in zip(old_names, new_names):
+            old_name_to_new_name[old_name] = new_name
+            old_name_to_new_path[old_name] = \
+                os.path.join(pkg_name, new_name + '.py') \
+                if add_setup_py else new_name + '.py'
+
+        # save the analysis for downstream tooling and `treeshaker diff`
+        if graph_file is not None and not check:
+            Analysis.from_closure(
+                mg, target_module_name, our_mods, external_mods,
+                ctx['req_index'], old_name_to_new_name).save(graph_file)
+            print('wrote module graph analysis to %s' % graph_file)
+
+        # record the files the outputs are generated from
+        summary['inputs'] = {
+            'files': [m.filename for m in our_mods] + [requirements_file] +
+            ([readme] if readme else []),
+            'dirs': list(source_paths),
+        }
+        ctx.update(
+            our_mods=our_mods, external_mods=external_mods,
+            external_reqs=external_reqs,
+            old_name_to_new_name=old_name_to_new_name,
+            old_name_to_new_path=old_name_to_new_path,
+            rules_hash=hash_key(REWRITE_VERSION,
+                                sorted(old_name_to_new_name.items())),
+            source_hashes=dict((m.identifier, hash_file(m.filename))
+                               for m in our_mods))
+
+    # plan the bytecode written next to (or instead of) each module, placed
+    # where zipimport looks for it in zip archives
+    compiler = BytecodeCompiler(
+        bytecode, optimize=bytecode_optimize,
+        invalidation_mode=bytecode_invalidation,
+        legacy=output_format in ('zip', 'zipapp'))
+    pyc_jobs = []
+
+    def emit_module(relpath, inputs, source):
+        # writes a module and its bytecode, unless they are fresh; source()
+        # returns the (rewritten) source as bytes
+        outputs = [(out, optimize,
+                    dict(inputs, bytecode=key) if key else inputs)
+                   for out, optimize, key in compiler.outputs(relpath)]
+        stale = [o for o in outputs if not manifest.is_fresh(o[0], o[2])]
+        if not stale or check:
+            return
+        data = source()
+        dfile = posixpath.join(*relpath.split(os.sep)) if add_setup_py \
+            else posixpath.join(pkg_name, *relpath.split(os.sep))
+        for out, optimize, out_inputs in stale:
+            if optimize is None:
+                manifest.write(out, data, out_inputs)
+            else:
+                pyc_jobs.append((out, out_inputs, (data, dfile, optimize)))
+
+    def rewrite():
+        # touch __init__.py, which wheels and zipapps always need to import
+        # the outdir
+        if add_init_py or output_format in ('wheel', 'zipapp') and \
+                not add_setup_py:
+            if add_setup_py:
+                print('both add_init_py and add_setup_py are set to True')
+                print('__init__.py will be written, but only once '
+                      '(inside the package folder)')
+            else:
+                emit_module('__init__.py', {}, lambda: b'')
+        if add_setup_py:
+            emit_module(os.path.join(pkg_name, '__init__.py'), {},
+                        lambda: b'')
+
+        # copy modules, rewriting imports
+        rewriter = ImportRewriter(ctx['old_name_to_new_name'])
+
+        def rewrite_module(m):
+            with open(m.filename, 'rb') as handle:
+                data = handle.read()
+            summary['counts']['bytes_read'] += len(data)
+            return rewriter.rewrite_bytes(data, m.identifier,
+                                          is_package=m.packagepath is not None)
+
+        for m in ctx['our_mods']:
+            emit_module(ctx['old_name_to_new_path'][m.identifier],
+                        {'source': ctx['source_hashes'][m.identifier],
+                         'rules': ctx['rules_hash']},
+                        lambda m=m: rewrite_module(m))
+
+        # run the target module when a zipapp is executed
+        if output_format == 'zipapp':
+            manifest.write(
+                posixpath.relpath('__main__.py', manifest.prefix or '.'),
+                format_zipapp_main('%s.%s' % (
+                    pkg_name, ctx['old_name_to_new_name'][target_module_name])
+                ).encode('utf-8'), {})
+
+        # handle package_data, using the size and mtime of the source as the
+        # input to avoid hashing large files that did not change
+        items = []
+        for f in package_data:
+            package_name, f_path = f.split('/', 1)
+            package_path = ctx['mg'].findNode(package_name).packagepath[0]
+            complete_path = os.path.join(package_path, f_path)
+            summary['inputs']['files'].append(complete_path)
+            st = os.stat(complete_path)
+            items.append((os.path.basename(complete_path), complete_path,
+                          {'source': [st.st_size, st.st_mtime],
+                           'strategy': copy_strategy}))
+        manifest.copy_many(items, strategy=copy_strategy)
+
+    # compile bytecode, in a process pool if there are many modules
+    def bytecode_task():
+        summary['counts']['pycs_written'] = 0
+        if not pyc_jobs:
+            return
+        pycs, seconds = compiler.compile([job for _, _, job in pyc_jobs])
+        for (relpath, inputs, _), pyc in zip(pyc_jobs, pycs):
+            summary['counts']['pycs_written'] += \
+                manifest.write(relpath, pyc, inputs)
+        # each cold import compiles the sources for one optimization level
+        print('compiled %i pyc files, saving about %.1f ms of compilation '
+              'on each cold import'
+              % (len(pyc_jobs), 1e3 * seconds / len(compiler.optimize)))
+
+    # compile requirements.txt, unless the requirements.in content and the
+    # available sdists (or the installed distributions) are unchanged since
+    # the last build
+    def pip_compile():
+        req_in_content = '\n'.join(
+            ctx['header_lines'] +
+            list(sorted([e.line for e in ctx['external_reqs']]))) + '\n'
+        inputs = {
+            'requirements_in': hash_bytes(req_in_content.encode('utf-8')),
+        }
+        if resolver == 'environment':
+            # the sdists are only listed, so there is no need to wait for them
+            find_links = [dist_dir(p) for p in source_paths]
+            inputs.update(find_links=find_links, resolver=resolver,
+                          environment=environment_fingerprint())
+        else:
+            find_links = ctx['find_links']
+            inputs['find_links'] = hash_key([
+                (f, sorted(os.listdir(f)) if os.path.isdir(f) else None)
+                for f in find_links])
+        if output_format == 'wheel':
+            # wheels declare their requirements in METADATA instead
+            pass
+        elif manifest.is_fresh('requirements.txt', inputs):
+            print('requirements.txt is up to date')
+        elif check:
+            pass
+        elif resolver == 'environment':
+            start = time.time()
+            content = pin_requirements(req_in_content, find_links=find_links)
+            print('pinned requirements.txt to the installed distributions '
+                  '(%.1f ms)' % (1e3 * (time.time() - start)))
+            manifest.write('requirements.txt', content.encode('utf-8'),
+                           inputs)
+        else:
+            print('writing requirements.txt')
+            content, cache_hit = compile_requirements(
+                req_in_content, find_links=find_links, verbose=verbose,
+                cache=compile_cache)
+            summary['pip_compile_cache_hit'] = cache_hit
+            manifest.write('requirements.txt', content.encode('utf-8'),
+                           inputs)
+
+    def render_readme():
+        return _render_readme(
+            dest_dir, ctx['readme_content'], fire_components, functions,
+            target_module_name, ctx['old_name_to_new_name'], ctx['mg'],
+            pkg_name=pkg_name if add_setup_py else None,
+            doc_extraction=doc_extraction, doc_cache=doc_cache)
+
+    def docs():
+        # load readme content
+        readme_content = None
+        if readme and os.path.exists(readme):
+            with open(readme, 'r') as handle:
+                readme_content = handle.read()
+        ctx['readme_content'] = readme_content
+
+        # write README, unless its inputs are unchanged since the last build
+        readme_inputs = None
+        if readme_content or fire_components or functions:
+            readme_inputs = {
+                'readme': hash_key(dest_dir, readme_content),
+                'docs': hash_key(list(fire_components), list(functions),
+                                 add_setup_py,
+                                 sorted(ctx['source_hashes'].items()),
+                                 doc_extraction, DOC_VERSION),
+                'rules': ctx['rules_hash'],
+            }
+        ctx['readme_inputs'] = readme_inputs
 
-    # load config
+        if readme_inputs is not None and output_format != 'wheel' and \
+                not manifest.is_fresh('README.md', readme_inputs) and \
+                not check:
+            manifest.write('README.md', render_readme().encode('utf-8'),
+                           readme_inputs)
+
+    # write setup.py, or the metadata of a wheel
+    def setup_py():
+        external_reqs = ctx['external_reqs']
+        if output_format == 'wheel':
+            # the .dist-info directory goes at the root of the wheel
+            dist_info = posixpath.relpath(dist_info_dir(pkg_name),
+                                          manifest.prefix or '.')
+            inputs = {'readme': ctx['readme_inputs'],
+                      'requirements': sorted(r.line for r in external_reqs)}
+            if not manifest.is_fresh(dist_info + '/METADATA', inputs) and \
+                    not check:
+                content = format_wheel_metadata(
+                    pkg_name, external_reqs,
+                    description=render_readme()
+                    if ctx['readme_inputs'] else None)
+                manifest.write(dist_info + '/METADATA',
+                               content.encode('utf-8'), inputs)
+            manifest.write(dist_info + '/WHEEL',
+                           format_wheel_file().encode('utf-8'), {})
+        elif add_setup_py:
+            content = format_setup_py(pkg_name, external_reqs)
+            inputs = {'setup_py': hash_bytes(content.encode('utf-8'))}
+            if not manifest.is_fresh('setup.py', inputs) and not check:
+                print('writing setup.py')
+                manifest.write('setup.py', content.encode('utf-8'), inputs)
+
+    # remove files that dropped out of the closure and save the manifest
+    def manifest_task():
+        for relpath in manifest.prune():
+            print('%s %s' % ('stale' if check else 'removed', relpath))
+        manifest.save()
+        summary['counts'].update(files_written=manifest.written,
+                                 files_skipped=manifest.skipped,
+                                 bytes_written=manifest.bytes_written)
+        if check:
+            summary['stale'] = manifest.stale
+            return
+        print('wrote %i files (%s), %i files were already up to date'
+              % (manifest.written, format_bytes(manifest.bytes_written),
+                 manifest.skipped))
+        if output_format != 'dir':
+            print('%s %s' % ('wrote' if manifest.bytes_written
+                             else 'unchanged', manifest.archive))
+
+    # measure the footprint of the output, importing the target module only
+    # if its import time is reported or limited
+    budgets = dict((k, v) for k, v in (budgets or {}).items()
+                   if v is not None)
+
+    def footprint_task():
+        old_name_to_new_name = ctx['old_name_to_new_name']
+        measure_import = footprint or 'max_import_time' in budgets
+        location = import_location(
+            dest_dir, old_name_to_new_name[target_module_name],
+            add_setup_py=add_setup_py, output_format=output_format,
+            archive=getattr(manifest, 'archive', None)) \
+            if measure_import else None
+        result = measure_footprint(
+            ctx['mg'], target_module_name, ctx['our_mods'],
+            old_name_to_new_name, target_packages,
+            ctx['req_index'], location=location,
+            sources=(dest_dir, '' if add_setup_py else pkg_name)
+            if location is not None and bytecode == 'pyc' and
+            output_format == 'dir' else None)
+        if measure_import and location is None:
+            result['import_error'] = 'cannot import from %s archives' \
+                % output_format
+        print('\n'.join(format_footprint(target_module_name, result)))
+        summary['footprint'] = result
+        summary['budget_violations'] = check_budgets(result, budgets)
+        for violation in summary['budget_violations']:
+            print('budget exceeded: %s' % violation)
+
+    # post build commands, run next to the archive if there is no outdir
+    def post_build():
+        if summary['budget_violations']:
+            print('skipping post_build_commands because budgets are exceeded')
+            return
+        run_commands(post_build_commands,
+                     cwd=dest_dir if output_format == 'dir'
+                     else os.path.dirname(manifest.archive) or '.',
+                     label='post_build_command')
+
+    tasks = TaskGraph(timer=timer)
+    timeouts = task_timeouts or {}
+
+    def add(name, fn, deps=(), inline=False):
+        tasks.add(name, fn, deps=deps, timeout=timeouts.get(name),
+                  inline=inline)
+
+    add('requirements', requirements)
+    add('sdist', sdist)
+    add('graph', graph, deps=['requirements'], inline=True)
+    add('closure', closure, deps=['graph'])
+    add('rewrite', rewrite, deps=['closure'])
+    add('bytecode', bytecode_task, deps=['rewrite'], inline=True)
+    add('pip_compile', pip_compile,
+        deps=['closure'] if resolver == 'environment'
+        else ['closure', 'sdist'])
+    add('docs', docs, deps=['closure'])
+    add('setup_py', setup_py, deps=['docs'])
+    add('manifest', manifest_task,
+        deps=['bytecode', 'pip_compile', 'setup_py'])
+    if not check and (footprint or budgets):
+        add('footprint', footprint_task, deps=['manifest'])
+    if not check and post_build_commands:
+        add('post_build', post_build,
+            deps=['footprint' if 'footprint' in tasks.tasks else 'manifest'])
+    try:
+        tasks.run()
+    finally:
+        summary['critical_path'] = [
+            {'task': name, 'start': tasks.times[name][0],
+             'end': tasks.times[name][1]}
+            for name in tasks.critical_path()]
+    print(tasks.format_critical_path())
+
+
+def build_shared_graphs(specs, scan_cache=None):
+    """
+    Constructs one module import graph per group of targets that share the same
+    ``requirements_file``, ``target_packages`` and ``graph_engine``.
+
+    Parameters
+    ----------
+    specs : list of TargetSpec
+        The targets to build.
+    scan_cache : ScanCache, optional
+        Pass a scan cache to reuse the scan results of unchanged modules from
+        previous runs.
+
+    Returns
+    -------
+    dict
+        Map from each target name to the module graph it should use.
+    """
+    # group targets by the inputs that determine the graph
+    groups = {}
+    for spec in specs:
+        key = (os.path.join(spec.config_path, spec.requirements_file),
+               tuple(sorted(spec.target_packages)), spec.graph_engine)
+        groups.setdefault(key, []).append(spec.target)
+
+    # construct one graph per group
+    graphs = {}
+    total_time = 0.
+    for (requirements_file, target_packages, graph_engine), group in \
+            groups.items():
+        print('constructing shared module import graph for %i targets'
+              % len(group))
+        _, all_reqs = load_requirements_txt(fname=requirements_file)
+        start = time.time()
+        mg = build_module_graph(group, target_packages, all_reqs,
+                                scan_cache=scan_cache,
+                                graph_engine=graph_engine)
+        elapsed = time.time() - start
+        total_time += elapsed
+        print('found %i nodes in the shared module import graph (%.2fs)'
+              % (len(list(mg.flatten())), elapsed))
+        for target in group:
+            graphs[target] = mg
+    print('constructed %i module import graphs for %i targets in %.2fs'
+          % (len(groups), len(specs), total_time))
+    return graphs
+
+
+def _process_targets(kwargs_list):
+    """
+    Worker function that builds a group of conflicting targets serially,
+    capturing the output of each build.
+
+    Returns a list of ``(target, output, error, summary)`` tuples, where
+    ``error`` is a formatted traceback or None if the build succeeded and
+    ``summary`` is the return value of ``process_module()``.
+    """
+    results = []
+    for kwargs in kwargs_list:
+        target = kwargs['target_module_name']
+        with capture_output() as buf:
+            error = summary = None
+            try:
+                summary = process_module(
+                    module_graph=_shared_graphs.get(target), **kwargs)
+            except Exception:
+                error = traceback.format_exc()
+        results.append((target, buf.getvalue(), error, summary))
+    return results
+
+
+def process_modules_parallel(kwargs_list, jobs):
+    """
+    Builds targets in parallel worker processes.
+
+    The sdists of all ``source_paths`` must already be built (the caller does
+    this with ``SdistBuilder.build_all()`` before the pool starts), so targets
+    sharing a source path do not build it concurrently. Targets that write to
+    the same ``outdir`` are built serially in the same worker. The output of
+    each target is printed as one block once it finishes. A failing target
+    does not stop the others; all failures are reported at the end.
+
+    Parameters
+    ----------
+    kwargs_list : list of dict
+        Keyword arguments to ``process_module()``, one per target.
+    jobs : int
+        The number of worker processes to use.
+
+    Returns
+    -------
+    dict
+        Map from each target to the return value of ``process_module()``.
+    """
+    from concurrent.futures import as_completed
+
+    # group targets that must not run at the same time
+    targets = [kwargs['target_module_name'] for kwargs in kwargs_list]
+    by_target = {kwargs['target_module_name']: kwargs
+                 for kwargs in kwargs_list}
+    keys = {t: [normalize_path(by_target[t]['dest_dir'])] for t in targets}
+    chains = group_conflicting(targets, keys)
+    for chain in chains:
+        if len(chain) > 1:
+            print('building targets %s serially because they share an outdir'
+                  % ', '.join(chain))
+
+    # build
+    failures = []
+    summaries = {}
+    print('building %i targets with %i jobs' % (len(targets), jobs))
+    with get_process_pool(jobs) as pool:
+        futures = [pool.submit(_process_targets,
+                               [by_target[t] for t in chain])
+                   for chain in chains]
+        for future in as_completed(futures):
+            for target, output, error, summary in future.result():
+                summaries[target] = summary
+                print('==> %s' % target)
+                print(output.rstrip('\n'))
+                if error:
+                    print(error.rstrip('\n'))
+                    failures.append(target)
+                print('<== %s (%s)' % (target, 'failed' if error else 'ok'))
+
+    # report failures
+    if failures:
+        raise RuntimeError('%i of %i targets failed: %s'
+                           % (len(failures), len(targets),
+                              ', '.join(failures)))
+    return summaries
+
+
+def target_kwargs(spec):
+    """
+    Converts the spec of a target into keyword arguments to
+    ``process_module()``.
+
+    Parameters
+    ----------
+    spec : TargetSpec
+        The resolved settings of the target. Paths in it are relative to its
+        ``config_path``.
+
+    Returns
+    -------
+    dict
+        The keyword arguments.
+    """
+    return dict(
+        target_module_name=spec.target,
+        target_packages=list(spec.target_packages),
+        dest_dir=spec.outdir,
+        requirements_file=os.path.join(spec.config_path,
+                                       spec.requirements_file),
+        add_init_py=spec.add_init_py,
+        add_setup_py=spec.add_setup_py,
+        package_data=spec.package_data,
+        source_paths=[os.path.join(spec.config_path, p)
+                      for p in spec.source_paths],
+        post_build_commands=spec.post_build_commands,
+        readme=os.path.join(spec.config_path, spec.readme)
+        if spec.readme else None,
+        functions=spec.functions,
+        fire_components=spec.fire_components,
+        graph_engine=spec.graph_engine,
+        doc_extraction=spec.doc_extraction,
+        copy_strategy=spec.copy_strategy,
+        output_format=spec.output_format,
+        budgets=dict((budget, getattr(spec, budget)) for budget, _ in BUDGETS),
+        bytecode=spec.bytecode,
+        bytecode_optimize=spec.bytecode_optimize,
+        bytecode_invalidation=spec.bytecode_invalidation,
+        task_timeouts=dict(spec.task_timeouts),
+        resolver=spec.resolver,
+    )
+
+
+def resolve_targets(config, target=None, cache_dir=None, no_cache=False):
+    """
+    Resolves and validates the targets of a config file.
+
+    Parameters
+    ----------
+    config : str
+        The config file.
+    target : str, optional
+        Only resolve this target or target pattern.
+    cache_dir : str, optional
+        The cache directory. The resolution is cached in its ``config``
+        subdirectory while the config file is unchanged.
+    no_cache : bool
+        Pass True to resolve the config without the cache.
+
+    Returns
+    -------
+    list of TargetSpec
+        The specs of the targets.
+    """
     if not os.path.exists(config):
         raise IOError('could not find config file %s' % config)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(config),
+                                          DEFAULT_CACHE_DIR)
+    resolved = ResolvedConfig(
+        config, cache=None if no_cache
+        else FileCache(os.path.join(cache_dir, 'config')))
+    if target is None and not resolved.targets:
+        raise ValueError('no targets listed in the [targets] section of %s'
+                         % config)
+    specs = resolved.resolve(None if target is None else [target])
+    requirements_files = set(
+        os.path.join(spec.config_path, spec.requirements_file)
+        for spec in specs)
+    missing = sorted(f for f in requirements_files if not os.path.exists(f))
+    if missing:
+        raise IOError('could not find requirements_file %s'
+                      % ', '.join(missing))
+    return specs
+
+
+def find_affected(index, targets, config_file, changed=None,
+                  changed_since=None):
+    """
+    Selects the targets affected by changed files.
+
+    Parameters
+    ----------
+    index : ReverseIndex
+        The index of the inputs of each target from previous builds.
+    targets : list of str
+        The targets to choose from.
+    config_file : str
+        The config file. If it changed, all targets are affected.
+    changed : str or list of str, optional
+        Changed files, or ``'-'`` to read them from stdin.
+    changed_since : str, optional
+        A git ref to compare the working tree against.
+
+    Returns
+    -------
+    list of str
+        The affected targets.
+    """
+    paths = collect_changed_files(changed=changed, changed_since=changed_since,
+                                  cwd=os.path.dirname(config_file) or None)
+    if normalize_path(config_file) in set(normalize_path(p) for p in paths):
+        return list(targets)
+    return index.affected(paths, targets)
+
+
+def affected_from_config(changed=None, changed_since=None, target=None,
+                         config='treeshaker.cfg', cache_dir=None):
+    """
+    Prints the targets affected by changed files, one per line.
+
+    The targets are looked up in the index of the inputs of each target that
+    is updated by every build. Targets that were never built are always
+    listed.
+
+    Parameters
+    ----------
+    changed : str or list of str, optional
+        Changed files, comma-separated, or ``'-'`` to read newline-separated
+        paths from stdin.
+    changed_since : str, optional
+        A git ref (such as ``origin/main``) to compare the working tree
+        against. Defaults to ``HEAD`` if ``changed`` is not passed.
+    target : str, optional
+        Only consider this target, or the targets matching this pattern.
+    config : str
+        The config file.
+    cache_dir : str, optional
+        Override the cache directory containing the index.
+    """
     config_path = os.path.dirname(config)
-    config = load_config(fname=config)
+    cache_dir = cache_dir or os.path.join(config_path, DEFAULT_CACHE_DIR)
+    targets = [spec.target for spec in resolve_targets(
+        config, target=target, cache_dir=cache_dir)]
+    index = ReverseIndex(os.path.join(cache_dir, INDEX_NAME), config_path)
+    for t in find_affected(index, targets, config, changed=changed,
+                           changed_since=changed_since or
+                           (None if changed else 'HEAD')):
+        print(t)
+
+
+def run_from_config(target=None, config='treeshaker.cfg', version=False,
+                    share_graph=True, jobs=1, no_cache=False,
+                    cache_dir=None, check=False, stats_json=None,
+                    profile=False, stats_hook=None, affected=False,
+                    changed=None, changed_since=None, export_graph=None,
+                    footprint=False):
+    # short circuit for version
+    if version:
+        print('treeshaker version %s' % treeshaker.__version__)
+        return
+
+    # set up instrumentation
+    if stats_hook:
+        register_hook(load_hook(stats_hook))
+    profile_dir = None
+    if profile:
+        profile_dir = profile if isinstance(profile, six.string_types) \
+            else 'treeshaker_profile'
+        if not os.path.exists(profile_dir):
+            os.makedirs(profile_dir)
+    run_timer = PhaseTimer(
+        scope='run', profile_phases=('shared_graph',) if profile_dir else (),
+        profile_prefix=os.path.join(profile_dir, 'run')
+        if profile_dir else None)
+    run_timer.activate()
+    try:
+        _run(target, config, share_graph, jobs, no_cache, cache_dir, check,
+             profile_dir, run_timer, stats_json, affected, changed,
+             changed_since, export_graph, footprint)
+    finally:
+        run_timer.stop()
+        run_timer.deactivate()
+
+
+def _run(target, config, share_graph, jobs, no_cache, cache_dir, check,
+         profile_dir, run_timer, stats_json, affected, changed,
+         changed_since, export_graph, footprint):
+    """
+    Performs the phases of ``run_from_config()``, timing them with
+    ``run_timer``.
+    """
+    run_timer.start('config')
 
     # resolve targets
-    if target is None:
-        targets = list(config['targets'].keys())
-    else:
-        targets = [target]
+    config_file = config
+    config_path = os.path.dirname(config)
+    cache_dir = cache_dir or os.path.join(config_path, DEFAULT_CACHE_DIR)
+    specs = resolve_targets(config, target=target, cache_dir=cache_dir,
+                            no_cache=no_cache)
+    targets = [spec.target for spec in specs]
+
+    # set up the module scan cache and the pip-compile cache
+    scan_cache = compile_cache = doc_cache = None
+    if not no_cache:
+        scan_cache = ScanCache(cache_dir)
+        compile_cache = FileCache(os.path.join(cache_dir, 'pip-compile'))
+        doc_cache = FileCache(os.path.join(cache_dir, 'docs'))
+
+    # only build the targets affected by changed files
+    index = ReverseIndex(os.path.join(cache_dir, INDEX_NAME), config_path)
+    if affected:
+        all_targets = targets
+        targets = find_affected(index, targets, config_file, changed=changed,
+                                changed_since=changed_since or
+                                (None if changed else 'HEAD'))
+        print('%i of %i targets are affected by the changes%s'
+              % (len(targets), len(all_targets),
+                 ': ' + ', '.join(targets) if targets else ''))
+        if not targets:
+            return
+        affected_targets = set(targets)
+        specs = [spec for spec in specs if spec.target in affected_targets]
+
+    # index the installed distributions and the modules they provide once
+    # for all targets, before worker processes are forked
+    environment_index(cache=None if no_cache else FileCache(
+        os.path.join(cache_dir, 'environment')), refresh=True).module_map()
+
+    # construct shared module graphs
+    run_timer.start('shared_graph')
+    shared_graphs = {}
+    if share_graph and len(targets) > 1:
+        shared_graphs = build_shared_graphs(specs, scan_cache=scan_cache)
+
+    # assemble arguments for each target
+    run_timer.start('config')
+    if export_graph and not os.path.exists(export_graph):
+        os.makedirs(export_graph)
+    sdist_builder = SdistBuilder()
+    kwargs_list = []
+    for spec in specs:
+        kwargs = target_kwargs(spec)
+        kwargs.update(scan_cache=scan_cache, compile_cache=compile_cache,
+                      doc_cache=doc_cache, sdist_builder=sdist_builder,
+                      profile_dir=profile_dir, footprint=bool(footprint),
+                      graph_file=os.path.join(
+                          export_graph, spec.target + GRAPH_SUFFIX)
+                      if export_graph else None)
+        kwargs_list.append(kwargs)
+
+    # build the sdists of all distinct source paths once, up front
+    run_timer.start('sdist')
+    if not check:
+        sdist_builder.build_all(
+            [p for kwargs in kwargs_list for p in kwargs['source_paths']])
+
+    # check whether outdirs are up to date without building anything
+    run_timer.start('targets')
+    if check:
+        stale_targets = []
+        for kwargs in kwargs_list:
+            stale = process_module(
+                module_graph=shared_graphs.get(kwargs['target_module_name']),
+                check=True, **kwargs)['stale']
+            if stale:
+                print('%s is stale: %s' % (kwargs['dest_dir'],
+                                           ', '.join(sorted(stale))))
+                stale_targets.append(kwargs['target_module_name'])
+            else:
+                print('%s is up to date' % kwargs['dest_dir'])
+        if stale_targets:
+            print('%i of %i targets are stale'
+                  % (len(stale_targets), len(kwargs_list)))
+            sys.exit(1)
+        return
 
     # process targets
+    if jobs > 1 and _daemon_state is not None:
+        # forking worker processes from the daemon's threads is unsafe
+        print('ignoring --jobs, the daemon builds the targets of a request '
+              'serially')
+        jobs = 1
+    if jobs > 1 and len(kwargs_list) > 1:
+        _shared_graphs.clear()
+        _shared_graphs.update(shared_graphs)
+        summaries = process_modules_parallel(kwargs_list, jobs)
+    else:
+        summaries = {}
+        for kwargs in kwargs_list:
+            target = kwargs['target_module_name']
+            summaries[target] = process_module(
+                module_graph=shared_graphs.get(target), **kwargs)
+
+    # remember the inputs of each target for --affected
     for target in targets:
-        section = config['target:%s' % target]
-        process_module(
-            target,
-            section['target_packages'],
-            section['outdir'],
-            requirements_file=os.path.join(
-                config_path, section['requirements_file']),
-            add_init_py=section['add_init_py'],
-            add_setup_py=section['add_setup_py'],
-            package_data=section['package_data']
-            if section['package_data'] else (),
-            source_paths=[os.path.join(config_path, p)
-                          for p in section['source_paths']]
-            if section['source_paths'] else (),
-            post_build_commands=section['post_build_commands']
-            if section['post_build_commands'] else (),
-            readme=os.path.join(config_path, section['readme']),
-            functions=section['functions']
-            if section['functions'] else (),
-            fire_components=section['fire_components']
-            if section['fire_components'] else (),
-        )
+        index.update(target, **summaries[target]['inputs'])
+    index.save()
+
+    # summarize cache usage
+    if scan_cache is not None and scan_cache.hits + scan_cache.misses:
+        print('module scan cache summary: %i hits, %i misses'
+              % (scan_cache.hits, scan_cache.misses))
+    hits = [t for t in targets if summaries[t]['pip_compile_cache_hit']]
+    if hits:
+        print('pip-compile cache hit for %i of %i targets: %s'
+              % (len(hits), len(targets), ', '.join(hits)))
+
+    # report metrics
+    run_timer.stop()
+    for target in targets:
+        emit('target', dict(summaries[target], target=target))
+    report = build_report(run_timer, summaries)
+    emit('run', report)
+    if stats_json:
+        write_report(report, stats_json)
+        print('wrote build stats to %s' % stats_json)
+    profiles = run_timer.profiles + [
+        fname for t in targets for fname in summaries[t]['profiles']]
+    if profiles:
+        print('wrote %i profiles to %s' % (len(profiles), profile_dir))
+    if isinstance(footprint, six.string_types):
+        write_report(build_footprint_report(summaries), footprint)
+        print('wrote footprint report to %s' % footprint)
+
+    # fail the build if any target exceeds its budgets
+    over_budget = [t for t in targets if summaries[t]['budget_violations']]
+    if over_budget:
+        print('%i of %i targets exceed their budgets: %s'
+              % (len(over_budget), len(targets), ', '.join(over_budget)))
+        sys.exit(1)
+
+
+def dispatch(argv):
+    """
+    Runs the command line ``argv`` (without the program name).
+    """
+    import fire
+    command = argv[0] if argv else None
+    if command == 'watch':
+        from treeshaker.watch import watch_from_config
+        fire.Fire(watch_from_config, command=argv[1:], name='watch')
+    elif command == 'daemon':
+        from treeshaker.daemon import daemon_from_config
+        fire.Fire(daemon_from_config, command=argv[1:], name='daemon')
+    elif command == 'affected':
+        fire.Fire(affected_from_config, command=argv[1:], name='affected')
+    elif command == 'diff':
+        from treeshaker.analysis import diff_graphs
+        fire.Fire(diff_graphs, command=argv[1:], name='diff')
+    elif command == 'build':
+        fire.Fire(run_from_config, command=argv[1:], name='build')
+    else:
+        fire.Fire(run_from_config, command=argv, name='treeshaker')
 
 
 def main():
-    fire.Fire(run_from_config)
+    # answer --version without importing fire
+    if sys.argv[1:] in (['--version'], ['-v']):
+        run_from_config(version=True)
+        return
+
+    # let a running daemon handle the command, if there is one
+    from treeshaker.daemon import forward
+    returncode = forward(sys.argv[1:])
+    if returncode is not None:
+        sys.exit(returncode)
+
+    dispatch(sys.argv[1:])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,470 @@
+from __future__ import absolute_import
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import time
+import traceback
+
+from treeshaker.cache_utils import DEFAULT_CACHE_DIR, FileCache
+from treeshaker.parallel_utils import normalize_path
+from treeshaker.scan_cache import ScanCache
+from treeshaker.sdist_utils import SdistBuilder
+
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_ignored(name):
+    """
+    Returns True for file and directory names that never affect a build, such
+    as bytecode, hidden files and editor swap files.
+
+    Examples
+    --------
+    >>> from treeshaker.watch import is_ignored
+    >>> [is_ignored(n) for n in ['mod.py', 'mod.pyc', '.mod.py.swp',
+    ...                          '__pycache__', 'mod.py~']]
+    [False, True, True, True, True]
+    """
+    return name.startswith('.') or name == '__pycache__' or \
+        name.endswith(('.pyc', '.pyo', '~'))
+
+
+def _walk_dirs(path):
+    for dirpath, dirnames, _ in os.walk(path):
+        dirnames[:] = [d for d in dirnames if not is_ignored(d)]
+        yield dirpath
+
+
+class PollingWatcher(object):
+    """
+    Detects changed files by comparing the mtimes and sizes of all files under
+    the watched directories every ``interval`` seconds.
+
+    Parameters
+    ----------
+    dirs : list of str
+        Directories to watch recursively.
+    files : list of str
+        Individual files to watch.
+    interval : float
+        Seconds between scans.
+    """
+    name = 'polling'
+
+    def __init__(self, dirs, files=(), interval=1.0):
+        self.dirs = list(dirs)
+        self.files = list(files)
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        fnames = list(self.files)
+        for path in self.dirs:
+            for dirpath in _walk_dirs(path):
+                fnames.extend(os.path.join(dirpath, f)
+                              for f in os.listdir(dirpath)
+                              if not is_ignored(f))
+        for fname in fnames:
+            try:
+                st = os.stat(fname)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                continue
+            snapshot[fname] = (st.st_mtime, st.st_size)
+        return snapshot
+
+    def changes(self, timeout=None):
+        """
+        Waits up to ``timeout`` seconds (forever if None) for files to change
+        and returns the set of changed, created or deleted paths.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            snapshot = self._snapshot()
+            changed = set(path for path in set(snapshot) | set(self.snapshot)
+                          if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.time() >= deadline:
+                return set()
+            time.sleep(self.interval if deadline is None else
+                       max(0., min(self.interval, deadline - time.time())))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Detects changed files with Linux's inotify API, called through ctypes.
+
+    Directories are watched recursively, including directories created after
+    the watcher was started. Individual files are watched through their parent
+    directory, so that editors that replace files by renaming are handled.
+
+    Parameters
+    ----------
+    dirs : list of str
+        Directories to watch recursively.
+    files : list of str
+        Individual files to watch.
+
+    Raises
+    ------
+    OSError
+        If inotify is not available.
+    """
+    name = 'inotify'
+
+    def __init__(self, dirs, files=()):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'libc not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.wds = {}
+        self.recursive = set()
+        self.files = set(os.path.abspath(f) for f in files)
+        for path in dirs:
+            for dirpath in _walk_dirs(path):
+                self._add_watch(dirpath, recursive=True)
+        for fname in self.files:
+            self._add_watch(os.path.dirname(fname))
+
+    def _add_watch(self, path, recursive=False):
+        path = os.path.abspath(path)
+        if recursive:
+            self.recursive.add(path)
+        if path in self.wds.values():
+            return
+        wd = self.libc.inotify_add_watch(self.fd, path.encode('utf-8'),
+                                         WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), 'could not watch %s' % path)
+        self.wds[wd] = path
+
+    def _is_watched(self, path):
+        return path in self.files or os.path.dirname(path) in self.recursive
+
+    def _read(self, changed):
+        data = os.read(self.fd, 65536)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(
+                'utf-8', 'replace')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, report every watched file as changed
+                changed.update(self.files)
+                changed.update(self.recursive)
+                continue
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+            if wd not in self.wds or not name or is_ignored(name):
+                continue
+            path = os.path.join(self.wds[wd], name)
+            if not self._is_watched(path):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path):
+                    # watch the new directory and report the files it
+                    # already contains
+                    for dirpath in _walk_dirs(path):
+                        self._add_watch(dirpath, recursive=True)
+                        changed.update(os.path.join(dirpath, f)
+                                       for f in os.listdir(dirpath)
+                                       if not is_ignored(f))
+                continue
+            changed.add(path)
+
+    def changes(self, timeout=None, settle=0.1):
+        """
+        Waits up to ``timeout`` seconds (forever if None) for files to change
+        and returns the set of changed, created or deleted paths. Once a
+        change is seen, events are collected until none arrive for ``settle``
+        seconds, so that one save results in one set of changes.
+        """
+        changed = set()
+        wait = timeout
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], wait)
+            if not ready:
+                return changed
+            self._read(changed)
+            wait = settle if changed else wait
+
+    def close(self):
+        os.close(self.fd)
+
+
+def get_watcher(dirs, files=(), polling=False, interval=1.0):
+    """
+    Returns an ``InotifyWatcher``, or a ``PollingWatcher`` if inotify is not
+    available or ``polling`` is True.
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(dirs, files)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(dirs, files, interval=interval)
+
+
+def package_dirs(mg, target_packages):
+    """
+    Returns the directories of the target packages found in a module graph.
+    """
+    dirs = set()
+    for package in target_packages:
+        node = mg.findNode(package)
+        if node is not None and getattr(node, 'packagepath', None):
+            dirs.update(os.path.abspath(p) for p in node.packagepath)
+    return sorted(dirs)
+
+
+class TargetState(object):
+    """
+    What the outputs of a target were last built from: the files of the
+    modules in its closure and its external requirements.
+    """
+    def __init__(self, files, requirements):
+        self.files = frozenset(files)
+        self.requirements = frozenset(requirements)
+
+    def __eq__(self, other):
+        return self.files == other.files and \
+            self.requirements == other.requirements
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class Workspace(object):
+    """
+    Keeps the module graphs and target closures of a config in memory and
+    rebuilds only the targets affected by changed files.
+
+    Parameters
+    ----------
+    kwargs_list : list of dict
+        Keyword arguments to ``process_module()``, one per target.
+    """
+    def __init__(self, kwargs_list):
+        self.kwargs = {kwargs['target_module_name']: kwargs
+                       for kwargs in kwargs_list}
+        self.groups = {}
+        for kwargs in kwargs_list:
+            key = (normalize_path(kwargs['requirements_file']),
+                   tuple(sorted(kwargs['target_packages'])),
+                   kwargs['graph_engine'])
+            self.groups.setdefault(key, []).append(
+                kwargs['target_module_name'])
+        self.graphs = {}
+        self.reqs = {}
+        self.req_indexes = {}
+        self.dirs = {}
+        self.states = {}
+
+    def analyze(self, key):
+        """
+        Rebuilds the module graph of one group of targets. Unchanged files
+        are not parsed again, since both graph engines cache their per-file
+        scan results.
+        """
+        from treeshaker.metadata_utils import environment_index
+        from treeshaker.requirements_utils import build_requirement_index
+        from treeshaker.treeshaker import build_module_graph, \
+            load_requirements_txt
+
+        requirements_file, target_packages, graph_engine = key
+        targets = self.groups[key]
+        _, all_reqs = load_requirements_txt(
+            fname=self.kwargs[targets[0]]['requirements_file'])
+        self.reqs[key] = all_reqs
+        # pick up distributions installed since the last analysis
+        environment_index(refresh=True)
+        self.req_indexes[key] = build_requirement_index(all_reqs)
+        self.graphs[key] = build_module_graph(
+            targets, list(target_packages), all_reqs,
+            scan_cache=self.kwargs[targets[0]].get('scan_cache'),
+            graph_engine=graph_engine)
+        self.dirs[key] = package_dirs(self.graphs[key], target_packages)
+
+    def state(self, key, target):
+        from treeshaker.treeshaker import find_closure
+
+        our_mods, _, external_reqs, _ = find_closure(
+            self.graphs[key], target, self.kwargs[target]['target_packages'],
+            self.reqs[key], req_index=self.req_indexes[key])
+        return TargetState([os.path.abspath(m.filename) for m in our_mods],
+                           [r.line for r in external_reqs])
+
+    def build(self, target, key):
+        from treeshaker.treeshaker import process_module
+
+        start = time.time()
+        process_module(module_graph=self.graphs[key], **self.kwargs[target])
+        print('rebuilt %s (%.2fs)' % (target, time.time() - start))
+
+    def watched(self):
+        """
+        Returns the directories and files to watch.
+        """
+        dirs = sorted(set(d for dirs in self.dirs.values() for d in dirs))
+        files = sorted(set(os.path.abspath(k[0]) for k in self.groups))
+        return dirs, files
+
+    def initial_build(self):
+        for key, targets in self.groups.items():
+            self.analyze(key)
+            for target in targets:
+                self.build(target, key)
+                self.states[target] = self.state(key, target)
+
+    def update(self, changed):
+        """
+        Re-analyzes the groups that contain changed files and rebuilds the
+        targets whose closure, closure files or external requirements changed.
+
+        Returns
+        -------
+        list of str
+            The rebuilt targets.
+        """
+        outdirs = [normalize_path(k['dest_dir']) + os.sep
+                   for k in self.kwargs.values()]
+        changed = set(os.path.abspath(p) for p in changed
+                      if not any(normalize_path(p).startswith(o)
+                                 for o in outdirs))
+        rebuilt = []
+        for key, targets in self.groups.items():
+            requirements_file = os.path.abspath(key[0])
+            if requirements_file not in changed and not any(
+                    p == d or p.startswith(d + os.sep)
+                    for p in changed for d in self.dirs[key]):
+                continue
+            self.analyze(key)
+            for target in targets:
+                try:
+                    state = self.state(key, target)
+                except ImportError as e:
+                    print('%s: %s' % (target, e))
+                    continue
+                old = self.states.get(target)
+                if old is not None and state == old and \
+                        not state.files & changed and \
+                        requirements_file not in changed:
+                    continue
+                if old is not None and state.requirements == old.requirements:
+                    print('external requirements of %s are unchanged, '
+                          'pip-compile will be skipped' % target)
+                self.build(target, key)
+                self.states[target] = state
+                rebuilt.append(target)
+        return rebuilt
+
+
+def watch_from_config(target=None, config='treeshaker.cfg', no_cache=False,
+                      cache_dir=None, polling=False, interval=1.0):
+    """
+    Builds the targets in a config file, then watches the files of their
+    target packages and rebuilds affected targets whenever files change.
+
+    Parameters
+    ----------
+    target : str, optional
+        Build and watch only this target, or the targets matching this
+        pattern.
+    config : str
+        The config file.
+    no_cache : bool
+        Pass True to disable the module scan cache and pip-compile cache.
+    cache_dir : str, optional
+        Override the cache directory.
+    polling : bool
+        Pass True to poll for changes instead of using inotify.
+    interval : float
+        Seconds between scans when polling.
+    """
+    from treeshaker.treeshaker import resolve_targets, target_kwargs
+
+    cache_dir = cache_dir or os.path.join(os.path.dirname(config),
+                                          DEFAULT_CACHE_DIR)
+    specs = resolve_targets(config, target=target, cache_dir=cache_dir,
+                            no_cache=no_cache)
+    scan_cache = compile_cache = doc_cache = None
+    if not no_cache:
+        scan_cache = ScanCache(cache_dir)
+        compile_cache = FileCache(os.path.join(cache_dir, 'pip-compile'))
+        doc_cache = FileCache(os.path.join(cache_dir, 'docs'))
+    sdist_builder = SdistBuilder()
+    kwargs_list = []
+    for spec in specs:
+        kwargs = target_kwargs(spec)
+        kwargs.update(scan_cache=scan_cache, compile_cache=compile_cache,
+                      doc_cache=doc_cache, sdist_builder=sdist_builder)
+        kwargs_list.append(kwargs)
+    sdist_builder.build_all(
+        [p for kwargs in kwargs_list for p in kwargs['source_paths']])
+
+    workspace = Workspace(kwargs_list)
+    workspace.initial_build()
+    dirs, files = workspace.watched()
+    watcher = get_watcher(dirs, files, polling=polling, interval=interval)
+    print('watching %i directories and %i files for changes (%s), press '
+          'Ctrl+C to stop' % (len(dirs), len(files), watcher.name))
+    try:
+        while True:
+            changed = watcher.changes()
+            if not changed:
+                continue
+            print('changed: %s' % ', '.join(sorted(changed)))
+            try:
+                rebuilt = workspace.update(changed)
+            except Exception:
+                # keep watching, the next save may fix the problem
+                traceback.print_exc()
+                continue
+            if not rebuilt:
+                print('no targets affected')
+            # packages may have gained subdirectories or been moved
+            if workspace.watched() != (dirs, files):
+                watcher.close()
+                dirs, files = workspace.watched()
+                watcher = get_watcher(dirs, files, polling=polling,
+                                      interval=interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()